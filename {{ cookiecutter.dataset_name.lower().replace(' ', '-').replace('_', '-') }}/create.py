@@ -8,22 +8,60 @@ DO NOT EDIT THIS FILE - Modify files in the dataset/ directory instead.
 
 Usage:
     python dataset/create.py
+    python dataset/create.py --resume       # continue an interrupted build
+    python dataset/create.py --only-failed  # rebuild only contexts that failed last time
+    python dataset/create.py --preflight 50 # build 50 sampled contexts and project the full build
+    python dataset/create.py --shard 3/20   # build shard 3 of 20 (one per node, shared file system)
+    python dataset/create.py --merge        # merge the finished shards into one dataset
+    python dataset/create.py --append       # add new and changed contexts to the published dataset
 """
 
-import re
-import shutil
+import argparse
+import threading
+from itertools import chain
 from pathlib import Path
 
 import tacotoolbox
 from tacotoolbox import create
+from tacotoolbox.tacocat import create_tacocat
 from dataset.config import BUILD_CONFIG, PARQUET_CONFIG
-from dataset.taco import create_taco
-from dataset.metadata import load_contexts
+from dataset.engine.append import (
+    ChangeFilter,
+    ContextRecorder,
+    build_dataset_manifest,
+    next_part,
+    read_dataset_manifest,
+    write_dataset_manifest,
+)
+from dataset.engine.cleanup import MANIFEST_FILE, TRASH_DIR, delete_in_background, find_previous_outputs, move_to_trash, remove_paths
+from dataset.engine.failures import check_covered, read_failed_ids, select_failed
+from dataset.engine.journal import Journal
+from dataset.engine.preflight import run_preflight
+from dataset.engine.profiling import get_profile, main_profiler
+from dataset.engine.publish import avoid_published_names, clean_staging, create_staging, publish
+from dataset.engine.runner import set_context_listener
+from dataset.engine.scan import INDEX_FILE, MissingLeavesError, check_leaves
+from dataset.engine.shards import (
+    SHARDS_DIR,
+    Shard,
+    build_state_dir,
+    link_parts,
+    parse_shard,
+    read_manifests,
+    select_shard,
+    set_shard,
+    shard_dir,
+    write_manifest,
+)
+from dataset.engine.writer import check_zip_output, consolidate_parts, is_zip_output, write_parts, write_streaming
+from dataset.taco import create_part_taco, create_taco
+from dataset.tortilla import stream_root_samples
+from dataset.metadata import iter_contexts, leaf_paths
 
 
-def clean_previous_outputs(output: str):
+def clean_previous_outputs(output: str, background: bool = False, workers: int = 16) -> threading.Thread | None:
     """
-    Remove previous TACO outputs safely using regex patterns.
+    Remove previous TACO outputs found in one scan of the output directory.
     
     Handles:
     - Single file: output.tacozip, output.zip
@@ -32,65 +70,73 @@ def clean_previous_outputs(output: str):
     - FOLDER: output/
     - TacoCat: .tacocat/
     - Docs: index.html, README.md
+
+    Args:
+        output: Output path of the build
+        background: Move outputs to .taco_trash/ and delete them in a background thread
+        workers: Threads unlinking files in parallel
+
+    Returns:
+        The background cleanup thread, None if outputs were removed in place
     """
-    output_path = Path(output)
-    parent_dir = output_path.parent
-    base_stem = output_path.stem
-
-    # Remove suffix if present
-    if base_stem.endswith(".tacozip"):
-        base_stem = base_stem[:-9]
-    elif base_stem.endswith(".zip"):
-        base_stem = base_stem[:-4]
-
-    removed = []
-
-    # Single files
-    for ext in [".tacozip", ".zip"]:
-        single_file = parent_dir / f"{base_stem}{ext}"
-        if single_file.exists() and single_file.is_file():
-            single_file.unlink()
-            removed.append(str(single_file))
-
-    # Parts pattern
-    part_pattern = re.compile(rf"^{re.escape(base_stem)}_part\d{{4}}\.(tacozip|zip)$")
-    for file in parent_dir.iterdir():
-        if file.is_file() and part_pattern.match(file.name):
-            file.unlink()
-            removed.append(str(file))
-
-    # Group pattern (not _partXXXX)
-    groupby_pattern = re.compile(
-        rf"^{re.escape(base_stem)}_(?!part\d{{4}}).*\.(tacozip|zip)$"
-    )
-    for file in parent_dir.iterdir():
-        if file.is_file() and groupby_pattern.match(file.name):
-            file.unlink()
-            removed.append(str(file))
-
-    # FOLDER
-    folder_path = parent_dir / base_stem
-    if folder_path.exists() and folder_path.is_dir():
-        shutil.rmtree(folder_path)
-        removed.append(str(folder_path))
-
-    # TacoCat folder
-    tacocat_path = parent_dir / ".tacocat"
-    if tacocat_path.exists() and tacocat_path.is_dir():
-        shutil.rmtree(tacocat_path)
-        removed.append(str(tacocat_path))
+    parent_dir = Path(output).parent
+    removed = find_previous_outputs(output)
+    leftovers = (parent_dir / TRASH_DIR).exists()
 
-    # Documentation
-    for doc_file in ["index.html", "README.md"]:
-        doc_path = parent_dir / doc_file
-        if doc_path.exists() and doc_path.is_file():
-            doc_path.unlink()
-            removed.append(str(doc_path))
+    if background and (removed or leftovers):
+        move_to_trash(removed, parent_dir)
+        thread = delete_in_background(parent_dir, workers)
+    else:
+        remove_paths(removed, workers)
+        thread = None
 
     if removed:
-        print(f"Cleaned {len(removed)} previous output(s):")
+        if thread:
+            print(f"Moved {len(removed)} previous output(s) to {parent_dir / TRASH_DIR}:")
+        else:
+            print(f"Cleaned {len(removed)} previous output(s):")
         for item in removed:
             print(f"  - {item}")
+    if thread:
+        print("Deleting them in the background while building")
+    return thread
+
+
+def scan_leaf_files(contexts) -> None:
+    """Stat every file listed by leaf_paths() (SCAN_LEAVES), raising MissingLeavesError if any is missing."""
+    print("\nScanning leaf files...")
+    report = check_leaves(
+        contexts,
+        leaf_paths,
+        index_path=Path(BUILD_CONFIG["build_cache_dir"]) / INDEX_FILE,
+        missing_path=build_state_dir() / "missing_files.parquet",
+        workers=BUILD_CONFIG.get("scan_workers", 32),
+    )
+    if report.contexts == 0:
+        print("leaf_paths() lists no files, nothing to scan")
+        return
+    print(
+        f"✓ {report.files} leaf files ({report.bytes / 1e9:.2f} GB) of {report.contexts} contexts "
+        f"found in {report.seconds:.1f}s"
+    )
+
+
+def print_resume_hint(shard_option: str) -> None:
+    """Point to --resume, only when the failed build left checkpointed contexts behind."""
+    if Journal(build_state_dir() / "journal").has_checkpoints():
+        print(f"Finished contexts were checkpointed, continue with: python dataset/create.py --resume{shard_option}")
+
+
+def clear_checkpoints() -> None:
+    """Drop the journal of a published build, unless failed contexts still await --only-failed."""
+    state_dir = build_state_dir()
+    if (state_dir / "failed_contexts.parquet").exists():
+        return
+    Journal(state_dir / "journal").clear()
+    try:
+        state_dir.rmdir()  # Kept when it still holds other files, e.g. build_profile.json
+    except OSError:
+        pass
 
 
 def generate_documentation(output: str, config: dict):
@@ -145,18 +191,75 @@ def generate_documentation(output: str, config: dict):
     print(f"\nDocumentation generated in {parent_dir}")
 
 
-def main():
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Build and write the TACO dataset.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="reuse contexts checkpointed by an interrupted build instead of rebuilding them",
+    )
+    parser.add_argument(
+        "--only-failed",
+        action="store_true",
+        help="rebuild the contexts listed in failed_contexts.parquet and merge them with the checkpointed ones",
+    )
+    parser.add_argument(
+        "--preflight",
+        type=int,
+        metavar="N",
+        help="build a stratified random sample of N contexts, validate it and project build time and disk usage, without writing the dataset",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="i/N",
+        help="build only shard i (0-based) of N, selected by a hash of ctx['id'], into .taco_shards/",
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="merge the parts of every finished shard into the output, .tacocat/ and COLLECTION.json",
+    )
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="build only new and changed contexts and add them as new parts, keeping the existing ones",
+    )
+    return parser.parse_args(argv)
+
+
+def main(resume: bool = False, only_failed: bool = False, shard: Shard | None = None):
     """
     Build and write TACO dataset.
     
+    Args:
+        resume: Reuse contexts checkpointed by an interrupted build
+        only_failed: Rebuild only the contexts that failed in the previous build,
+                     reusing every other context from its checkpoint journal
+                     (any other context stops the build before the previous
+                     outputs are cleaned)
+        shard: Build only this shard, writing its parts to .taco_shards/ for
+               merge() (no .tacocat/, docs or publishing)
+    
     Process:
-    1. Clean previous outputs (if enabled)
-    2. Load contexts with optional limit
-    3. Build TACO object
-    4. Validate schema (if enabled)
-    5. Write to disk with create()
-    6. Auto-consolidate to .tacocat/ if multiple ZIPs (if enabled)
-    7. Generate documentation (if enabled)
+    1. Scan the leaf files of every context, stop if any is missing (SCAN_LEAVES)
+    2. Clean previous outputs (if enabled)
+       (STAGED_PUBLISH: only stale staging dirs, old outputs are replaced in step 9)
+    3. Stream contexts with optional limit
+    4. Build TACO object
+    5. Validate schema (if enabled, incrementally while building)
+    6. Write to disk with create()
+       (PART_WRITERS > 1 or BALANCED_PARTS: parts planned up front, then
+        written PART_WRITERS at a time)
+       (STREAMING_WRITE: 4-6 run together, PART_WRITERS parts at a time)
+    7. Auto-consolidate to .tacocat/ if multiple ZIPs (if enabled)
+    8. Generate documentation (if enabled)
+    9. Publish the staged build in place of the previous one (STAGED_PUBLISH)
+       and clear the checkpoint journal (kept if contexts failed)
+    
+    With PROFILE enabled, every step is timed and a report is written to
+    BUILD_STATE_DIR/build_profile.json.
     """
     output = BUILD_CONFIG["output"]
     output_format = BUILD_CONFIG["format"]
@@ -164,66 +267,182 @@ def main():
     group_by = BUILD_CONFIG.get("group_by")
     consolidate = BUILD_CONFIG.get("consolidate", True)
     clean_outputs = BUILD_CONFIG.get("clean_previous_outputs", True)
-    validate_schema = BUILD_CONFIG.get("validate_schema", True)
     level0_sample_limit = BUILD_CONFIG.get("level0_sample_limit")
+    streaming_write = BUILD_CONFIG.get("streaming_write", False)
+    part_writers = BUILD_CONFIG.get("part_writers", 1)
+    balanced_parts = BUILD_CONFIG.get("balanced_parts", False)
+    staged_publish = BUILD_CONFIG.get("staged_publish", False)
+    clean_in_background = BUILD_CONFIG.get("clean_in_background", False)
+    clean_workers = BUILD_CONFIG.get("clean_workers", 16)
+    published_output = output
+
+    if shard is not None:
+        check_zip_output(output, output_format, group_by, "--shard")
+        set_shard(shard)
+        # Parts go to the shard's own directory, merge() consolidates and publishes them
+        output = str(shard_dir(published_output, shard) / Path(output).name)
+        consolidate = False
+        staged_publish = False
 
     # Enable/disable logging
     tacotoolbox.verbose(True)
+    profile = get_profile()
 
-    # Step 1: Clean previous outputs
-    if clean_outputs:
+    if only_failed:
+        failures_path = build_state_dir() / "failed_contexts.parquet"
+        failed_ids = read_failed_ids(failures_path)
+        if not failed_ids:
+            print(f"No failed contexts recorded in {failures_path}, nothing to retry")
+            return
+        # Successful contexts of the previous build come from its journal
+        checkpointed = Journal(build_state_dir() / "journal").load().ids()
+        print(f"Retrying {len(failed_ids)} failed contexts from {failures_path}, {len(checkpointed)} checkpointed")
+        # Every other context must come from the journal, checked before anything is cleaned
+        contexts = iter_contexts(limit=level0_sample_limit)
+        if shard is not None:
+            contexts = select_shard(contexts, shard)
+        with profile.stage("check"):
+            check_covered(contexts, failed_ids, checkpointed)
+        resume = True
+
+    # Step 1: Scan leaf files, before anything is cleaned or built
+    if BUILD_CONFIG.get("scan_leaves", False):
+        contexts = iter_contexts(limit=level0_sample_limit)
+        if shard is not None:
+            contexts = select_shard(contexts, shard)
+        if only_failed:
+            contexts = (ctx for ctx in contexts if ctx["id"] in failed_ids)
+        with profile.stage("scan"):
+            scan_leaf_files(contexts)
+
+    # Step 2: Clean previous outputs
+    cleanup = None
+    if shard is not None:
+        # Start the shard over, its manifest only reappears once it completes
+        with profile.stage("clean"):
+            remove_paths([Path(output).parent], clean_workers)
+        Path(output).parent.mkdir(parents=True)
+        print(f"Building shard {shard.index}/{shard.count} into {Path(output).parent}")
+    elif staged_publish:
+        # The published dataset stays untouched until the new one is complete
+        with profile.stage("clean"):
+            stale = clean_staging(output, clean_workers)
+        if stale:
+            print(f"Removed {len(stale)} staging dir(s) of failed builds")
+        output = str(create_staging(published_output))
+        print(f"Staging build in {Path(output).parent}")
+    elif clean_outputs:
         print("Checking for previous outputs...")
-        clean_previous_outputs(output)
+        with profile.stage("clean"):
+            cleanup = clean_previous_outputs(output, background=clean_in_background, workers=clean_workers)
+
+    # Step 3: Stream contexts (consumed lazily by level0.build)
+    print("\nStreaming contexts...")
+    contexts = profile.iter_timed("load_contexts", iter_contexts(limit=level0_sample_limit))
+    if shard is not None:
+        contexts = select_shard(contexts, shard)
+        first = next(contexts, None)
+        if first is None:
+            # More shards than needed: record an empty shard so --merge can proceed
+            manifest = write_manifest(published_output, shard, [], 0)
+            print(f"No contexts in shard {shard.index}/{shard.count}, recorded in {manifest}")
+            return
+        contexts = chain([first], contexts)
+    if only_failed:
+        contexts = select_failed(contexts, failed_ids, checkpointed)
 
-    # Step 2: Load contexts
-    print("\nLoading contexts...")
-    contexts = load_contexts(limit=level0_sample_limit)
-    print(f"Loaded {len(contexts)} contexts")
+    # Context hashes for .taco_manifest.parquet, the baseline of --append
+    recorder = None
+    append_manifest = BUILD_CONFIG.get("append_manifest", False)
+    if append_manifest and shard is None and group_by is None and is_zip_output(output, output_format):
+        recorder = ContextRecorder(build_state_dir() / "contexts.parquet")
+        contexts = recorder.record(contexts)
+        set_context_listener(recorder.add_samples)
     
     if level0_sample_limit:
         print(f"(Limited to {level0_sample_limit} for testing)")
 
-    # Step 3: Build TACO object
-    print("\nBuilding TACO object...")
-    try:
-        taco = create_taco(contexts=contexts)
-    except Exception as e:
-        print(f"\nERROR: Failed to build TACO: {e}")
-        raise
+    if streaming_write:
+        # Steps 4-6 at once: parts are written while later contexts are still building
+        print(f"\nBuilding and streaming TACO parts to {output}...")
+        try:
+            with profile.stage("build + write"):
+                result = write_streaming(
+                    samples=stream_root_samples(contexts, resume=resume),
+                    make_taco=create_part_taco,
+                    output=output,
+                    output_format=output_format,
+                    split_size=split_size,
+                    group_by=group_by,
+                    consolidate=consolidate,
+                    writers=part_writers,
+                    **PARQUET_CONFIG
+                )
+        except Exception as e:
+            print(f"\nERROR: Failed to build TACO: {e}")
+            raise
+        paths, collection, n_samples = result.paths, result.collection, result.n_samples
+    else:
+        # Step 4: Build TACO object
+        print("\nBuilding TACO object...")
+        try:
+            with profile.stage("build"):
+                taco = create_taco(contexts=contexts, resume=resume)
+        except Exception as e:
+            print(f"\nERROR: Failed to build TACO: {e}")
+            raise
+        n_samples = len(taco.tortilla.samples)
+        collection = taco.model_dump(exclude={'tortilla'}, mode='json')
+
+        # Step 5: Schema validated per context by level0 while building (reported there)
 
-    # Step 4: Validate schema
-    if validate_schema:
-        print("\nValidating schema...")
+        # Step 6: Write to disk
+        print(f"\nWriting TACO in {output_format.upper()} format to {output}...")
+        
         try:
-            # Check that all samples have consistent schema
-            taco.tortilla.export_metadata()
-            print("✓ Schema validation passed")
+            with profile.stage("write"):
+                if part_writers > 1 or (balanced_parts and is_zip_output(output, output_format)):
+                    # Parts planned up front, then written concurrently
+                    paths = write_parts(
+                        taco=taco,
+                        output=output,
+                        output_format=output_format,
+                        split_size=split_size,
+                        group_by=group_by,
+                        consolidate=consolidate,
+                        writers=part_writers,
+                        balanced=balanced_parts,
+                        **PARQUET_CONFIG
+                    )
+                else:
+                    paths = create(
+                        taco=taco,
+                        output=output,
+                        output_format=output_format,
+                        split_size=split_size,
+                        group_by=group_by,
+                        consolidate=consolidate,
+                        **PARQUET_CONFIG
+                    )
         except Exception as e:
-            print(f"✗ Schema validation failed: {e}")
+            print(f"\nERROR: Failed to create TACO: {e}")
             raise
 
-    # Step 5: Write to disk
-    print(f"\nWriting TACO in {output_format.upper()} format to {output}...")
-    
-    try:
-        paths = create(
-            taco=taco,
-            output=output,
-            output_format=output_format,
-            split_size=split_size,
-            group_by=group_by,
-            consolidate=consolidate,
-            **PARQUET_CONFIG
-        )
-    except Exception as e:
-        print(f"\nERROR: Failed to create TACO: {e}")
-        raise
+    if staged_publish:
+        # The published .tacocat/ reads its containers until it is swapped
+        paths = avoid_published_names(paths, published_output)
     
     print(f"\nCreated {len(paths)} file(s)")
     for path in paths:
         print(f"  - {path}")
+
+    if recorder is not None:
+        try:
+            write_dataset_manifest(build_dataset_manifest(paths, recorder.close()), Path(output).parent)
+        except ValueError as e:
+            print(f"No {MANIFEST_FILE} written, --append will not work on this dataset: {e}")
     
-    # Step 6: Generate COLLECTION.json (if single file, not consolidated)
+    # Step 7: Generate COLLECTION.json (if single file, not consolidated)
     output_path = Path(output)
     parent_dir = output_path.parent
     tacocat_path = parent_dir / ".tacocat"
@@ -241,34 +460,328 @@ def main():
         print(f"\nGenerating COLLECTION.json in {parent_dir}")
         collection_path = parent_dir / "COLLECTION.json"
         
-        # Export COLLECTION from Taco object (exclude tortilla)
-        collection_json = taco.model_dump(
-            exclude={'tortilla'},
-            mode='json'
-        )
-        
+        # COLLECTION exported from the Taco object (without the tortilla)
         import json
         with open(collection_path, 'w') as f:
-            json.dump(collection_json, f, indent=2, default=str)
+            json.dump(collection, f, indent=2, default=str)
         
         print(f"Created {collection_path}")
 
-    # Step 7: Generate documentation
-    if BUILD_CONFIG.get("generate_docs", True):
-        generate_documentation(output, BUILD_CONFIG)
+    if shard is not None:
+        manifest = write_manifest(published_output, shard, paths, n_samples)
+        print(f"\nShard {shard.index}/{shard.count} recorded in {manifest}")
+
+    # Step 8: Generate documentation
+    if BUILD_CONFIG.get("generate_docs", True) and shard is None:
+        with profile.stage("docs"):
+            generate_documentation(output, BUILD_CONFIG)
+
+    # Step 9: Publish the staged build
+    if staged_publish:
+        print(f"\nPublishing to {published_output}...")
+        with profile.stage("publish"):
+            published, cleanup = publish(
+                output,
+                published_output,
+                remove_stale=clean_outputs,
+                background=clean_in_background,
+                workers=clean_workers,
+            )
+        print(f"Published {len(published)} output(s)")
+        output = published_output
+
+    clear_checkpoints()
 
     print("\n✓ Build completed successfully!")
-    print(f"\nDataset: {taco.id} v{taco.dataset_version}")
-    print(f"Samples: {len(taco.tortilla.samples)}")
+    print(f"\nDataset: {collection['id']} v{collection['dataset_version']}")
+    print(f"Samples: {n_samples}")
     print(f"Output:  {output}")
 
+    if cleanup is not None and cleanup.is_alive():
+        print("\nWaiting for the background cleanup of previous outputs...")
+        cleanup.join()
+
+    if shard is not None:
+        print("Merge once every shard has completed: python dataset/create.py --merge")
+
+    # Timing report
+    if BUILD_CONFIG.get("profile", False):
+        profile_path = build_state_dir() / "build_profile.json"
+        profile.print_summary(profile.write(profile_path))
+        print(f"\nBuild profile written to {profile_path}")
+
+
+def merge():
+    """
+    Merge the shards of a sharded build (--shard i/N) into one dataset.
+
+    Process:
+    1. Check that all N shards completed (their shard.json manifests)
+    2. Clean previous outputs (if enabled, STAGED_PUBLISH: stale staging dirs)
+    3. Link the parts of every shard, in shard order, as one part sequence
+    4. Consolidate their metadata into .tacocat/ (always, whatever CONSOLIDATE)
+    5. Generate documentation (if enabled)
+    6. Publish the staged merge (STAGED_PUBLISH) and remove .taco_shards/
+    """
+    output = BUILD_CONFIG["output"]
+    check_zip_output(output, BUILD_CONFIG["format"], BUILD_CONFIG.get("group_by"), "--merge")
+    clean_outputs = BUILD_CONFIG.get("clean_previous_outputs", True)
+    staged_publish = BUILD_CONFIG.get("staged_publish", False)
+    clean_in_background = BUILD_CONFIG.get("clean_in_background", False)
+    clean_workers = BUILD_CONFIG.get("clean_workers", 16)
+    published_output = output
+
+    tacotoolbox.verbose(True)
+    profile = get_profile()
+
+    # Step 1: Check the shards
+    manifests = read_manifests(output)
+    n_samples = sum(manifest["samples"] for manifest in manifests)
+    n_parts = sum(len(manifest["parts"]) for manifest in manifests)
+    print(f"Merging {len(manifests)} shards: {n_samples} root samples in {n_parts} parts")
+
+    # Step 2: Clean previous outputs
+    cleanup = None
+    if staged_publish:
+        with profile.stage("clean"):
+            clean_staging(output, clean_workers)
+        output = str(create_staging(published_output))
+    elif clean_outputs:
+        with profile.stage("clean"):
+            cleanup = clean_previous_outputs(output, background=clean_in_background, workers=clean_workers)
+
+    # Steps 3-4: Link parts and consolidate
+    with profile.stage("link"):
+        paths = link_parts(published_output, manifests, output)
+    with profile.stage("consolidate"):
+        consolidate_parts(paths, Path(output))
+
+    # Step 5: Generate documentation
+    if BUILD_CONFIG.get("generate_docs", True):
+        with profile.stage("docs"):
+            generate_documentation(output, BUILD_CONFIG)
+
+    # Step 6: Publish and drop the shards (the published parts are links to the same files)
+    if staged_publish:
+        print(f"\nPublishing to {published_output}...")
+        with profile.stage("publish"):
+            published, cleanup = publish(
+                output,
+                published_output,
+                remove_stale=clean_outputs,
+                background=clean_in_background,
+                workers=clean_workers,
+            )
+        print(f"Published {len(published)} output(s)")
+        output = published_output
+    remove_paths([Path(published_output).parent / SHARDS_DIR], clean_workers)
+
+    print("\n✓ Merge completed successfully!")
+    print(f"\nSamples: {n_samples}")
+    print(f"Parts:   {len(paths)}")
+    print(f"Output:  {Path(output).parent / '.tacocat'}")
+
+    if cleanup is not None and cleanup.is_alive():
+        print("\nWaiting for the background cleanup of previous outputs...")
+        cleanup.join()
+
+
+def append():
+    """
+    Add new and changed contexts to the published dataset (--append).
+
+    Process:
+    1. Read .taco_manifest.parquet of the published dataset
+    2. Stream contexts once to find those that are new or whose hash changed,
+       and the parts holding the changed ones (affected parts)
+    3. Build the new and changed contexts and every context of the affected
+       parts (SCAN_LEAVES: their leaf files are scanned first), write them as
+       new parts after the existing ones (STREAMING_WRITE and PART_WRITERS
+       apply) into a staging directory. Stop if a context of an affected
+       part failed
+    4. Create .tacocat/ and COLLECTION.json from the untouched and the new
+       parts, update the manifest
+    5. Generate documentation (if enabled)
+    6. Publish the new files next to the untouched parts and retire the
+       affected ones
+
+    Appending is always staged: the published dataset only changes once the
+    new parts and metadata are complete.
+    """
+    output = BUILD_CONFIG["output"]
+    output_format = BUILD_CONFIG["format"]
+    split_size = BUILD_CONFIG.get("split_size")
+    group_by = BUILD_CONFIG.get("group_by")
+    level0_sample_limit = BUILD_CONFIG.get("level0_sample_limit")
+    streaming_write = BUILD_CONFIG.get("streaming_write", False)
+    part_writers = BUILD_CONFIG.get("part_writers", 1)
+    balanced_parts = BUILD_CONFIG.get("balanced_parts", False)
+    clean_in_background = BUILD_CONFIG.get("clean_in_background", False)
+    clean_workers = BUILD_CONFIG.get("clean_workers", 16)
+    check_zip_output(output, output_format, group_by, "--append")
+    published_output = output
+    parent_dir = Path(output).parent
+
+    tacotoolbox.verbose(True)
+    profile = get_profile()
+
+    # Step 1: Read the manifest
+    manifest = read_dataset_manifest(output)
+    if manifest is None:
+        raise ValueError(f"No dataset to append to in {parent_dir}, run a full build first")
+    previous = sorted(set(manifest.column("part").to_pylist()))
+    first_part = next_part(output, manifest)
+    print(f"Appending to {len(manifest)} root samples in {len(previous)} part(s)")
+
+    # Step 2: Find the new and changed contexts
+    changes = ChangeFilter(manifest)
+    with profile.stage("compare"):
+        changes.find(iter_contexts(limit=level0_sample_limit))
+    if not changes.n_new and not changes.changed:
+        print("Nothing to append: every context is already in the dataset, unchanged")
+        return
+    affected = changes.affected
+    kept = [parent_dir / name for name in previous if name not in affected]
+    print(
+        f"{changes.n_new} new and {len(changes.changed)} changed contexts, "
+        f"{len(affected)} part(s) holding changed contexts will be rewritten"
+    )
+
+    # Step 3: Build and write the new parts
+    if BUILD_CONFIG.get("scan_leaves", False):
+        with profile.stage("scan"):
+            scan_leaf_files(changes.select(iter_contexts(limit=level0_sample_limit)))
+
+    with profile.stage("clean"):
+        clean_staging(output, clean_workers)
+    output = str(create_staging(published_output))
+    staging_dir = Path(output).parent
+
+    print("\nStreaming contexts...")
+    recorder = ContextRecorder(build_state_dir() / "contexts.parquet")
+    contexts = profile.iter_timed("load_contexts", iter_contexts(limit=level0_sample_limit))
+    contexts = recorder.record(changes.select(contexts))
+    set_context_listener(recorder.add_samples)
+
+    print(f"\nBuilding new parts from part {first_part} on...")
+    if streaming_write:
+        with profile.stage("build + write"):
+            result = write_streaming(
+                samples=stream_root_samples(contexts),
+                make_taco=create_part_taco,
+                output=output,
+                output_format=output_format,
+                split_size=split_size,
+                group_by=group_by,
+                consolidate=False,
+                writers=part_writers,
+                first_part=first_part,
+                **PARQUET_CONFIG
+            )
+        paths, n_samples = result.paths, result.n_samples
+    else:
+        with profile.stage("build"):
+            taco = create_taco(contexts=contexts)
+        with profile.stage("write"):
+            paths = write_parts(
+                taco=taco,
+                output=output,
+                output_format=output_format,
+                split_size=split_size,
+                group_by=group_by,
+                consolidate=False,
+                writers=part_writers,
+                balanced=balanced_parts,
+                first_part=first_part,
+                **PARQUET_CONFIG
+            )
+        n_samples = len(taco.tortilla.samples)
+    print(f"\n{n_samples} root samples in {len(paths)} new part(s)")
+
+    lost = changes.lost(read_failed_ids(build_state_dir() / "failed_contexts.parquet"))
+    if lost:
+        raise RuntimeError(
+            f"{len(lost)} context(s) of the parts being rewritten failed to build, the dataset was not changed: "
+            f"{lost[:10]}. Fix them and run --append again"
+        )
+
+    # Step 4: Consolidate the metadata of the untouched and new parts
+    with profile.stage("consolidate"):
+        updated = build_dataset_manifest(paths, recorder.close(), manifest, retired=affected)
+        tacocat_dir = parent_dir / ".tacocat"
+        print(f"\nConsolidating {len(kept) + len(paths)} parts into .tacocat/...")
+        create_tacocat(inputs=kept + paths, output=staging_dir, validate_schema=True)
+        write_dataset_manifest(updated, staging_dir)
+
+    # Step 5: Generate documentation
+    if BUILD_CONFIG.get("generate_docs", True):
+        with profile.stage("docs"):
+            generate_documentation(output, BUILD_CONFIG)
+
+    # Step 6: Publish next to the existing parts
+    print(f"\nPublishing to {published_output}...")
+    with profile.stage("publish"):
+        published, cleanup = publish(
+            output,
+            published_output,
+            remove_stale=False,
+            background=clean_in_background,
+            workers=clean_workers,
+            retired=[parent_dir / name for name in affected],
+        )
+    # A single-file dataset is consolidated from now on, .tacocat/COLLECTION.json replaces its COLLECTION.json
+    (parent_dir / "COLLECTION.json").unlink(missing_ok=True)
+    print(f"Published {len(published)} output(s)")
+    clear_checkpoints()
+
+    print("\n✓ Append completed successfully!")
+    print(f"\nSamples: {len(updated)}")
+    print(f"Parts:   {len(kept) + len(paths)}")
+    print(f"Output:  {tacocat_dir}")
+
+    if cleanup is not None and cleanup.is_alive():
+        print("\nWaiting for the background cleanup of previous outputs...")
+        cleanup.join()
+
+    if BUILD_CONFIG.get("profile", False):
+        profile_path = build_state_dir() / "build_profile.json"
+        profile.print_summary(profile.write(profile_path))
+        print(f"\nBuild profile written to {profile_path}")
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.preflight:
+        exit(0 if run_preflight(args.preflight, make_taco=create_part_taco) else 1)
+    if args.merge:
+        try:
+            merge()
+        except Exception as e:
+            print(f"\n\nMerge failed: {e}")
+            exit(1)
+        exit(0)
+    if args.append:
+        try:
+            append()
+        except Exception as e:
+            print(f"\n\nAppend failed: {e}")
+            print("The published dataset was not changed")
+            exit(1)
+        exit(0)
+    set_shard(args.shard)
+    shard_option = f" --shard {args.shard.index}/{args.shard.count}" if args.shard else ""
     try:
-        main()
+        with main_profiler(BUILD_CONFIG.get("profiler"), build_state_dir()):
+            main(resume=args.resume, only_failed=args.only_failed, shard=args.shard)
+    except MissingLeavesError as e:
+        print(f"\n\nBuild stopped before building anything: {e}")
+        print("Fix the paths (or leaf_paths() in dataset/metadata.py) and run the build again")
+        exit(1)
     except KeyboardInterrupt:
         print("\n\nBuild interrupted by user")
+        print_resume_hint(shard_option)
         exit(1)
     except Exception as e:
         print(f"\n\nBuild failed: {e}")
+        print_resume_hint(shard_option)
         exit(1)
\ No newline at end of file
@@ -52,9 +52,26 @@ COLLECTION_PUBLICATIONS = None
 DATAFRAME_BACKEND = "pandas"  # "pyarrow", "polars", "pandas"
 
 # Parallel processing
-WORKERS = 4
+WORKERS = 4  # Number of level0 workers, "auto" = from CPU quota, free memory and a warm-up build
 LEVEL0_PARALLEL = True
+EXECUTOR = "process"        # "serial", "thread" (I/O-bound), "process" (CPU-bound), "loky", "distributed"
+DISTRIBUTED_ADDRESS = None  # Dask scheduler, e.g. "tcp://scheduler:8786", None = local cluster
+DISTRIBUTED_PROCESSES = True  # Local cluster only: False = in-process workers (for testing)
+WORKER_PRELOAD = ["pyarrow", "tacotoolbox"]  # Modules every worker imports before its first context (e.g. "rasterio")
+WORKER_THREADS_PER_PROCESS = None  # OMP/GDAL/BLAS threads per worker process, "auto" = CPUs / WORKERS, None = unset ("serial"/"thread": never set)
+AUTO_PROBE_CONTEXTS = 2     # WORKERS = "auto": contexts built first by one worker to measure its peak RSS (kept, not rebuilt)
+AUTO_MEMORY_FRACTION = 0.8  # WORKERS = "auto": share of available memory the workers may use
+WORKER_INIT = "dataset.extensions:warm_up"  # "module:function" run once per worker, None = disabled
 LEVEL0_SAMPLE_LIMIT = None  # None = all samples, set number for debugging
+LEVEL0_CHUNKSIZE = 16       # Contexts sent to a worker per task (spreads IPC overhead)
+LEVEL0_MAX_INFLIGHT = None  # Max chunks in flight at once, None = 4 x WORKERS
+LEVEL0_PRESERVE_ORDER = True  # Keep root samples in context order (False = completion order)
+LEVEL0_RESULTS = "samples"  # Worker results: "samples" (pickled objects) or "rows" (Arrow IPC, deep trees)
+LEVEL0_RETRIES = 2          # Extra attempts for a failing context (flaky storage)
+LEVEL0_RETRY_BACKOFF = 0.5  # Seconds before the first retry, doubles on each retry
+LEVEL0_WORKER_MEMORY_LIMIT = None  # Memory cap per worker process, e.g. "16GB": bigger contexts fail with MemoryError
+LEVEL0_MAX_TASKS_PER_CHILD = None  # "process" executor: replace each worker after N tasks (chunks), None = never
+LEVEL0_MIN_FREE_MEMORY = "1GB"     # Hold back new chunks while available memory is below this, None = never
 
 # Output settings
 OUTPUT_PATH = "output.tacozip"
@@ -62,11 +79,44 @@ OUTPUT_FORMAT = "auto"  # "auto", "zip", or "folder"
 SPLIT_SIZE = "4GB"      # Max size per ZIP file, None = no splitting
 GROUP_BY = None         # Column(s) to group by, None = no grouping
 CONSOLIDATE = True      # Auto-create .tacocat/ when multiple ZIPs generated
+STREAMING_WRITE = False  # Write SPLIT_SIZE parts while building (ZIP only, no GROUP_BY), peak memory ~PART_WRITERS + 1 parts
+PART_WRITERS = 1         # SPLIT_SIZE parts written concurrently (ZIP only), 1 = one after the other
+BALANCED_PARTS = False   # Plan near-equal SPLIT_SIZE parts and split GROUP_BY groups larger than SPLIT_SIZE (ZIP only, not with STREAMING_WRITE)
+APPEND_MANIFEST = False  # Record .taco_manifest.parquet (context hashes per part) next to ZIP outputs, so --append detects changed contexts
 
 # Build options
 CLEAN_PREVIOUS_OUTPUTS = True
+STAGED_PUBLISH = False       # Build in .taco_staging/, replace previous outputs only once the build succeeded
+CLEAN_IN_BACKGROUND = False  # Rename old outputs to .taco_trash/ and delete them while building
+CLEAN_WORKERS = 16           # Threads deleting files of old outputs (FOLDER outputs with many files)
 VALIDATE_SCHEMA = True
 
+# Build cache - reuse contexts whose inputs, builders and extensions are unchanged
+BUILD_CACHE = False
+BUILD_CACHE_DIR = ".taco_cache"  # Safe to delete, never touched by CLEAN_PREVIOUS_OUTPUTS
+
+# Extension cache - reuse results of extensions wrapped in cached(...) for unchanged files
+EXTENSION_CACHE = False       # BUILD_CACHE_DIR/extension_cache.sqlite, keyed by extension, parameters, path, size, mtime
+EXTENSION_CACHE_SIZE = "2GB"  # Least recently used results are evicted beyond this, None = unbounded
+
+# Leaf scan - stat every file listed by metadata.leaf_paths() before building
+# Leaf files must not change during a build: reuse is checked against the scan, changes are picked up next build
+SCAN_LEAVES = False  # Stop before building when leaf files are missing (listed in BUILD_STATE_DIR/missing_files.parquet)
+SCAN_WORKERS = 32    # Threads calling stat(), results indexed in BUILD_CACHE_DIR/leaf_index.sqlite
+
+# Checkpointing - resume interrupted builds with: python create.py --resume
+BUILD_STATE_DIR = ".taco_build"  # Journal of finished contexts + failed_contexts.parquet
+CHECKPOINT_EVERY = 500           # Write a checkpoint every N finished contexts
+CHECKPOINT_INTERVAL = 300        # ... or every N seconds, whichever comes first
+
+# Profiling - per-stage / per-builder / per-extension timings
+PROFILE = False   # Print a timing summary and write BUILD_STATE_DIR/build_profile.json
+PROFILER = None   # Also profile the main process: None, "cprofile" or "pyinstrument"
+
+# Pre-flight - build a sample of N contexts first with: python create.py --preflight N
+PREFLIGHT_STRATIFY_BY = None  # Context key(s) to stratify the sample by (e.g. "region"), None = uniform
+PREFLIGHT_SEED = 0            # Same seed = same sampled contexts
+
 # Documentation
 GENERATE_DOCS = True
 DOWNLOAD_BASE_URL = None  # URL prefix for download links, None if not public
@@ -106,14 +156,49 @@ if COLLECTION_PUBLICATIONS is not None:
 BUILD_CONFIG = {
     "workers": WORKERS,
     "level0_parallel": LEVEL0_PARALLEL,
+    "executor": EXECUTOR,
+    "distributed_address": DISTRIBUTED_ADDRESS,
+    "distributed_processes": DISTRIBUTED_PROCESSES,
+    "worker_preload": WORKER_PRELOAD,
+    "worker_threads_per_process": WORKER_THREADS_PER_PROCESS,
+    "worker_init": WORKER_INIT,
+    "auto_probe_contexts": AUTO_PROBE_CONTEXTS,
+    "auto_memory_fraction": AUTO_MEMORY_FRACTION,
     "level0_sample_limit": LEVEL0_SAMPLE_LIMIT,
+    "level0_chunksize": LEVEL0_CHUNKSIZE,
+    "level0_max_inflight": LEVEL0_MAX_INFLIGHT,
+    "level0_preserve_order": LEVEL0_PRESERVE_ORDER,
+    "level0_results": LEVEL0_RESULTS,
+    "level0_retries": LEVEL0_RETRIES,
+    "level0_retry_backoff": LEVEL0_RETRY_BACKOFF,
+    "level0_worker_memory_limit": LEVEL0_WORKER_MEMORY_LIMIT,
+    "level0_max_tasks_per_child": LEVEL0_MAX_TASKS_PER_CHILD,
+    "level0_min_free_memory": LEVEL0_MIN_FREE_MEMORY,
     "output": OUTPUT_PATH,
     "format": OUTPUT_FORMAT,
     "split_size": SPLIT_SIZE,
     "group_by": GROUP_BY,
     "consolidate": CONSOLIDATE,
+    "streaming_write": STREAMING_WRITE,
+    "part_writers": PART_WRITERS,
+    "balanced_parts": BALANCED_PARTS,
+    "append_manifest": APPEND_MANIFEST,
     "clean_previous_outputs": CLEAN_PREVIOUS_OUTPUTS,
+    "staged_publish": STAGED_PUBLISH,
+    "clean_in_background": CLEAN_IN_BACKGROUND,
+    "clean_workers": CLEAN_WORKERS,
     "validate_schema": VALIDATE_SCHEMA,
+    "build_cache": BUILD_CACHE,
+    "build_cache_dir": BUILD_CACHE_DIR,
+    "scan_leaves": SCAN_LEAVES,
+    "scan_workers": SCAN_WORKERS,
+    "build_state_dir": BUILD_STATE_DIR,
+    "checkpoint_every": CHECKPOINT_EVERY,
+    "checkpoint_interval": CHECKPOINT_INTERVAL,
+    "profile": PROFILE,
+    "profiler": PROFILER,
+    "preflight_stratify_by": PREFLIGHT_STRATIFY_BY,
+    "preflight_seed": PREFLIGHT_SEED,
     "generate_docs": GENERATE_DOCS,
     "download_base_url": DOWNLOAD_BASE_URL,
     "catalogue_url": CATALOGUE_URL,
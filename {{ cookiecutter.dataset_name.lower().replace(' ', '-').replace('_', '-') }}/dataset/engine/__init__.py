@@ -0,0 +1,8 @@
+"""
+Build Engine
+
+Internal machinery used by create.py and level0.build() to run large builds:
+bounded parallel execution and related helpers.
+
+DO NOT EDIT THESE FILES - Configure the engine from dataset/config.py instead.
+"""
@@ -0,0 +1,271 @@
+"""
+Append Mode
+
+Adds new and changed contexts to a published dataset without rebuilding all
+of it (python dataset/create.py --append):
+
+- With APPEND_MANIFEST, every ZIP build records .taco_manifest.parquet next
+  to the output (--append always does): one row per root sample with the id
+  and hash of the context that built it and the part it was written to. The
+  level0 runner reports which root samples each context built, so root
+  sample ids do not have to match context ids.
+- --append first hashes every context of load_contexts() to find those that
+  are not in the manifest (new) or whose hash differs (changed). Parts that
+  hold a changed context are affected: a part is never edited, so every
+  context of an affected part is rebuilt along with the new and changed
+  ones, and the affected parts are replaced.
+- Everything rebuilt is written as new _partNNNN files numbered after the
+  existing ones. Parts without changed contexts are never touched.
+- .tacocat/ and COLLECTION.json are rebuilt with tacotoolbox's
+  create_tacocat() from the untouched parts plus the new ones.
+
+If a context of an affected part fails to build, the append stops before
+publishing anything (new contexts that fail are left out and retried by the
+next append). Contexts removed from load_contexts() stay in the dataset
+while their part is untouched, and disappear once it is rewritten.
+Datasets built without a manifest (or merged from shards) get one from
+.tacocat/ or their single output file on their first append, without
+context hashes, taking each root sample id as its context id: only new
+contexts are appended to them.
+An append that would put a root sample id in the dataset twice stops before
+publishing.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import hashlib
+import json
+import re
+from collections.abc import Iterable, Iterator
+from io import BytesIO
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from dataset.engine.cleanup import MANIFEST_FILE, output_stem
+
+MANIFEST_SCHEMA = pa.schema([
+    ("id", pa.string()),      # Context id
+    ("key", pa.string()),     # Context hash, null if unknown
+    ("sample", pa.string()),  # Root sample id
+    ("part", pa.string()),    # Container file name
+])
+_CONTEXTS_SCHEMA = pa.schema([("id", pa.string()), ("key", pa.string())])
+_SAMPLES_SCHEMA = pa.schema([("id", pa.string()), ("sample", pa.string())])
+
+_BATCH = 100_000
+
+
+def context_hash(ctx: dict) -> str:
+    """Hash of a context's content (same canonical JSON as the build cache)."""
+    return hashlib.sha256(json.dumps(ctx, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _RowSpool:
+    """Two-column rows buffered into a Parquet file."""
+
+    def __init__(self, path: Path, schema: pa.Schema):
+        self.path = path
+        self._writer = pq.ParquetWriter(path, schema)
+        self._rows: list[tuple[str, str]] = []
+
+    def add(self, a: str, b: str) -> None:
+        self._rows.append((a, b))
+        if len(self._rows) >= _BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._rows:
+            columns = list(zip(*self._rows))
+            self._writer.write_table(pa.table(dict(zip(self._writer.schema.names, columns)), schema=self._writer.schema))
+            self._rows = []
+
+    def close(self) -> pa.Table:
+        self._flush()
+        self._writer.close()
+        table = pq.read_table(self.path)
+        self.path.unlink()
+        return table
+
+
+class ContextRecorder:
+    """
+    Streams (id, hash) of every context that passes through, and the ids of
+    the root samples each of them built, to Parquet files.
+    """
+
+    def __init__(self, path: str | Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._contexts = _RowSpool(path, _CONTEXTS_SCHEMA)
+        self._samples = _RowSpool(path.with_name(f"{path.stem}_samples{path.suffix}"), _SAMPLES_SCHEMA)
+
+    def record(self, contexts: Iterable[dict]) -> Iterator[dict]:
+        """Yield contexts unchanged, recording each of them."""
+        for ctx in contexts:
+            self._contexts.add(str(ctx["id"]), context_hash(ctx))
+            yield ctx
+
+    def add_samples(self, ctx_id: str, samples: list) -> None:
+        """Record the root samples built by a context (level0 runner listener)."""
+        for sample in samples:
+            self._samples.add(str(ctx_id), sample.id)
+
+    def close(self) -> pa.Table:
+        """Finish the files and return (id, key, sample) of every recorded root sample, removing the files."""
+        contexts = self._contexts.close()
+        samples = self._samples.close()
+        return samples.join(contexts, "id", join_type="left outer").select(["id", "key", "sample"])
+
+
+def read_level_table(path: str | Path, level: int = 0, columns: list[str] | None = None) -> pa.Table:
+    """Read the level table of a TACO ZIP straight from its header."""
+    import tacozip
+
+    offset, size = tacozip.read_header(str(path))[level]
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return pq.read_table(BytesIO(f.read(size)), columns=columns)
+
+
+def build_dataset_manifest(
+    paths: list[Path],
+    contexts: pa.Table,
+    previous: pa.Table | None = None,
+    retired: Iterable[str] = (),
+) -> pa.Table:
+    """
+    Manifest of written parts: their root samples joined with their contexts.
+
+    Args:
+        paths: Containers written by this build
+        contexts: Recorded (id, key, sample) of the contexts of this build
+        previous: Manifest of the dataset appended to, its rows for contexts
+                  rebuilt by this build are replaced
+        retired: Parts of previous replaced by this build, their remaining
+                 rows are dropped
+
+    Raises:
+        ValueError: If a root sample id would be in the dataset twice
+    """
+    parts = []
+    for path in paths:
+        ids = read_level_table(path, columns=["id"]).column("id")
+        parts.append(pa.table({"sample": ids, "part": pa.array([Path(path).name] * len(ids), pa.string())}))
+    written = pa.concat_tables(parts) if parts else MANIFEST_SCHEMA.empty_table().select(["sample", "part"])
+    _check_unique(written)
+
+    # Failed contexts have no root sample: they are left out and retried by the next append
+    manifest = written.join(contexts, "sample", join_type="left outer").select(MANIFEST_SCHEMA.names).cast(MANIFEST_SCHEMA)
+    if previous is not None:
+        kept = previous.filter(pc.invert(pc.is_in(previous.column("id"), manifest.column("id"))))
+        kept = kept.filter(pc.invert(pc.is_in(kept.column("part"), pa.array(list(retired), pa.string()))))
+        manifest = pa.concat_tables([kept, manifest])
+        _check_unique(manifest)
+    return manifest
+
+
+def _check_unique(table: pa.Table) -> None:
+    """Raise ValueError if a root sample id appears twice (contexts cannot be told apart)."""
+    n_unique = pc.count_distinct(table.column("sample")).as_py()
+    if n_unique != table.num_rows:
+        counts = pc.value_counts(table.column("sample")).to_pylist()
+        twice = [count["values"] for count in counts if count["counts"] > 1]
+        raise ValueError(
+            f"{table.num_rows - n_unique} root sample id(s) appear more than once in the dataset: {twice[:10]}. "
+            "--append needs root sample ids that are unique across contexts"
+        )
+
+
+def write_dataset_manifest(manifest: pa.Table, directory: str | Path) -> Path:
+    """Write the manifest into directory."""
+    path = Path(directory) / MANIFEST_FILE
+    pq.write_table(manifest, path)
+    return path
+
+
+def read_dataset_manifest(output: str | Path) -> pa.Table | None:
+    """
+    Manifest of the published dataset, None if there is no dataset.
+
+    Falls back to .tacocat/level0.parquet, or the level0 table of a single
+    output file (without context hashes), for datasets built without a
+    manifest.
+    """
+    parent_dir = Path(output).parent
+    path = parent_dir / MANIFEST_FILE
+    if path.exists():
+        table = pq.read_table(path)
+        if "sample" not in table.schema.names:
+            # Manifests without root sample ids keyed contexts by their root sample id
+            table = table.add_column(2, "sample", table.column("id"))
+        return table.select(MANIFEST_SCHEMA.names).cast(MANIFEST_SCHEMA)
+
+    level0 = parent_dir / ".tacocat" / "level0.parquet"
+    if level0.exists():
+        print(f"No {MANIFEST_FILE}, using {level0} (new contexts only, changes are not detected)")
+        table = pq.read_table(level0, columns=["id", "internal:source_file"])
+        ids, parts = table.column("id"), table.column("internal:source_file")
+    elif Path(output).is_file():
+        print(f"No {MANIFEST_FILE}, using {output} (new contexts only, changes are not detected)")
+        ids = read_level_table(output, columns=["id"]).column("id")
+        parts = pa.array([Path(output).name] * len(ids), pa.string())
+    else:
+        return None
+    return pa.table({
+        "id": ids,
+        "key": pa.nulls(len(ids), pa.string()),
+        "sample": ids,
+        "part": parts,
+    }, schema=MANIFEST_SCHEMA)
+
+
+class ChangeFilter:
+    """Selects the contexts to rebuild compared to a manifest."""
+
+    def __init__(self, manifest: pa.Table):
+        self.known: dict[str, str | None] = {}    # context id -> hash
+        self.parts: dict[str, set[str]] = {}      # context id -> parts holding its root samples
+        for ctx_id, key, part in zip(*(manifest.column(name).to_pylist() for name in ("id", "key", "part"))):
+            self.known[ctx_id] = key
+            self.parts.setdefault(ctx_id, set()).add(part)
+        self.n_new = 0
+        self.changed: dict[str, set[str]] = {}  # context id -> parts holding its previous version
+
+    def find(self, contexts: Iterable[dict]) -> None:
+        """First pass: count new contexts and record the changed ones."""
+        for ctx in contexts:
+            ctx_id = str(ctx["id"])
+            if ctx_id not in self.known:
+                self.n_new += 1
+                continue
+            key = self.known[ctx_id]
+            if key is not None and key != context_hash(ctx):
+                self.changed[ctx_id] = self.parts[ctx_id]
+
+    @property
+    def affected(self) -> set[str]:
+        """Parts holding a changed context, rewritten by the append."""
+        return set().union(*self.changed.values())
+
+    def select(self, contexts: Iterable[dict]) -> Iterator[dict]:
+        """Yield new and changed contexts and every other context of an affected part."""
+        affected = self.affected
+        for ctx in contexts:
+            ctx_id = str(ctx["id"])
+            if ctx_id not in self.known or ctx_id in self.changed or self.parts[ctx_id] & affected:
+                yield ctx
+
+    def lost(self, failed_ids: Iterable[str]) -> list[str]:
+        """Failed contexts that would disappear with their affected part."""
+        affected = self.affected
+        return sorted(ctx_id for ctx_id in failed_ids if self.parts.get(ctx_id, set()) & affected)
+
+
+def next_part(output: str | Path, manifest: pa.Table) -> int:
+    """Number of the first new part: after every _partNNNN in the manifest."""
+    pattern = re.compile("^" + re.escape(output_stem(output)) + r"_part(\d+)\.")
+    numbers = [int(m.group(1)) for name in set(manifest.column("part").to_pylist()) if (m := pattern.match(name))]
+    return max(numbers, default=1) + 1
@@ -0,0 +1,264 @@
+"""
+Automatic Worker Sizing
+
+Chooses the number of level0 workers and the threads each of them may use
+when WORKERS and/or WORKER_THREADS_PER_PROCESS are "auto":
+
+- CPUs: the process CPU affinity, capped by the CPU quota of its cgroup and
+  of every cgroup above it (containers, Slurm, Kubernetes limits), not the
+  host core count. The cgroup comes from /proc/self/cgroup (v1 and v2)
+- Memory: what is still available to those cgroups (limit - usage) and to
+  the host (MemAvailable), whichever is lower
+- Per-worker footprint: a fresh worker process builds the first
+  AUTO_PROBE_CONTEXTS contexts and reports its peak RSS. Their results are
+  kept and handed to the runner, so they are not built again
+
+Process-based executors get min(CPUs, AUTO_MEMORY_FRACTION x memory / RSS)
+workers; cores left over when memory is the limit go to the native threads
+of each worker (GDAL, BLAS, OpenMP). The "thread" executor gets CPUs + 4
+threads (I/O-bound). With EXECUTOR = "distributed" and a DISTRIBUTED_ADDRESS,
+the local machine says nothing about the cluster: no sizing is done, and
+WORKERS becomes the number of threads of the cluster's workers. The choice
+and the numbers behind it are printed.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import math
+import os
+import sys
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from pathlib import Path
+from typing import NamedTuple
+
+from dataset.config import AUTO_MEMORY_FRACTION, AUTO_PROBE_CONTEXTS, DISTRIBUTED_ADDRESS
+from dataset.engine.workers import thread_env
+
+_CGROUP = Path("/sys/fs/cgroup")
+
+
+class WorkerPlan(NamedTuple):
+    """Resolved worker configuration."""
+
+    workers: int          # Executor workers
+    threads: int | None   # Native threads per worker, None = leave unset
+
+
+def _read(path: Path) -> str | None:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def cgroup_dirs(controller: str) -> list[Path]:
+    """
+    cgroup directories limiting this process for controller ("cpu" or "memory").
+
+    The process's own cgroup first, then each parent up to the mount root,
+    since a limit set higher up applies too. Only the mount root when
+    /proc/self/cgroup is unreadable or names a cgroup that is not visible
+    here (a container without its own cgroup namespace sees its cgroup as
+    the root).
+    """
+    v2 = (_CGROUP / "cgroup.controllers").exists()
+    root = _CGROUP if v2 else _CGROUP / controller
+    path = None
+    for line in (_read(Path("/proc/self/cgroup")) or "").splitlines():
+        hierarchy, controllers, cgroup = line.split(":", 2)
+        if (v2 and hierarchy == "0") or (not v2 and controller in controllers.split(",")):
+            path = cgroup
+            break
+
+    dirs = []
+    if path:
+        current = root / path.lstrip("/")
+        if current.is_dir():
+            while current != root and root in current.parents:
+                dirs.append(current)
+                current = current.parent
+    dirs.append(root)
+    return dirs
+
+
+def _cpu_quota(directory: Path) -> float | None:
+    """CPUs allowed by the quota of one cgroup directory, None if unlimited."""
+    cpu_max = _read(directory / "cpu.max")  # cgroup v2: "<quota> <period>" or "max <period>"
+    if cpu_max:
+        value, _, period = cpu_max.partition(" ")
+        if value != "max" and period:
+            return int(value) / int(period)
+        return None
+    value = _read(directory / "cpu.cfs_quota_us")  # cgroup v1
+    period = _read(directory / "cpu.cfs_period_us")
+    if value and period and int(value) > 0:
+        return int(value) / int(period)
+    return None
+
+
+def effective_cpus() -> int:
+    """CPUs this process may use: affinity mask, capped by the cgroup quotas."""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+
+    quotas = [quota for quota in map(_cpu_quota, cgroup_dirs("cpu")) if quota is not None]
+    if quotas:
+        cpus = min(cpus, max(1, math.ceil(min(quotas))))
+    return max(1, cpus)
+
+
+def available_memory() -> int | None:
+    """Bytes still available to this process (cgroup and host), None if unknown."""
+    candidates = []
+
+    meminfo = _read(Path("/proc/meminfo"))
+    if meminfo:
+        for line in meminfo.splitlines():
+            if line.startswith("MemAvailable:"):
+                candidates.append(int(line.split()[1]) * 1024)
+                break
+
+    for directory in cgroup_dirs("memory"):
+        limit = _read(directory / "memory.max")  # cgroup v2
+        usage = _read(directory / "memory.current")
+        if limit is None:  # cgroup v1
+            limit = _read(directory / "memory.limit_in_bytes")
+            usage = _read(directory / "memory.usage_in_bytes")
+        if limit and limit != "max" and int(limit) < 2**60:
+            candidates.append(int(limit) - int(usage or 0))
+
+    return max(0, min(candidates)) if candidates else None
+
+
+def _probe(contexts: list[dict], threads: int | None) -> tuple[int | None, list]:
+    """Build contexts in this (fresh) process, return its peak RSS in bytes and their ContextResults."""
+    from dataset.engine.worker import run_context
+    from dataset.engine.workers import init_worker
+
+    init_worker(threads)
+    results = [run_context(ctx) for ctx in contexts]
+
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None, results
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (peak if sys.platform == "darwin" else peak * 1024), results  # bytes on macOS, KiB elsewhere
+
+
+def probe_worker_rss(contexts: list[dict], threads: int | None = 1) -> tuple[int | None, list | None]:
+    """
+    Peak RSS (bytes) of a fresh worker process building contexts.
+
+    Returns:
+        (peak RSS or None if unknown, ContextResults of contexts or None if
+        the warm-up process failed)
+    """
+    if not contexts:
+        return None, None
+    try:
+        with thread_env(threads), ProcessPoolExecutor(max_workers=1) as executor:
+            return executor.submit(_probe, contexts, threads).result()
+    except Exception as e:
+        print(f"WORKERS=auto: warm-up build failed ({e}), sizing on CPUs only")
+        return None, None
+
+
+def cluster_threads(address: str) -> int:
+    """Threads of every worker of the Dask cluster at address."""
+    from distributed import Client
+
+    with Client(address) as client:
+        return max(1, sum(client.nthreads().values()))
+
+
+def plan_workers(
+    kind: str,
+    workers: int | str,
+    threads: int | str | None,
+    probe_contexts: list[dict],
+) -> tuple[WorkerPlan, list | None]:
+    """
+    Resolve "auto" in WORKERS / WORKER_THREADS_PER_PROCESS.
+
+    Args:
+        kind: Executor kind (one of executors.EXECUTORS)
+        workers: WORKERS setting, an int or "auto"
+        threads: WORKER_THREADS_PER_PROCESS setting, an int, "auto" or None
+        probe_contexts: Contexts to build in the RSS warm-up (WORKERS = "auto")
+
+    Returns:
+        (WorkerPlan with concrete numbers, ContextResults of probe_contexts,
+        None if they were not built)
+    """
+    for name, value in (("WORKERS", workers), ("WORKER_THREADS_PER_PROCESS", threads)):
+        if isinstance(value, str) and value != "auto":
+            raise ValueError(f"{name} must be an integer or 'auto', got {value!r}")
+
+    cpus = effective_cpus()
+
+    if kind == "serial":
+        return WorkerPlan(1, None), None
+
+    if kind == "thread":
+        # Threads share the main process, whose native threads are never capped
+        if workers != "auto":
+            return WorkerPlan(workers, None), None
+        print(f"WORKERS=auto: {min(32, cpus + 4)} threads ({cpus} CPUs, I/O-bound thread executor)")
+        return WorkerPlan(min(32, cpus + 4), None), None
+
+    if kind == "distributed" and DISTRIBUTED_ADDRESS is not None:
+        # Remote workers: their machines are sized by whoever started them
+        if workers == "auto":
+            workers = cluster_threads(DISTRIBUTED_ADDRESS)
+            print(f"WORKERS=auto: {workers} tasks at once (threads of the Dask cluster at {DISTRIBUTED_ADDRESS})")
+        return WorkerPlan(workers, None if threads == "auto" else threads), None
+
+    if workers != "auto":
+        return WorkerPlan(workers, max(1, cpus // workers) if threads == "auto" else threads), None
+
+    inner = 1 if threads == "auto" else (threads or 1)
+    memory = available_memory()
+    rss, results = probe_worker_rss(probe_contexts, inner)
+
+    n = max(1, cpus // inner)
+    if memory is not None and rss:
+        n = max(1, min(n, int(memory * AUTO_MEMORY_FRACTION // rss)))
+    plan = WorkerPlan(n, max(1, cpus // n) if threads == "auto" else threads)
+
+    memory_text = f"{memory / 1024**3:.1f} GB available" if memory is not None else "memory unknown"
+    rss_text = f"{rss / 1024**2:.0f} MB peak RSS per worker" if rss else "worker RSS unknown"
+    print(
+        f"WORKERS=auto: {plan.workers} workers x {plan.threads} threads "
+        f"({cpus} CPUs, {memory_text}, {rss_text})"
+    )
+    return plan, results
+
+
+def resolve_workers(
+    kind: str,
+    workers: int | str,
+    threads: int | str | None,
+    contexts: Iterable[dict],
+) -> tuple[WorkerPlan, Iterable[dict], list]:
+    """
+    plan_workers(), taking the warm-up contexts from the head of the stream.
+
+    Returns:
+        (WorkerPlan, contexts still to build, ContextResults of the warm-up
+        contexts). If the warm-up failed, its contexts are put back in front
+        of the stream and no results are returned
+    """
+    probe: list[dict] = []
+    remote = kind == "distributed" and DISTRIBUTED_ADDRESS is not None
+    if workers == "auto" and kind not in ("serial", "thread") and not remote:
+        contexts = iter(contexts)
+        probe = list(islice(contexts, AUTO_PROBE_CONTEXTS))
+    plan, results = plan_workers(kind, workers, threads, probe)
+    if results is None:
+        return plan, chain(probe, contexts), []
+    return plan, contexts, results
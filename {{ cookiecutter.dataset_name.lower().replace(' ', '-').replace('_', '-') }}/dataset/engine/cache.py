@@ -0,0 +1,119 @@
+"""
+Build Cache
+
+Content-addressed cache of built level0 subtrees, so a rebuild only re-runs
+contexts whose inputs changed (or that failed last time).
+
+Cache key = sha256 of:
+- the context dict (canonical JSON)
+- the source of dataset/levels/*.py (SAMPLES builders, extension parameters)
+- the source of dataset/extensions.py, dataset/metadata.py and
+  dataset/config.py, and the tacotoolbox version
+
+Each entry stores the pickled root samples of one context together with the
+(path, size, mtime_ns) of every leaf file. An entry whose leaf files changed
+on disk is treated as a miss. Trees built from Sample(path=bytes) are never
+cached because their temp files do not survive the process (detected by
+their path, see engine/samples.py).
+
+Layout:
+    BUILD_CACHE_DIR/
+    └── ab/
+        └── ab3f...e1.pkl
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+from pathlib import Path
+
+from dataset.engine.samples import leaf_signature, leaves_unchanged, owns_temp_files, restore_padding
+
+DATASET_DIR = Path(__file__).resolve().parents[1]
+
+
+def code_fingerprint() -> str:
+    """Hash everything besides the context that decides what a context builds."""
+    import tacotoolbox
+
+    digest = hashlib.sha256(tacotoolbox.__version__.encode())
+    sources = sorted((DATASET_DIR / "levels").glob("level*.py")) + [
+        DATASET_DIR / name for name in ("extensions.py", "metadata.py", "config.py")
+    ]
+    for source in sources:
+        digest.update(source.name.encode())
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+def context_key(ctx: dict, fingerprint: str) -> str:
+    """Content address of one context under the current code fingerprint."""
+    payload = json.dumps(ctx, sort_keys=True, default=str)
+    return hashlib.sha256(f"{fingerprint}\n{payload}".encode()).hexdigest()
+
+
+class BuildCache:
+    """On-disk cache of built root samples, one pickle per context."""
+
+    def __init__(self, directory: str | Path, fingerprint: str | None = None):
+        self.directory = Path(directory)
+        self.fingerprint = fingerprint or code_fingerprint()
+
+    def key(self, ctx: dict) -> str:
+        return context_key(ctx, self.fingerprint)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.pkl"
+
+    def get(self, key: str) -> list | None:
+        """Return cached root samples, or None on miss or stale leaf files."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or incompatible entry - rebuild it
+            return None
+
+        if not leaves_unchanged(entry["leaves"]):
+            return None
+
+        restore_padding(entry["samples"])
+        return entry["samples"]
+
+    def put(self, key: str, samples: list) -> bool:
+        """Store root samples for a context. Returns False if not cacheable."""
+        if owns_temp_files(samples):
+            return False
+
+        entry = {"samples": samples, "leaves": leaf_signature(samples)}
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write-then-rename so concurrent workers never read a partial entry
+        tmp_path = path.with_suffix(f".tmp{os.getpid()}-{threading.get_ident()}")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+
+
+_CACHE: BuildCache | None = None
+
+
+def get_build_cache() -> BuildCache | None:
+    """Per-process cache configured by BUILD_CACHE / BUILD_CACHE_DIR."""
+    global _CACHE
+    from dataset.config import BUILD_CACHE, BUILD_CACHE_DIR
+
+    if not BUILD_CACHE:
+        return None
+    if _CACHE is None:
+        _CACHE = BuildCache(BUILD_CACHE_DIR)
+    return _CACHE
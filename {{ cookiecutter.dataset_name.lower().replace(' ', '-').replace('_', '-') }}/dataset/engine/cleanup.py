@@ -0,0 +1,140 @@
+"""
+Output Cleanup
+
+Removes the outputs of a previous build (CLEAN_PREVIOUS_OUTPUTS) quickly,
+even for FOLDER outputs with millions of files on parallel file systems:
+
+- The output directory is listed once with os.scandir() and every entry is
+  matched against a single pattern (single file, _partNNNN parts, GROUP_BY
+  files), plus the FOLDER output, .tacocat/ and the docs
+- Directory trees are walked with os.scandir() (no stat per file) and their
+  files unlinked by CLEAN_WORKERS threads, directories removed bottom-up
+- CLEAN_IN_BACKGROUND moves old outputs into .taco_trash/ with a rename
+  (instant, same file system) and deletes them in a background thread while
+  the new build runs. Leftovers of interrupted runs are reclaimed as well.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+TRASH_DIR = ".taco_trash"
+DOC_FILES = ("index.html", "README.md")
+MANIFEST_FILE = ".taco_manifest.parquet"  # Root sample -> context hash, part (see engine/append.py)
+_BATCH = 1024
+
+
+def output_stem(output: str | Path) -> str:
+    """Name of the output without .tacozip / .zip."""
+    stem = Path(output).name
+    for suffix in (".tacozip", ".zip"):
+        if stem.endswith(suffix):
+            return stem[: -len(suffix)]
+    return Path(output).stem
+
+
+def find_previous_outputs(output: str | Path) -> list[Path]:
+    """
+    List the outputs of a previous build in one pass over the output directory.
+
+    Matches:
+    - Single file: output.tacozip, output.zip
+    - Parts: output_part0001.tacozip, output_part0002.tacozip, ...
+    - Groups: output_groupA.tacozip, output_groupB.tacozip, ...
+    - FOLDER: output/
+    - TacoCat: .tacocat/
+    - Docs: index.html, README.md
+    - Manifest: .taco_manifest.parquet
+    """
+    parent_dir = Path(output).parent
+    base_stem = output_stem(output)
+    # Single file, parts and groups share one pattern
+    containers = re.compile("^" + re.escape(base_stem) + r"(_.+)?\.(tacozip|zip)$")
+
+    found = []
+    try:
+        entries = os.scandir(parent_dir)
+    except FileNotFoundError:
+        return found
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name in (base_stem, ".tacocat"):
+                    found.append(Path(entry.path))
+            elif containers.match(entry.name) or entry.name in DOC_FILES or entry.name == MANIFEST_FILE:
+                found.append(Path(entry.path))
+    return sorted(found)
+
+
+def _walk(top: str, files: list[str], dirs: list[str]) -> None:
+    """Collect every file and directory below top (directories parent-first)."""
+    stack = [top]
+    while stack:
+        directory = stack.pop()
+        dirs.append(directory)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    files.append(entry.path)
+
+
+def _unlink_many(paths: list[str]) -> None:
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def remove_paths(paths: list[Path], workers: int = 16) -> None:
+    """Delete files and directory trees, unlinking files in parallel."""
+    files: list[str] = []
+    dirs: list[str] = []
+    for path in paths:
+        if path.is_dir() and not path.is_symlink():
+            _walk(str(path), files, dirs)
+        elif path.exists() or path.is_symlink():
+            files.append(str(path))
+
+    batches = [files[i : i + _BATCH] for i in range(0, len(files), _BATCH)]
+    if len(batches) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="taco-clean") as pool:
+            list(pool.map(_unlink_many, batches))
+    else:
+        for batch in batches:
+            _unlink_many(batch)
+
+    for directory in reversed(dirs):  # Children before their parents
+        os.rmdir(directory)
+
+
+def move_to_trash(paths: list[Path], parent_dir: Path) -> Path:
+    """Rename paths into a fresh directory under parent_dir/.taco_trash/."""
+    trash = parent_dir / TRASH_DIR / uuid.uuid4().hex
+    trash.mkdir(parents=True)
+    for path in paths:
+        path.rename(trash / path.name)
+    return trash
+
+
+def delete_in_background(parent_dir: Path, workers: int = 16) -> threading.Thread:
+    """Delete everything in parent_dir/.taco_trash/ in a background thread."""
+    trash_root = parent_dir / TRASH_DIR
+
+    def run() -> None:
+        try:
+            remove_paths([trash_root], workers)
+        except OSError as e:
+            print(f"WARNING: Background cleanup of {trash_root} failed: {e}")
+
+    # Not a daemon: the process waits for the cleanup before exiting
+    thread = threading.Thread(target=run, name="taco-trash", daemon=False)
+    thread.start()
+    return thread
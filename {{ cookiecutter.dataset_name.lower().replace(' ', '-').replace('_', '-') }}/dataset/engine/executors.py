@@ -0,0 +1,165 @@
+"""
+Executor Backends
+
+Opens the executor level0 runs its contexts on, selected with EXECUTOR in
+dataset/config.py. Every backend exposes the concurrent.futures interface, so
+the runner drives all of them with the same bounded_map():
+
+- "serial":      No executor, contexts are built one by one in this process
+- "thread":      ThreadPoolExecutor, for I/O-bound builders (headers over NFS,
+                 object storage). No pickling, builders must be thread-safe
+- "process":     ProcessPoolExecutor, for CPU-bound builders (default)
+- "loky":        Reusable loky process pool (pip install loky). Uses
+                 cloudpickle, so builders defined interactively also work
+- "distributed": Dask cluster (pip install "dask[distributed]"). Connects to
+                 DISTRIBUTED_ADDRESS, or starts a local cluster with WORKERS
+                 workers when it is None. Every node must be able to import
+                 the dataset package and read the input files
+
+Every worker runs init_worker() (engine/workers.py) once when it starts, so
+thread limits, imports and WORKER_INIT are done before the first context.
+Worker processes started here get the native thread env vars from their
+parent (thread_env()); "serial" and "thread" never touch the environment.
+Worker processes are also capped at LEVEL0_WORKER_MEMORY_LIMIT, and "process"
+workers are replaced after LEVEL0_MAX_TASKS_PER_CHILD tasks.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+from dataset.engine.sizes import parse_size
+from dataset.engine.workers import init_worker, thread_env, thread_env_vars
+
+EXECUTORS = ("serial", "thread", "process", "loky", "distributed")
+
+
+def _memory_limit() -> int | None:
+    """LEVEL0_WORKER_MEMORY_LIMIT in bytes."""
+    from dataset.config import LEVEL0_WORKER_MEMORY_LIMIT
+
+    if LEVEL0_WORKER_MEMORY_LIMIT is None:
+        return None
+    return parse_size(LEVEL0_WORKER_MEMORY_LIMIT, "LEVEL0_WORKER_MEMORY_LIMIT")
+
+
+@contextmanager
+def _thread_executor(workers: int, threads: int | None) -> Iterator[Executor]:
+    init_worker(None)  # Threads share the main process, its native threads are not capped
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="taco-level0") as executor:
+        yield executor
+
+
+@contextmanager
+def _process_executor(workers: int, threads: int | None) -> Iterator[Executor]:
+    from dataset.config import LEVEL0_MAX_TASKS_PER_CHILD
+
+    kwargs = {}
+    if LEVEL0_MAX_TASKS_PER_CHILD:
+        # Python 3.11+, workers are started with "spawn"
+        kwargs["max_tasks_per_child"] = LEVEL0_MAX_TASKS_PER_CHILD
+
+    with thread_env(threads), ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(threads, _memory_limit()),
+        **kwargs,
+    ) as executor:
+        yield executor
+
+
+@contextmanager
+def _loky_executor(workers: int, threads: int | None) -> Iterator[Executor]:
+    try:
+        from loky import get_reusable_executor
+    except ImportError:
+        raise ImportError(
+            'EXECUTOR = "loky" requires loky. Run: pip install loky'
+        ) from None
+
+    # Reusable: workers survive between builds in the same session
+    yield get_reusable_executor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(threads, _memory_limit()),
+        env=thread_env_vars(threads),
+    )
+
+
+@contextmanager
+def _distributed_executor(workers: int, threads: int | None) -> Iterator[Executor]:
+    try:
+        from distributed import Client, LocalCluster
+    except ImportError:
+        raise ImportError(
+            'EXECUTOR = "distributed" requires dask. Run: pip install "dask[distributed]"'
+        ) from None
+
+    from dataset.config import DISTRIBUTED_ADDRESS, DISTRIBUTED_PROCESSES
+
+    if DISTRIBUTED_ADDRESS is None:
+        # Worker processes are started with the thread env vars, in-process workers are not capped
+        env = {"env": thread_env_vars(threads)} if DISTRIBUTED_PROCESSES else {}
+        cluster = LocalCluster(
+            n_workers=workers,
+            threads_per_worker=1,
+            processes=DISTRIBUTED_PROCESSES,
+            dashboard_address=None,
+            **env,
+        )
+        client = Client(cluster)
+        print(f"Started local Dask cluster with {workers} workers")
+    else:
+        cluster = None
+        client = Client(DISTRIBUTED_ADDRESS)
+        print(f"Connected to Dask scheduler at {DISTRIBUTED_ADDRESS}")
+
+    try:
+        # In-process workers share the main process, never cap its memory
+        separate = DISTRIBUTED_ADDRESS is not None or DISTRIBUTED_PROCESSES
+        memory_limit = _memory_limit() if separate else None
+        setup = partial(init_worker, threads if separate else None, memory_limit)
+        client.register_worker_callbacks(setup=setup)  # Current and future workers
+        # pure=False: results depend on files on disk, never deduplicate tasks
+        with client.get_executor(pure=False) as executor:
+            yield executor
+    finally:
+        client.close()
+        if cluster is not None:
+            cluster.close()
+
+
+_BACKENDS = {
+    "thread": _thread_executor,
+    "process": _process_executor,
+    "loky": _loky_executor,
+    "distributed": _distributed_executor,
+}
+
+
+@contextmanager
+def open_executor(kind: str, workers: int, threads: int | None = None) -> Iterator[Executor | None]:
+    """
+    Open the executor for a level0 build.
+
+    Args:
+        kind: One of EXECUTORS
+        workers: Number of workers (threads, processes or Dask workers)
+        threads: Native threads per worker (see engine/workers.py)
+
+    Yields:
+        A concurrent.futures compatible executor, None for "serial"
+    """
+    if kind not in EXECUTORS:
+        raise ValueError(f"Unknown EXECUTOR: {kind!r}. Use one of {EXECUTORS}")
+
+    if kind == "serial":
+        init_worker(None)  # The main process is the only worker, keep its threads
+        yield None
+        return
+
+    with _BACKENDS[kind](workers, threads) as executor:
+        yield executor
@@ -0,0 +1,229 @@
+"""
+Extension Result Cache
+
+Persists the results of expensive SampleExtensions (full-raster statistics,
+headers) across builds, so a rebuild only recomputes them for files that
+changed (EXTENSION_CACHE = True):
+
+    sample.extend_with(cached(GeotiffStats()))
+
+- cached(extension) wraps any SampleExtension, from tacotoolbox or from
+  dataset/extensions.py. The wrapper has the same schema and field
+  descriptions; only FILE samples read from disk are cached, anything else
+  (FOLDER samples, samples built from bytes, schema_only) is computed as usual
+- Key = sha256 of (extension class and its source, extension parameters,
+  tacotoolbox version, absolute path, file size, mtime_ns). Size and mtime
+  come from this build's leaf scan when there is one (engine/scan.py),
+  otherwise from one stat() - a hit costs a lookup, never a read of the file
+- Results are stored as one-row Arrow IPC blobs in a SQLite database,
+  BUILD_CACHE_DIR/extension_cache.sqlite, shared by every worker process
+  (WAL mode). Entries of a changed file are simply never looked up again
+- When the database grows past EXTENSION_CACHE_SIZE, least recently used
+  entries are evicted. Last-use times are refreshed at most once an hour
+  per entry, so hits do not turn into a write each
+- The cache never fails a build: a locked or unreadable database means the
+  extension is computed
+
+In the build profile, extension.CachedExtension counts every call and
+extension.<Name> only the calls that missed.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import hashlib
+import inspect
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import pyarrow as pa
+from tacotoolbox.sample.datamodel import SampleExtension
+
+from dataset.engine.batch import BatchSampleExtension
+from dataset.engine.samples import is_temp_path, stat_leaf
+from dataset.engine.sizes import parse_size
+
+CACHE_FILE = "extension_cache.sqlite"
+_TOUCH_INTERVAL = 3600  # Seconds between last-use refreshes of one entry
+_EVICT_EVERY = 256      # Inserts per connection between size checks
+_EVICT_TO = 0.9         # Evict down to this fraction of the size cap
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+"""
+
+
+class ExtensionCache:
+    """LRU store of one-row extension results in SQLite."""
+
+    def __init__(self, path: str | Path, max_size: int | None = None):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self._inserts = 0
+
+    def get(self, key: str) -> pa.Table | None:
+        row = self.conn.execute("SELECT value, last_used FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, last_used = row
+        now = time.time()
+        if now - last_used > _TOUCH_INTERVAL:
+            with self.conn:
+                self.conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+        return pa.ipc.open_stream(value).read_all()
+
+    def put(self, key: str, table: pa.Table) -> None:
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        value = sink.getvalue().to_pybytes()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+        self._inserts += 1
+        if self.max_size is not None and self._inserts % _EVICT_EVERY == 1:
+            self.evict()
+
+    def size(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache is below its size cap."""
+        if self.max_size is None:
+            return 0
+        size = self.size()
+        if size <= self.max_size:
+            return 0
+        excess = size - int(self.max_size * _EVICT_TO)
+        # Oldest entries first, until the bytes freed before each one reach the excess
+        with self.conn:
+            return self.conn.execute(
+                """
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY last_used, key) - size AS freed_before
+                        FROM results
+                    ) WHERE freed_before < ?
+                )
+                """,
+                (excess,),
+            ).rowcount
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+_local = threading.local()
+
+
+def get_extension_cache() -> ExtensionCache | None:
+    """Per-thread cache configured by EXTENSION_CACHE (sqlite3 connections are not shared across threads)."""
+    from dataset.config import BUILD_CACHE_DIR, EXTENSION_CACHE, EXTENSION_CACHE_SIZE
+
+    if not EXTENSION_CACHE:
+        return None
+    if not hasattr(_local, "cache"):
+        max_size = parse_size(EXTENSION_CACHE_SIZE, "EXTENSION_CACHE_SIZE") if EXTENSION_CACHE_SIZE else None
+        try:
+            _local.cache = ExtensionCache(Path(BUILD_CACHE_DIR) / CACHE_FILE, max_size)
+        except sqlite3.Error as e:
+            print(f"Extension cache disabled in this worker: {e}")
+            _local.cache = None
+    return _local.cache
+
+
+@lru_cache(maxsize=None)
+def _class_fingerprint(cls: type) -> str:
+    """Identity of an extension's code: its name, its source and the tacotoolbox version."""
+    import tacotoolbox
+
+    try:
+        source = inspect.getsource(cls)
+    except (OSError, TypeError):
+        source = ""
+    identity = f"{cls.__module__}.{cls.__qualname__}\n{tacotoolbox.__version__}\n{source}"
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+class CachedExtension(SampleExtension):
+    """Run a SampleExtension through the extension result cache."""
+
+    extension: SampleExtension
+
+    def get_schema(self) -> pa.Schema:
+        return self.extension.get_schema()
+
+    def get_field_descriptions(self) -> dict[str, str]:
+        return self.extension.get_field_descriptions()
+
+    def key(self, sample) -> str | None:
+        """Cache key of this extension on sample, None if the sample cannot be cached."""
+        if sample.type != "FILE" or not isinstance(sample.path, pathlib.Path) or is_temp_path(sample.path):
+            return None
+        path = str(sample.path)
+        size, mtime_ns = stat_leaf(path)
+        params = json.dumps(self.extension.model_dump(mode="json"), sort_keys=True, default=str)
+        payload = f"{_class_fingerprint(type(self.extension))}\n{params}\n{path}\n{size}\n{mtime_ns}"
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _compute(self, sample) -> pa.Table:
+        cache = get_extension_cache()
+        if cache is None or self.extension.schema_only:
+            return self.extension(sample)
+        try:
+            key = self.key(sample)
+        except OSError:
+            key = None
+        if key is None:
+            return self.extension(sample)
+
+        try:
+            table = cache.get(key)
+        except (sqlite3.Error, pa.ArrowInvalid):
+            table = None
+        if table is not None:
+            return table
+
+        table = self.extension(sample)
+        try:
+            cache.put(key, table)
+        except sqlite3.Error:
+            pass  # Locked by another worker for too long: keep building
+        return table
+
+
+def cached(extension: SampleExtension) -> CachedExtension:
+    """
+    Reuse the results of extension across builds for unchanged files.
+
+    Args:
+        extension: SampleExtension instance, e.g. GeotiffStats()
+
+    Returns:
+        An extension to pass to sample.extend_with() instead
+
+    Raises:
+        TypeError: For BatchSampleExtensions (their parameters are per batch,
+                   not per file)
+    """
+    if isinstance(extension, BatchSampleExtension):
+        raise TypeError(f"cached() does not support BatchSampleExtensions, got {type(extension).__name__}")
+    if not isinstance(extension, SampleExtension):
+        raise TypeError(f"cached() expects a SampleExtension, got {type(extension).__name__}")
+    return CachedExtension(extension=extension)
@@ -0,0 +1,115 @@
+"""
+Failure Manifest
+
+Structured record of contexts that could not be built, written to
+BUILD_STATE_DIR/failed_contexts.parquet at the end of every build (and
+removed when nothing failed). Retry them with:
+
+    python dataset/create.py --only-failed
+
+which rebuilds only those contexts and takes every other one from the
+checkpoint journal of the failed build (kept while failures are recorded).
+
+Columns:
+    id          - context id
+    error_type  - exception class name
+    error       - exception message
+    traceback   - formatted traceback from the worker
+    duration_s  - wall time spent on the context, all attempts included
+    attempts    - number of attempts made
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FAILURE_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("error_type", pa.string()),
+    ("error", pa.string()),
+    ("traceback", pa.string()),
+    ("duration_s", pa.float64()),
+    ("attempts", pa.int32()),
+])
+
+
+def write_failures(results: list, path: str | Path) -> None:
+    """Write failed ContextResults to Parquet, or remove a stale manifest if none failed."""
+    path = Path(path)
+    if not results:
+        path.unlink(missing_ok=True)
+        return
+
+    table = pa.table(
+        {
+            "id": [r.id for r in results],
+            "error_type": [r.error_type for r in results],
+            "error": [r.error for r in results],
+            "traceback": [r.traceback for r in results],
+            "duration_s": [r.duration for r in results],
+            "attempts": [r.attempts for r in results],
+        },
+        schema=FAILURE_SCHEMA,
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, path)
+
+
+def read_failed_ids(path: str | Path) -> set[str]:
+    """Return the ids listed in a failure manifest (empty if there is none)."""
+    path = Path(path)
+    if not path.exists():
+        return set()
+    return set(pq.read_table(path, columns=["id"]).column("id").to_pylist())
+
+
+def check_covered(contexts: Iterable[dict], failed_ids: set[str], checkpointed: set[str]) -> None:
+    """
+    Check that an --only-failed build can write the dataset complete.
+
+    Runs before the previous outputs are cleaned, so a retry that cannot
+    succeed leaves them in place.
+
+    Raises:
+        ValueError: If some context neither failed nor is checkpointed
+    """
+    uncovered = [ctx["id"] for ctx in contexts if ctx["id"] not in failed_ids and ctx["id"] not in checkpointed]
+    if not uncovered:
+        return
+    more = f" ... (+{len(uncovered) - 10} more)" if len(uncovered) > 10 else ""
+    if checkpointed:
+        reason = "They are new, or their leaf files changed since they were checkpointed. Run a full build or --resume"
+    else:
+        reason = (
+            "Nothing is checkpointed: the journal was cleared, or the contexts were built from bytes "
+            "(never checkpointed). Run a full build"
+        )
+    raise ValueError(
+        f"{len(uncovered)} context(s) did not fail in the previous build and are not checkpointed: "
+        f"{uncovered[:10]}{more}. {reason} instead"
+    )
+
+
+def select_failed(contexts: Iterable[dict], failed_ids: set[str], checkpointed: set[str]) -> Iterator[dict]:
+    """
+    Contexts of an --only-failed build: failed ones and those in the journal.
+
+    Failed contexts are rebuilt, checkpointed ones are resumed, so the
+    dataset is written complete without building anything else.
+
+    Raises:
+        ValueError: For a context that is neither (new, or its leaf files
+                    changed since it was checkpointed)
+    """
+    for ctx in contexts:
+        ctx_id = ctx["id"]
+        if ctx_id not in failed_ids and ctx_id not in checkpointed:
+            raise ValueError(
+                f"Context {ctx_id} did not fail in the previous build and is not checkpointed "
+                f"(new, or its leaf files changed): run a full build or --resume instead"
+            )
+        yield ctx
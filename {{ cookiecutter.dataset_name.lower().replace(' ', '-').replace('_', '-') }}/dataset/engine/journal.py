@@ -0,0 +1,145 @@
+"""
+Build Journal
+
+Checkpoints finished level0 contexts during a build so an interrupted build
+(crash, KeyboardInterrupt, preempted node) can continue with --resume instead
+of starting over.
+
+The journal is a directory of append-only pickled segments. A segment is
+written every CHECKPOINT_EVERY contexts or CHECKPOINT_INTERVAL seconds,
+fsynced and renamed into place, so a crash never leaves a partial segment.
+Each segment starts with a small header (context ids and leaf signatures)
+followed by the samples, so resuming reads every header up front but the
+samples of one segment at a time. The journal is cleared once the build has
+been published (kept while failed contexts await --only-failed).
+
+Layout:
+    BUILD_STATE_DIR/journal/
+    ├── segment_000001.pkl
+    └── segment_000002.pkl
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import os
+import pickle
+import time
+from pathlib import Path
+
+from dataset.engine.samples import leaf_signature, leaves_unchanged, owns_temp_files, restore_padding
+
+
+class Journal:
+    """Append-only checkpoint log of finished contexts."""
+
+    def __init__(self, directory: str | Path, every: int = 500, interval: float = 300.0):
+        self.directory = Path(directory)
+        self.every = every
+        self.interval = interval
+        self._buffer: list[tuple[str, list, list]] = []
+        self._last_flush = time.monotonic()
+        self._next_segment = 1 + len(self._segments())
+
+    def _segments(self) -> list[Path]:
+        return sorted(self.directory.glob("segment_*.pkl"))
+
+    def has_checkpoints(self) -> bool:
+        """True if a flushed segment holds finished contexts."""
+        return bool(self._segments())
+
+    def reset(self) -> None:
+        """Forget all checkpoints (start of a fresh build)."""
+        for segment in self._segments():
+            segment.unlink()
+        self._buffer.clear()
+        self._next_segment = 1
+
+    def clear(self) -> None:
+        """Forget all checkpoints and remove the journal directory (build published)."""
+        self.reset()
+        for leftover in self.directory.glob("segment_*.tmp"):
+            leftover.unlink()
+        try:
+            self.directory.rmdir()
+        except OSError:
+            pass
+
+    def load(self) -> "JournalReader":
+        """
+        Index every checkpointed context, without loading its samples.
+
+        Entries whose leaf files changed since they were checkpointed are
+        dropped so those contexts get rebuilt.
+        """
+        segments = {}
+        for segment in self._segments():
+            with open(segment, "rb") as f:
+                header = pickle.load(f)  # The samples that follow are not read
+            for ctx_id, leaves in header:
+                if leaves_unchanged(leaves):
+                    segments[ctx_id] = segment
+        return JournalReader(segments)
+
+    def record(self, ctx_id: str, samples: list) -> None:
+        """Buffer a finished context and flush when a checkpoint is due."""
+        # Trees built from bytes live in temp files private to this build
+        if owns_temp_files(samples):
+            return
+
+        self._buffer.append((ctx_id, samples, leaf_signature(samples)))
+
+        due = len(self._buffer) >= self.every or time.monotonic() - self._last_flush >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered contexts as a new segment."""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"segment_{self._next_segment:06d}.pkl"
+        tmp_path = path.with_suffix(".tmp")
+
+        with open(tmp_path, "wb") as f:
+            pickle.dump([(ctx_id, leaves) for ctx_id, _, leaves in self._buffer], f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump([samples for _, samples, _ in self._buffer], f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        self._buffer = []
+        self._next_segment += 1
+
+
+class JournalReader:
+    """Checkpointed contexts of a journal, with the samples of one segment in memory at a time."""
+
+    def __init__(self, segments: dict[str, Path]):
+        self._segments = segments
+        self._path: Path | None = None
+        self._samples: dict[str, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def __contains__(self, ctx_id: str) -> bool:
+        return ctx_id in self._segments
+
+    def ids(self) -> set[str]:
+        return set(self._segments)
+
+    def pop(self, ctx_id: str) -> list:
+        """Root samples of a checkpointed context, loading its segment if needed."""
+        path = self._segments.pop(ctx_id)
+        if path != self._path:
+            self._samples = {}  # Release the previous segment first
+            with open(path, "rb") as f:
+                header = pickle.load(f)
+                samples = pickle.load(f)
+            self._samples = {ctx_id: batch for (ctx_id, _), batch in zip(header, samples)}
+            self._path = path
+        samples = self._samples.pop(ctx_id)
+        restore_padding(samples)
+        return samples
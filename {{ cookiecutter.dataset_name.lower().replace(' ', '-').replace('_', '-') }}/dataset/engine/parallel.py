@@ -0,0 +1,133 @@
+"""
+Bounded Parallel Map
+
+Runs a function over a (possibly huge) stream of items with an executor while
+keeping memory flat:
+
+- Items are grouped into chunks so one task carries many items, spreading the
+  IPC round trip over the whole chunk.
+- At most max_inflight chunks are pending or buffered at any time, so the input
+  stream is consumed at the speed results are used, not all at once.
+- Results are yielded in input order (preserve_order=True) or as soon as their
+  chunk finishes (preserve_order=False), so a straggler never holds back
+  completed work.
+- throttle() is asked before every submission: while it returns True (e.g.
+  memory is low) no new chunk is submitted, as long as one is still running.
+- When a worker process dies and breaks the pool, every result that did
+  complete is still yielded, then ExecutorBroken reports the items whose
+  results were lost so the caller can rerun them on a fresh pool.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import itertools
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, Executor, Future, wait
+
+
+class ExecutorBroken(Exception):
+    """A worker died and broke the executor; lost holds the unfinished items."""
+
+    def __init__(self, lost: list, cause: BaseException):
+        super().__init__(f"Executor broke with {len(lost)} items in flight: {cause}")
+        self.lost = lost
+        self.cause = cause
+
+
+def _run_chunk(fn: Callable, chunk: list) -> list:
+    """Apply fn to every item of a chunk (runs inside the worker)."""
+    return [fn(item) for item in chunk]
+
+
+def iter_chunks(items: Iterable, chunksize: int) -> Iterator[list]:
+    """Lazily split an iterable into lists of up to chunksize items."""
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, chunksize)):
+        yield chunk
+
+
+def bounded_map(
+    executor: Executor,
+    fn: Callable,
+    items: Iterable,
+    chunksize: int = 1,
+    max_inflight: int = 8,
+    preserve_order: bool = True,
+    throttle: Callable[[], bool] | None = None,
+) -> Iterator:
+    """
+    Lazy, memory-bounded equivalent of executor.map(fn, items, chunksize=...).
+
+    Args:
+        executor: Any concurrent.futures executor
+        fn: Function applied to each item, must be picklable for process pools
+        items: Iterable of items, consumed lazily
+        chunksize: Number of items sent to a worker per task
+        max_inflight: Maximum number of chunks submitted or buffered at once
+        preserve_order: Yield results in input order instead of completion order
+        throttle: Returns True while no new chunk should be submitted
+
+    Yields:
+        fn(item) for every item
+
+    Raises:
+        ExecutorBroken: If the executor broke (a worker process died), after
+            yielding every result that completed
+    """
+    chunks = enumerate(iter_chunks(items, max(1, chunksize)))
+    max_inflight = max(1, max_inflight)
+
+    pending: dict[Future, tuple[int, list]] = {}
+    buffered: dict[int, list] = {}
+    next_index = 0
+    exhausted = False
+
+    try:
+        while True:
+            # Refill the window (always keep one chunk running, even when throttled)
+            while not exhausted and len(pending) + len(buffered) < max_inflight:
+                if pending and throttle is not None and throttle():
+                    break
+                try:
+                    index, chunk = next(chunks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(_run_chunk, fn, chunk)] = (index, chunk)
+
+            if not pending and not buffered:
+                return
+
+            if pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                if any(isinstance(future.exception(), BrokenExecutor) for future in done):
+                    # A broken pool fails every pending future, collect what survived
+                    wait(pending)
+                    lost = []
+                    cause = None
+                    for future, (index, chunk) in sorted(pending.items(), key=lambda item: item[1][0]):
+                        error = future.exception()
+                        if error is None:
+                            buffered[index] = future.result()
+                        else:
+                            cause = cause or error
+                            lost.extend(chunk)
+                    pending.clear()
+                    for index in sorted(buffered):
+                        yield from buffered.pop(index)
+                    raise ExecutorBroken(lost, cause)
+
+                for future in done:
+                    index, _ = pending.pop(future)
+                    if preserve_order:
+                        buffered[index] = future.result()
+                    else:
+                        yield from future.result()
+
+            # Emit every chunk that is next in line
+            while next_index in buffered:
+                yield from buffered.pop(next_index)
+                next_index += 1
+    finally:
+        for future in pending:
+            future.cancel()
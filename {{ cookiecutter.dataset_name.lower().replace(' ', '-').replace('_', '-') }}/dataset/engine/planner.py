@@ -0,0 +1,232 @@
+"""
+Part Planner
+
+Decides which root samples go into which ZIP container before anything is
+written (BALANCED_PARTS = True), and prints the plan:
+
+- Sizes come from sample._size_bytes: every leaf file is stat'ed once when
+  its sample is built in the level0 workers (in parallel), and cached
+  subtrees carry their sizes in the build cache, so planning does no I/O
+- A level0 sample is never split: it goes into one part with all its
+  children, so every subtree is read from a single container
+- Parts stay contiguous (samples keep their order) and there are as many of
+  them as tacotoolbox's greedy SPLIT_SIZE rule would write, but cut at the
+  size quantiles so they have near-equal sizes instead of full parts followed
+  by a small tail. If that would push a part over SPLIT_SIZE (a few very
+  large samples), the parts are packed for the smallest largest part instead
+- GROUP_BY: samples are grouped as tacotoolbox does (one container per
+  group value, output_<group>.tacozip), and a group larger than SPLIT_SIZE
+  is split the same way into output_<group>_partNNNN.tacozip
+
+A sample larger than SPLIT_SIZE gets a part of its own.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import math
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, NamedTuple
+
+_REPORT_LINES = 20
+
+
+class PlannedPart(NamedTuple):
+    """One container of a plan."""
+
+    path: Path
+    indices: list[int]  # Positions of its root samples in taco.tortilla.samples
+    size: int           # Bytes of sample data
+
+
+def part_path(output: Path, index: int) -> Path:
+    """Path of part number index (1-based), as named by tacotoolbox.create()."""
+    return output.parent / f"{output.stem}_part{index:04d}{output.suffix}"
+
+
+def group_filename(value: str) -> str:
+    """GROUP_BY value as tacotoolbox.create() puts it in a file name: unsafe characters become _."""
+    name = re.sub(r'[/\\:*?"<>|\']', "_", value)
+    return re.sub(r"[_\s]+", "_", name).strip("_")
+
+
+def greedy_cuts(prefix: list[int], capacity: int) -> list[int]:
+    """
+    End index of each part when parts are filled up to capacity in order.
+
+    Same rule as tacotoolbox.create(): a sample that does not fit closes the
+    part, a sample larger than capacity gets a part of its own.
+
+    Args:
+        prefix: Cumulative sizes, prefix[i] = bytes of the first i samples
+        capacity: Max bytes per part
+    """
+    n = len(prefix) - 1
+    cuts = []
+    start = 0
+    while start < n:
+        end = bisect_right(prefix, prefix[start] + capacity, lo=start + 1) - 1
+        end = max(end, start + 1)
+        cuts.append(end)
+        start = end
+    return cuts
+
+
+def _fits(prefix: list[int], cuts: list[int], max_size: int) -> bool:
+    start = 0
+    for end in cuts:
+        if prefix[end] - prefix[start] > max_size and end - start > 1:
+            return False
+        start = end
+    return True
+
+
+def _quantile_cuts(prefix: list[int], k: int) -> list[int]:
+    """k contiguous parts cut where the cumulative size is closest to j/k of the total."""
+    n = len(prefix) - 1
+    total = prefix[-1]
+    cuts = []
+    start = 0
+    for j in range(1, k):
+        target = total * j / k
+        last = n - (k - j)  # Leave at least one sample per remaining part
+        end = min(bisect_left(prefix, target, lo=start + 1, hi=last + 1), last)
+        if end > start + 1 and target - prefix[end - 1] < prefix[end] - target:
+            end -= 1
+        cuts.append(end)
+        start = end
+    cuts.append(n)
+    return cuts
+
+
+def _min_max_cuts(prefix: list[int], k: int, max_size: int) -> list[int]:
+    """At most k contiguous parts with the smallest possible largest part."""
+    low, high = math.ceil(prefix[-1] / k), max_size
+    while low < high:
+        capacity = (low + high) // 2
+        if len(greedy_cuts(prefix, capacity)) <= k:
+            high = capacity
+        else:
+            low = capacity + 1
+    return greedy_cuts(prefix, high)
+
+
+def balanced_cuts(sizes: list[int], max_size: int | None) -> list[int]:
+    """
+    End index of each part: as many parts as the greedy rule needs, of near-equal size.
+
+    Args:
+        sizes: Bytes of each root sample, in order
+        max_size: Max bytes per part, None = a single part
+    """
+    if max_size is None or not sizes:
+        return [len(sizes)]
+    prefix = list(accumulate(sizes, initial=0))
+    k = len(greedy_cuts(prefix, max_size))
+    if k == 1:
+        return [len(sizes)]
+    cuts = _quantile_cuts(prefix, k)
+    if _fits(prefix, cuts, max_size):
+        return cuts
+    return _min_max_cuts(prefix, k, max_size)
+
+
+def _group_indices(taco: Any, group_by: str | list[str]) -> dict[str, list[int]]:
+    """Positions of the root samples of each GROUP_BY value, groups in order of appearance."""
+    table = taco.tortilla.export_metadata(deep=0)
+    columns = [group_by] if isinstance(group_by, str) else list(group_by)
+    missing = [column for column in columns if column not in table.schema.names]
+    if missing:
+        raise ValueError(f"GROUP_BY column(s) {missing} not in the level0 metadata: {table.schema.names}")
+
+    values = [table.column(column).to_pylist() for column in columns]
+    groups: dict[str, list[int]] = {}
+    for index, row in enumerate(zip(*values)):
+        groups.setdefault("_".join(str(value) for value in row), []).append(index)
+    return groups
+
+
+def plan_layout(
+    taco: Any,
+    output: str | Path,
+    max_size: int | None,
+    group_by: str | list[str] | None = None,
+    balanced: bool = True,
+    first_part: int = 1,
+) -> list[PlannedPart]:
+    """
+    Assign the root samples of taco to containers.
+
+    Args:
+        taco: Complete Taco
+        output: Output path (.tacozip / .zip)
+        max_size: Max bytes per part, None = no splitting
+        group_by: Column(s) to group by, None = no grouping
+        balanced: Near-equal parts (and split groups larger than max_size),
+                  False = the layout tacotoolbox.create() writes
+        first_part: Number of the first part, > 1 always names parts
+                    _partNNNN (appending to an existing dataset)
+
+    Returns:
+        Planned containers, in write order
+    """
+    output = Path(output)
+    sizes = [sample._size_bytes for sample in taco.tortilla.samples]
+
+    if group_by is None:
+        groups = {None: list(range(len(sizes)))}
+    else:
+        groups = _group_indices(taco, group_by)
+
+    plan = []
+    for key, indices in groups.items():
+        group_sizes = [sizes[i] for i in indices]
+        if balanced:
+            cuts = balanced_cuts(group_sizes, max_size)
+        elif group_by is None and max_size is not None:
+            cuts = greedy_cuts(list(accumulate(group_sizes, initial=0)), max_size)
+        else:
+            cuts = [len(indices)]  # tacotoolbox writes a group as one container whatever its size
+
+        base = output if key is None else output.parent / f"{output.stem}_{group_filename(key)}{output.suffix}"
+        start = 0
+        for number, end in enumerate(cuts, start=first_part):
+            if len(cuts) == 1 and first_part == 1:
+                path = base
+            else:
+                path = part_path(base, number)
+            plan.append(PlannedPart(path, indices[start:end], sum(group_sizes[start:end])))
+            start = end
+    return plan
+
+
+def _format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def print_plan(plan: list[PlannedPart], max_size: int | None) -> None:
+    """Print the containers about to be written and how even they are."""
+    sizes = [part.size for part in plan]
+    n_samples = sum(len(part.indices) for part in plan)
+    limit = f"SPLIT_SIZE {_format_bytes(max_size)}" if max_size is not None else "no SPLIT_SIZE"
+    print(f"Planned {len(plan)} container(s): {n_samples} root samples, {_format_bytes(sum(sizes))} ({limit})")
+    if len(plan) > 1:
+        mean = sum(sizes) / len(sizes)
+        spread = max(sizes) / mean if mean else 1.0
+        print(
+            f"  smallest {_format_bytes(min(sizes))}, largest {_format_bytes(max(sizes))}, "
+            f"mean {_format_bytes(mean)} (largest/mean {spread:.2f})"
+        )
+    for part in plan[:_REPORT_LINES]:
+        over = ""
+        if max_size is not None and part.size > max_size:
+            over = "  > SPLIT_SIZE (single sample)" if len(part.indices) == 1 else "  > SPLIT_SIZE"
+        print(f"  {part.path.name:<40} {len(part.indices):>8} samples {_format_bytes(part.size):>10}{over}")
+    if len(plan) > _REPORT_LINES:
+        print(f"  ... {len(plan) - _REPORT_LINES} more")
@@ -0,0 +1,241 @@
+"""
+Pre-flight Check
+
+python dataset/create.py --preflight N builds a stratified random sample of N
+contexts before committing to a full build, and fails within minutes when the
+full build would fail after hours:
+
+- Contexts are drawn from the whole iter_contexts(LEVEL0_SAMPLE_LIMIT) stream
+  (not the first N), with one reservoir per stratum (PREFLIGHT_STRATIFY_BY) so
+  rare groups are represented, and a fixed PREFLIGHT_SEED for reproducible
+  samples
+- Every sampled context runs through the real level0 workers, so all levels,
+  builders and extensions execute
+- Schemas and PIT structure are checked across the sample (SchemaValidator),
+  then the sample is wrapped in a Taco with Tortilla/TACO extensions applied
+- Build time, data size, metadata size and number of parts are projected from
+  the measured per-context cost and compared with the free disk space
+
+Nothing is written besides BUILD_STATE_DIR/preflight.json.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import json
+import math
+import random
+import shutil
+import time
+from collections import defaultdict
+from collections.abc import Callable, Hashable, Iterable
+from pathlib import Path
+
+
+def _stratum(ctx: dict, stratify_by: str | list[str] | None) -> Hashable:
+    if stratify_by is None:
+        return None
+    if isinstance(stratify_by, str):
+        return str(ctx.get(stratify_by))
+    return tuple(str(ctx.get(key)) for key in stratify_by)
+
+
+def _allocate(counts: dict, n: int) -> dict:
+    """Split n draws over strata proportionally to their size, at least one each."""
+    strata = sorted(counts, key=counts.get, reverse=True)
+    if n <= len(strata):
+        return {key: 1 for key in strata[:n]}
+
+    total = sum(counts.values())
+    quotas = {key: n * counts[key] / total for key in strata}
+    allocation = {key: max(1, int(quota)) for key, quota in quotas.items()}
+    remaining = n - sum(allocation.values())
+    for key in sorted(strata, key=lambda k: quotas[k] - int(quotas[k]), reverse=True)[: max(0, remaining)]:
+        allocation[key] += 1
+    return allocation
+
+
+def stratified_sample(
+    contexts: Iterable[dict],
+    n: int,
+    stratify_by: str | list[str] | None = None,
+    seed: int = 0,
+) -> tuple[list[dict], int, dict]:
+    """
+    Draw about n contexts in one pass over a stream of unknown length.
+
+    Args:
+        contexts: Iterable of context dicts, consumed once
+        n: Number of contexts to draw
+        stratify_by: Context key(s) defining the strata, None = uniform sample
+        seed: Random seed
+
+    Returns:
+        (sampled contexts, total number of contexts, contexts per stratum)
+    """
+    rng = random.Random(seed)
+    reservoirs: dict[Hashable, list[dict]] = {}
+    counts: dict[Hashable, int] = defaultdict(int)
+
+    for ctx in contexts:
+        key = _stratum(ctx, stratify_by)
+        counts[key] += 1
+        reservoir = reservoirs.setdefault(key, [])
+        if len(reservoir) < n:
+            reservoir.append(ctx)
+        else:
+            j = rng.randrange(counts[key])
+            if j < n:
+                reservoir[j] = ctx
+
+    sample = []
+    for key, k in _allocate(counts, n).items():
+        reservoir = reservoirs[key]
+        sample.extend(rng.sample(reservoir, min(k, len(reservoir))))
+
+    return sample, sum(counts.values()), dict(counts)
+
+
+def _format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {secs:02d}s"
+    return f"{seconds:.1f}s"
+
+
+def run_preflight(n: int, make_taco: Callable) -> bool:
+    """
+    Build a sample of n contexts and project the full build.
+
+    Args:
+        n: Number of contexts to sample
+        make_taco: Builds a Taco from root samples (taco.create_part_taco)
+
+    Returns:
+        True if the sample built and validated and the projection fits on disk
+    """
+    from dataset.config import (
+        BUILD_STATE_DIR,
+        LEVEL0_PARALLEL,
+        LEVEL0_SAMPLE_LIMIT,
+        OUTPUT_PATH,
+        PREFLIGHT_SEED,
+        PREFLIGHT_STRATIFY_BY,
+        SPLIT_SIZE,
+        WORKERS,
+    )
+    from dataset.engine.profiling import get_profile
+    from dataset.engine.runner import iter_results
+    from dataset.engine.sizes import parse_size
+    from dataset.engine.validation import SchemaValidationError, SchemaValidator
+    from dataset.metadata import iter_contexts
+
+    print(f"Pre-flight: drawing {n} contexts" + (f" stratified by {PREFLIGHT_STRATIFY_BY}" if PREFLIGHT_STRATIFY_BY else ""))
+    start = time.perf_counter()
+    contexts, total, strata = stratified_sample(iter_contexts(limit=LEVEL0_SAMPLE_LIMIT), n, PREFLIGHT_STRATIFY_BY, PREFLIGHT_SEED)
+    scan_s = time.perf_counter() - start
+    print(f"Sampled {len(contexts)} of {total} contexts from {len(strata)} strata in {scan_s:.1f}s")
+
+    if not contexts:
+        print("✗ iter_contexts() yielded no contexts")
+        return False
+
+    # Build the sample on the configured executor
+    validator = SchemaValidator()
+    samples = []
+    durations = []
+    failures = []
+    data_bytes = 0
+    start = time.perf_counter()
+    try:
+        for result in iter_results(contexts, LEVEL0_PARALLEL, WORKERS):
+            if result.error:
+                failures.append(result)
+                print(f"✗ Context {result.id} failed after {result.attempts} attempt(s): {result.error}")
+                continue
+            validator.add(result.id, result.samples)
+            samples.extend(result.samples)
+            data_bytes += sum(sample._size_bytes for sample in result.samples)
+            if not result.cached:
+                durations.append(result.duration)
+    except SchemaValidationError as e:
+        print(f"✗ Schema validation failed: {e}")
+        return False
+    build_s = time.perf_counter() - start
+
+    if failures:
+        print(f"\n✗ {len(failures)} of {len(contexts)} sampled contexts failed, see the errors above")
+        return False
+    print(f"✓ Built {len(contexts)} contexts in {build_s:.1f}s, schemas and PIT structure consistent")
+
+    # Tortilla/TACO extensions and Taco validation (PIT) on the sample
+    try:
+        taco = make_taco(samples)
+    except Exception as e:
+        print(f"✗ Taco creation failed on the sample: {e}")
+        return False
+    metadata_bytes = sum(
+        taco.tortilla.export_metadata(deep=depth).nbytes for depth in range(taco.tortilla._current_depth + 1)
+    )
+    print("✓ Taco created with Tortilla/TACO extensions")
+
+    # Projection
+    scale = total / len(contexts)
+    workers = get_profile().workers  # Resolved by the runner (WORKERS = "auto")
+    per_context_s = sum(durations) / len(durations) if durations else None
+    projected_s = per_context_s * total / workers if per_context_s is not None else None
+    projected_data = data_bytes * scale
+    projected_metadata = metadata_bytes * scale
+    max_part = parse_size(SPLIT_SIZE, "SPLIT_SIZE") if SPLIT_SIZE else None
+    parts = max(1, math.ceil(projected_data / max_part)) if max_part else 1
+
+    output_dir = Path(OUTPUT_PATH).resolve().parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+    free = shutil.disk_usage(output_dir).free
+    fits = projected_data + projected_metadata < free
+
+    print(f"\nProjection for {total} contexts ({workers} worker(s)):")
+    if projected_s is not None:
+        print(f"  Build time:     {_format_seconds(projected_s)} ({per_context_s * 1e3:.0f} ms per context)")
+    else:
+        print("  Build time:     n/a (every sampled context came from the build cache)")
+    print(f"  Data size:      {_format_bytes(projected_data)} in {parts} part(s)")
+    print(f"  Metadata size:  {_format_bytes(projected_metadata)} (uncompressed Arrow)")
+    print(f"  Free disk:      {_format_bytes(free)} in {output_dir} {'✓' if fits else '✗'}")
+
+    report = {
+        "sampled": len(contexts),
+        "total_contexts": total,
+        "strata": {str(key): count for key, count in strata.items()},
+        "scan_s": round(scan_s, 3),
+        "build_s": round(build_s, 3),
+        "per_context_s": per_context_s,
+        "workers": workers,
+        "projected_build_s": projected_s,
+        "projected_data_bytes": int(projected_data),
+        "projected_metadata_bytes": int(projected_metadata),
+        "projected_parts": parts,
+        "free_disk_bytes": free,
+        "fits_on_disk": fits,
+    }
+    report_path = Path(BUILD_STATE_DIR) / "preflight.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nPre-flight report written to {report_path}")
+
+    if not fits:
+        print("✗ Projected output does not fit on disk")
+        return False
+    print("✓ Pre-flight passed")
+    return True
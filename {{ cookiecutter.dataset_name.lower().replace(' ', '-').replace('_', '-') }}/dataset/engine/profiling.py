@@ -0,0 +1,354 @@
+"""
+Build Profiling
+
+Records where a build spends its time (PROFILE = True in config.py):
+
+- Wall time of every create.py stage (cleaning, streaming contexts, level0,
+  validation, writing, docs). Stages opened inside another one (level0
+  inside build, load_contexts inside level0) are reported under it, as a
+  share of their parent. Stages fed by a generator (level0, load_contexts)
+  count only the time spent producing items, not the consumer's
+- Latency histograms of every SAMPLES builder (per level, inclusive of the
+  levels below it) and of every SampleExtension, measured inside the workers
+  and shipped back with each context result. SampleExtension.__call__ is
+  wrapped only while a context is being built and restored afterwards
+- Worker utilization (busy time / level0 wall time x workers) and peak RSS
+  of the main process and of the workers
+
+The report is written to BUILD_STATE_DIR/build_profile.json and printed as a
+table at the end of the build. PROFILER = "cprofile" or "pyinstrument"
+additionally profiles the main process (build_profile.prof / .html).
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import json
+import math
+import sys
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from dataset.config import PROFILE
+
+# Worker side: raw durations recorded since the last drain()
+_timings: dict[str, list[float]] = defaultdict(list)
+_lock = threading.Lock()
+_hook_users = 0
+_original_call = None
+
+
+def record(name: str, seconds: float) -> None:
+    """Record one duration under name (builder or extension)."""
+    with _lock:
+        _timings[name].append(seconds)
+
+
+def drain() -> dict[str, list[float]] | None:
+    """Return and reset the durations recorded in this process."""
+    global _timings
+    if not PROFILE:
+        return None
+    with _lock:
+        timings, _timings = dict(_timings), defaultdict(list)
+    return timings
+
+
+@contextmanager
+def extension_timing() -> Iterator[None]:
+    """
+    Time every SampleExtension call in this process inside the with-block.
+
+    Reentrant and thread-safe: the first block entered wraps
+    SampleExtension.__call__, the last one left restores it.
+    """
+    global _hook_users, _original_call
+    if not PROFILE:
+        yield
+        return
+
+    from tacotoolbox.sample.datamodel import SampleExtension
+
+    with _lock:
+        if _hook_users == 0:
+            original = _original_call = SampleExtension.__call__
+
+            def timed_call(self, sample):
+                start = time.perf_counter()
+                try:
+                    return original(self, sample)
+                finally:
+                    record(f"extension.{type(self).__name__}", time.perf_counter() - start)
+
+            SampleExtension.__call__ = timed_call
+        _hook_users += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _hook_users -= 1
+            if _hook_users == 0:
+                SampleExtension.__call__ = _original_call
+                _original_call = None
+
+
+class Histogram:
+    """Latency histogram with power-of-two microsecond buckets."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: dict[int, int] = defaultdict(int)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[max(0, math.ceil(math.log2(max(seconds * 1e6, 1))))] += 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bound (seconds) of the bucket holding the q-th percentile."""
+        target = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(2**bucket / 1e6, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "mean_ms": round(self.total / self.count * 1e3, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1e3, 3),
+            "p95_ms": round(self.percentile(0.95) * 1e3, 3),
+            "max_ms": round(self.max * 1e3, 3),
+            "buckets_ms": [[2**b / 1e3, n] for b, n in sorted(self.buckets.items())],
+        }
+
+
+def _peak_rss_mb() -> tuple[float | None, float | None]:
+    """Peak RSS of this process and of its (finished) child processes."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None, None
+    scale = 1024**2 if sys.platform == "darwin" else 1024  # bytes on macOS, KiB elsewhere
+    main = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return main, children
+
+
+class BuildProfile:
+    """Timings of one build, collected in the main process."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = defaultdict(float)
+        self.parents: dict[str, str | None] = {}  # Enclosing stage of each stage, None = top level
+        self._open: list[str] = []                # Stages currently open (main thread)
+        self.level0_wall = 0.0                    # First to last level0 result, consumer included
+        self.histograms: dict[str, Histogram] = defaultdict(Histogram)
+        self.contexts = Histogram()
+        self.n_cached = 0
+        self.n_failed = 0
+        self.busy = 0.0
+        self.workers = 1
+        self.executor = "serial"
+
+    def _enter(self, name: str) -> None:
+        if name not in self.parents:
+            self.parents[name] = self._open[-1] if self._open else None
+            self.stages[name] += 0.0  # Parents are listed before the stages they enclose
+        self._open.append(name)
+
+    def _exit(self, name: str, start: float) -> None:
+        self._open.pop()
+        self.stages[name] += time.perf_counter() - start
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Add the wall time of the with-block to stage name."""
+        self._enter(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._exit(name, start)
+
+    def iter_timed(self, name: str, items: Iterable) -> Iterator:
+        """Yield items, adding the time spent producing them (not consuming them) to stage name."""
+        iterator = iter(items)
+        try:
+            while True:
+                self._enter(name)
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self._exit(name, start)
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def set_executor(self, executor: str, workers: int) -> None:
+        self.executor = executor
+        self.workers = workers if executor != "serial" else 1
+
+    def add_context(self, result) -> None:
+        """Merge the timings shipped back with one ContextResult."""
+        self.busy += result.duration
+        if result.error:
+            self.n_failed += 1
+            return
+        if result.cached:
+            self.n_cached += 1
+            return
+        self.contexts.add(result.duration)
+        for name, durations in (result.timings or {}).items():
+            histogram = self.histograms[name]
+            for seconds in durations:
+                histogram.add(seconds)
+
+    def report(self) -> dict:
+        wall = time.perf_counter() - self.started
+        capacity = self.level0_wall * self.workers
+        main_rss, workers_rss = _peak_rss_mb()
+        return {
+            "wall_s": round(wall, 3),
+            "stages_s": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            "stage_parents": dict(self.parents),
+            "contexts": {
+                "built": self.contexts.count,
+                "cached": self.n_cached,
+                "failed": self.n_failed,
+                "latency": self.contexts.to_dict(),
+            },
+            "timings": {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+            "workers": {
+                "executor": self.executor,
+                "count": self.workers,
+                "busy_s": round(self.busy, 3),
+                "level0_wall_s": round(self.level0_wall, 3),
+                "utilization": round(self.busy / capacity, 3) if capacity else None,
+            },
+            "peak_rss_mb": {"main": main_rss, "workers": workers_rss},
+        }
+
+    def write(self, path: str | Path) -> dict:
+        """Write build_profile.json and return the report."""
+        report = self.report()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def print_summary(self, report: dict) -> None:
+        stages = report["stages_s"]
+        parents = report["stage_parents"]
+        children: dict[str | None, list[str]] = defaultdict(list)
+        for name in stages:
+            children[parents.get(name)].append(name)
+
+        def print_stages(parent: str | None, depth: int) -> None:
+            # Top-level stages as a share of the build, nested ones of their parent
+            total = stages[parent] if parent is not None else report["wall_s"]
+            for name in children[parent]:
+                seconds = stages[name]
+                share = f"{seconds / total:>8.1%}" if total else f"{'':>8}"
+                print(f"{'  ' * depth + name:<28}{seconds:>10.2f}{share}")
+                print_stages(name, depth + 1)
+
+        print(f"\n{'Stage':<28}{'Seconds':>10}{'%':>8}")
+        print_stages(None, 0)
+        print(f"{'total':<28}{report['wall_s']:>10.2f}")
+
+        timings = {"context": report["contexts"]["latency"], **report["timings"]}
+        print(f"\n{'Builder / extension':<40}{'Calls':>8}{'Total s':>10}{'Mean ms':>10}{'p95 ms':>10}{'Max ms':>10}")
+        for name, t in timings.items():
+            if t["count"]:
+                print(
+                    f"{name:<40}{t['count']:>8}{t['total_s']:>10.2f}"
+                    f"{t['mean_ms']:>10.1f}{t['p95_ms']:>10.1f}{t['max_ms']:>10.1f}"
+                )
+
+        workers = report["workers"]
+        contexts = report["contexts"]
+        utilization = f"{workers['utilization']:.0%}" if workers["utilization"] is not None else "n/a"
+        print(
+            f"\nContexts: {contexts['built']} built, {contexts['cached']} cached, {contexts['failed']} failed"
+            f" | Workers: {workers['count']} ({workers['executor']}), utilization {utilization}"
+        )
+        rss = report["peak_rss_mb"]
+        if rss["main"] is not None:
+            print(f"Peak RSS: main {rss['main']:.0f} MB, workers {rss['workers']:.0f} MB")
+
+
+_PROFILE: BuildProfile | None = None
+
+
+def get_profile() -> BuildProfile:
+    """Profile of the current build (main process)."""
+    global _PROFILE
+    if _PROFILE is None:
+        _PROFILE = BuildProfile()
+    return _PROFILE
+
+
+@contextmanager
+def main_profiler(kind: str | None, directory: str | Path) -> Iterator[None]:
+    """
+    Profile the main process with cProfile or pyinstrument.
+
+    Args:
+        kind: None (disabled), "cprofile" or "pyinstrument"
+        directory: Where build_profile.prof / build_profile.html is written
+    """
+    if kind is None:
+        yield
+        return
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    if kind == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = directory / "build_profile.prof"
+            profiler.dump_stats(path)
+            print(f"cProfile stats written to {path} (view with: python -m pstats {path})")
+    elif kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError(
+                'PROFILER = "pyinstrument" requires pyinstrument. Run: pip install pyinstrument'
+            ) from None
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path = directory / "build_profile.html"
+            path.write_text(profiler.output_html())
+            print(f"pyinstrument report written to {path}")
+    else:
+        raise ValueError(f"Unknown PROFILER: {kind!r}. Use None, 'cprofile' or 'pyinstrument'")
@@ -0,0 +1,229 @@
+"""
+Staged Publication
+
+Builds write into a private staging directory next to the output
+(STAGED_PUBLISH = True) and replace the published dataset only once
+everything (parts, .tacocat/, COLLECTION.json, docs) has been written:
+
+- A failed or interrupted build never touches the published dataset; its
+  staging directory is removed by the next build
+- A published container is never overwritten while the published
+  .tacocat/ may point at it: staged containers that would take the name of
+  a published one are renumbered to the next free _partNNNN of their name
+  (avoid_published_names), and the staged .tacocat/ is rebuilt over the new
+  names. Parts therefore alternate between two sets of numbers across
+  staged rebuilds
+- Publishing moves every entry in with its own rename on the same file
+  system: new containers first (next to the old ones, which the old
+  .tacocat/ still reads), then .tacocat/ swapped for the old one with a
+  single atomic rename, then COLLECTION.json and the docs, and only then
+  are the old containers retired. A reader opening .tacocat/ sees either
+  the old dataset or the new one, never a mix
+- A single-file dataset is replaced with one os.replace() (the path always
+  exists, old or new)
+- The atomic swap of directories (.tacocat/, FOLDER outputs) needs Linux
+  renameat2(RENAME_EXCHANGE); elsewhere the old directory is moved aside
+  first and the path is missing for the time between two renames
+- Readers that already opened the old files keep reading them: old outputs
+  are moved to .taco_trash/ (created only when something is moved there)
+  and deleted afterwards (in the background with CLEAN_IN_BACKGROUND),
+  never overwritten in place
+- Old outputs the new build no longer produces (fewer parts, .tacocat/ vs
+  COLLECTION.json) are retired the same way
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import ctypes
+import errno
+import os
+import re
+import shutil
+import sys
+import threading
+import uuid
+from pathlib import Path
+
+from dataset.engine.cleanup import (
+    DOC_FILES,
+    MANIFEST_FILE,
+    TRASH_DIR,
+    delete_in_background,
+    find_previous_outputs,
+    remove_paths,
+)
+from dataset.engine.writer import consolidate_parts
+
+STAGING_DIR = ".taco_staging"
+_CONTAINER = re.compile(r"^(?P<base>.+?)(?:_part(?P<number>\d+))?(?P<suffix>\.(?:tacozip|zip))$")
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+
+
+def create_staging(output: str | Path) -> Path:
+    """Create a fresh staging directory and return the output path inside it."""
+    output = Path(output)
+    staging = output.parent / STAGING_DIR / uuid.uuid4().hex
+    staging.mkdir(parents=True)
+    return staging / output.name
+
+
+def clean_staging(output: str | Path, workers: int = 16) -> list[Path]:
+    """Remove staging directories left behind by failed builds."""
+    root = Path(output).parent / STAGING_DIR
+    if not root.exists():
+        return []
+    stale = sorted(root.iterdir())
+    remove_paths(stale, workers)
+    return stale
+
+
+def avoid_published_names(paths: list[Path], output: str | Path) -> list[Path]:
+    """
+    Renumber staged containers that would replace a published one of the same name.
+
+    Only consolidated builds are renamed (a staged .tacocat/ exists next to
+    paths): their .tacocat/ is rebuilt over the new names. A single file is
+    replaced atomically as it is.
+
+    Args:
+        paths: Containers written into the staging directory
+        output: Published output path
+
+    Returns:
+        The staged containers, under their final names
+    """
+    paths = [Path(path) for path in paths]
+    if not paths:
+        return paths
+    staging = paths[0].parent
+    if not (staging / ".tacocat").is_dir():
+        return paths
+
+    published = {entry.name for entry in Path(output).parent.iterdir()}
+    highest: dict[str, int] = {}
+    for name in published | {path.name for path in paths}:
+        match = _CONTAINER.match(name)
+        if match and match["number"]:
+            highest[match["base"]] = max(highest.get(match["base"], 0), int(match["number"]))
+
+    final = []
+    for path in paths:
+        match = _CONTAINER.match(path.name)
+        if path.name not in published or not match:
+            final.append(path)
+            continue
+        number = highest.get(match["base"], 0) + 1
+        highest[match["base"]] = number
+        target = path.with_name(f"{match['base']}_part{number:04d}{match['suffix']}")
+        path.rename(target)
+        final.append(target)
+
+    renamed = sum(new != old for new, old in zip(final, paths))
+    if renamed:
+        print(f"Renumbered {renamed} staged part(s) named like a published one")
+        shutil.rmtree(staging / ".tacocat")
+        consolidate_parts(final, final[0])
+    return final
+
+
+def _exchange(a: Path, b: Path) -> bool:
+    """Swap two paths with one atomic rename, False where the system cannot."""
+    if not sys.platform.startswith("linux"):
+        return False
+    renameat2 = getattr(ctypes.CDLL(None, use_errno=True), "renameat2", None)
+    if renameat2 is None:
+        return False
+    if renameat2(_AT_FDCWD, os.fsencode(a), _AT_FDCWD, os.fsencode(b), _RENAME_EXCHANGE) == 0:
+        return True
+    code = ctypes.get_errno()
+    if code in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+        return False  # Old kernel or a file system without RENAME_EXCHANGE
+    raise OSError(code, os.strerror(code), str(a), None, str(b))
+
+
+def _publish_order(entry: Path) -> tuple[int, str]:
+    if entry.name in DOC_FILES:
+        return 2, entry.name
+    if entry.is_dir() or entry.name in ("COLLECTION.json", MANIFEST_FILE):
+        return 1, entry.name
+    return 0, entry.name
+
+
+def publish(
+    staged_output: str | Path,
+    output: str | Path,
+    remove_stale: bool = True,
+    background: bool = False,
+    workers: int = 16,
+    retired: list[Path] = (),
+) -> tuple[list[Path], threading.Thread | None]:
+    """
+    Move a staged build into place, swapping .tacocat/ in atomically.
+
+    Staged containers must not share a name with a published container the
+    old .tacocat/ reads (see avoid_published_names()).
+
+    Args:
+        staged_output: Output path inside the staging directory
+        output: Published output path
+        remove_stale: Retire previous outputs that the new build did not produce
+        background: Delete retired outputs in a background thread
+        workers: Threads deleting retired outputs
+        retired: Published outputs replaced by this build under other names
+                (parts rewritten by an append), retired once it is in place
+
+    Returns:
+        (published paths, background cleanup thread or None)
+    """
+    staging = Path(staged_output).parent
+    parent_dir = Path(output).parent
+    trash = None
+
+    def retire(path: Path) -> None:
+        nonlocal trash
+        if trash is None:
+            trash = parent_dir / TRASH_DIR / uuid.uuid4().hex
+            trash.mkdir(parents=True)
+        path.rename(trash / path.name)
+
+    previous = find_previous_outputs(output)
+    if (parent_dir / "COLLECTION.json").exists():
+        previous.append(parent_dir / "COLLECTION.json")
+
+    published = []
+    for entry in sorted(staging.iterdir(), key=_publish_order):
+        target = parent_dir / entry.name
+        if entry.is_dir():
+            if not target.exists():
+                entry.rename(target)
+            elif _exchange(entry, target):
+                retire(entry)  # The old directory, now in the staging directory
+            else:
+                retire(target)
+                entry.rename(target)
+        else:
+            os.replace(entry, target)  # Open readers keep the old inode
+        published.append(target)
+
+    names = {path.name for path in published}
+    if remove_stale:
+        for path in previous:
+            if path.name not in names and path.exists():
+                retire(path)
+    for path in retired:
+        if path.name not in names and path.exists():
+            retire(path)
+
+    staging.rmdir()
+    try:
+        staging.parent.rmdir()  # .taco_staging/, unless another build is staging
+    except OSError:
+        pass
+
+    if trash is None:
+        return published, None
+    if background:
+        return published, delete_in_background(parent_dir, workers)
+    remove_paths([parent_dir / TRASH_DIR], workers)
+    return published, None
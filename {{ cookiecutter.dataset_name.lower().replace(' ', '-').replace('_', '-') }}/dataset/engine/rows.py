@@ -0,0 +1,157 @@
+"""
+Columnar Worker Results
+
+With LEVEL0_RESULTS = "rows", workers do not send pickled Sample/Tortilla
+object graphs back to the parent. Instead, every Tortilla of a context is
+reduced to its metadata rows (the same Arrow tables export_metadata() builds)
+and shipped as Arrow IPC buffers, plus a small outline of the tree (child
+links, sizes, field descriptions). The parent still rebuilds a Sample per
+row, since tacotoolbox writes from Sample/Tortilla objects, but with
+model_construct(): no pydantic validation, no stat() of the leaves and no
+export_metadata() on any node.
+
+Leaves built from bytes stay in the worker's temp files, so the parent and
+the workers must share a filesystem.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import pathlib
+from typing import NamedTuple
+
+import pyarrow as pa
+from tacotoolbox.datamodel import Sample, Tortilla
+
+
+class _Entry(NamedTuple):
+    """Outline of one sample (everything not stored in the rows)."""
+
+    child: int | None           # Node index of the child Tortilla, None for FILEs
+    size_bytes: int
+    extensions: list[str]       # Extension columns owned by the sample
+    descriptions: dict[str, str]
+
+
+class _Node(NamedTuple):
+    """One list of sibling samples (a Tortilla, or the root samples of a context)."""
+
+    rows: list[int]             # Table indices: one shared table, or one per sample
+    metadata: int | None        # Table index of Tortilla.metadata_table, None = same as rows
+    entries: list[_Entry]
+
+
+class SampleRows(NamedTuple):
+    """Columnar, cheap-to-pickle form of the root samples of one context."""
+
+    tables: list[pa.Buffer]     # Arrow IPC streams
+    nodes: list[_Node]          # nodes[0] holds the root samples
+
+
+def _to_ipc(table: pa.Table) -> pa.Buffer:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _from_ipc(buffer: pa.Buffer) -> pa.Table:
+    return pa.ipc.open_stream(buffer).read_all()
+
+
+def encode_samples(samples: list[Sample]) -> SampleRows:
+    """Convert root samples into SampleRows (runs inside the worker)."""
+    tables: list[pa.Buffer] = []
+    nodes: list[_Node | None] = []
+
+    def add_table(table: pa.Table) -> int:
+        tables.append(_to_ipc(table))
+        return len(tables) - 1
+
+    def add_node(node_samples: list[Sample], metadata_table: pa.Table | None) -> int:
+        index = len(nodes)
+        nodes.append(None)  # Reserve the slot, children are appended after it
+
+        entries = []
+        for sample in node_samples:
+            child = add_node(sample.path.samples, sample.path.metadata_table) if sample.type == "FOLDER" else None
+            entries.append(
+                _Entry(
+                    child=child,
+                    size_bytes=sample._size_bytes,
+                    extensions=list(sample._extension_schemas),
+                    descriptions=dict(sample._field_descriptions),
+                )
+            )
+
+        exported = [sample.export_metadata() for sample in node_samples]
+        if all(table.schema.equals(exported[0].schema) for table in exported[1:]):
+            rows_table = pa.concat_tables(exported)
+            rows = [add_table(rows_table)]
+        else:
+            # Heterogeneous schemas (strict_schema=False): keep one table per sample
+            rows_table = None
+            rows = [add_table(table) for table in exported]
+
+        if metadata_table is None or (rows_table is not None and metadata_table.schema.equals(rows_table.schema)):
+            metadata = None
+        else:
+            # TortillaExtension columns or aligned schemas, ship the table as built
+            metadata = add_table(metadata_table)
+
+        nodes[index] = _Node(rows=rows, metadata=metadata, entries=entries)
+        return index
+
+    add_node(samples, None)
+    return SampleRows(tables=tables, nodes=nodes)
+
+
+# tacotoolbox 0.22 internals: the state Sample and Tortilla compute on
+# validation, restored as the worker computed it. Only used by decode_samples().
+def _restore_sample(sample: Sample, entry: _Entry, schema: pa.Schema) -> None:
+    object.__setattr__(sample, "_size_bytes", entry.size_bytes)
+    object.__setattr__(sample, "_extension_schemas", {name: schema.field(name).type for name in entry.extensions})
+    object.__setattr__(sample, "_field_descriptions", entry.descriptions)
+
+
+def _restore_tortilla(samples: list[Sample], metadata_table: pa.Table | None) -> Tortilla:
+    return Tortilla(samples=samples, _metadata_table=metadata_table)
+
+
+def decode_samples(rows: SampleRows) -> list[Sample]:
+    """Rebuild root samples from SampleRows (runs in the parent)."""
+    tables = [_from_ipc(buffer) for buffer in rows.tables]
+
+    def build_node(index: int) -> tuple[list[Sample], pa.Table | None]:
+        node = rows.nodes[index]
+
+        if len(node.rows) == 1:
+            row_table = tables[node.rows[0]]
+            records = row_table.to_pylist()
+            schemas = [row_table.schema] * len(records)
+        else:
+            records = [tables[i].to_pylist()[0] for i in node.rows]
+            schemas = [tables[i].schema for i in node.rows]
+
+        samples = []
+        for record, schema, entry in zip(records, schemas, node.entries):
+            fields = dict(record)
+            if entry.child is not None:
+                children, metadata_table = build_node(entry.child)
+                fields["path"] = _restore_tortilla(children, metadata_table)
+            else:
+                fields["path"] = pathlib.Path(fields["path"])
+
+            sample = Sample.model_construct(**fields)
+            _restore_sample(sample, entry, schema)
+            samples.append(sample)
+
+        if node.metadata is not None:
+            metadata_table = tables[node.metadata]
+        elif len(node.rows) == 1:
+            metadata_table = tables[node.rows[0]]
+        else:
+            metadata_table = None
+        return samples, metadata_table
+
+    samples, _ = build_node(0)
+    return samples
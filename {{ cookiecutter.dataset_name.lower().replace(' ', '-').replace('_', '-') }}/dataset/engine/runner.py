@@ -0,0 +1,267 @@
+"""
+Level0 Runner
+
+Drives the level0 build: streams contexts through run_context() serially or
+on the EXECUTOR backend, reuses checkpointed contexts on resume, journals
+finished ones and reports what happened.
+
+A worker process that dies (killed by the OS for memory, segfault in a native
+library) breaks the whole process pool. The contexts that were in flight are
+then rebuilt in isolation on a fresh pool, one context per task and finally
+one context per pool, so the context responsible is recorded as failed and
+the build goes on. While available memory is below LEVEL0_MIN_FREE_MEMORY, no
+new contexts are handed to the workers.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+
+from dataset.config import (
+    CHECKPOINT_EVERY,
+    CHECKPOINT_INTERVAL,
+    EXECUTOR,
+    LEVEL0_CHUNKSIZE,
+    LEVEL0_MAX_INFLIGHT,
+    LEVEL0_MIN_FREE_MEMORY,
+    LEVEL0_PRESERVE_ORDER,
+    LEVEL0_RESULTS,
+    VALIDATE_SCHEMA,
+    WORKER_THREADS_PER_PROCESS,
+)
+from dataset.engine.autotune import available_memory, resolve_workers
+from dataset.engine.executors import open_executor
+from dataset.engine.failures import write_failures
+from dataset.engine.journal import Journal, JournalReader
+from dataset.engine.parallel import ExecutorBroken, bounded_map
+from dataset.engine.profiling import get_profile
+from dataset.engine.rows import decode_samples
+from dataset.engine.shards import build_state_dir
+from dataset.engine.sizes import parse_size
+from dataset.engine.validation import SchemaValidator
+from dataset.engine.worker import ContextResult, run_context, run_context_rows
+
+
+_listener: Callable[[str, list], None] | None = None
+
+
+def set_context_listener(listener: Callable[[str, list], None] | None) -> None:
+    """Call listener(context id, root samples) for every context yielded by iter_root_samples()."""
+    global _listener
+    _listener = listener
+
+
+def _memory_throttle() -> Callable[[], bool] | None:
+    """Return a throttle that is True while available memory is below LEVEL0_MIN_FREE_MEMORY."""
+    if LEVEL0_MIN_FREE_MEMORY is None:
+        return None
+    minimum = parse_size(LEVEL0_MIN_FREE_MEMORY, "LEVEL0_MIN_FREE_MEMORY")
+    low = False
+
+    def throttle() -> bool:
+        nonlocal low
+        available = available_memory()
+        now_low = available is not None and available < minimum
+        if now_low != low:
+            low = now_low
+            state = "holding new contexts" if low else "resuming"
+            print(f"Available memory {available / 1024**2:.0f} MB, {state} (LEVEL0_MIN_FREE_MEMORY)")
+        return low
+
+    return throttle
+
+
+def _crashed(ctx: dict, cause: BaseException | None) -> ContextResult:
+    """Failure result of a context that killed its worker process on its own."""
+    return ContextResult(
+        ctx["id"],
+        None,
+        f"Worker process died while building this context (out of memory, killed or crashed): {cause}",
+        error_type="WorkerCrashed",
+    )
+
+
+def iter_results(contexts: Iterable[dict], parallel: bool, workers: int | str) -> Iterator[ContextResult]:
+    """Run every context through run_context(), serially or on the EXECUTOR backend."""
+    if LEVEL0_RESULTS not in ("samples", "rows"):
+        raise ValueError(f"Unknown LEVEL0_RESULTS: {LEVEL0_RESULTS!r}. Use 'samples' or 'rows'")
+
+    kind = EXECUTOR if parallel else "serial"
+    plan, contexts, warm_up = resolve_workers(kind, workers, WORKER_THREADS_PER_PROCESS, contexts)
+    workers = plan.workers
+    get_profile().set_executor(kind, workers)
+    yield from warm_up  # Built by the WORKERS = "auto" warm-up, not built again
+
+    if kind == "serial":
+        with open_executor(kind, workers, plan.threads):
+            for ctx in contexts:
+                yield run_context(ctx)
+        return
+
+    # Threads share memory with the parent, nothing to gain from rows
+    rows = LEVEL0_RESULTS == "rows" and kind != "thread"
+    throttle = _memory_throttle()
+
+    # (workers, chunksize, max_inflight): normal run, then contexts lost with a
+    # dead worker one per task, then contexts lost again one per pool
+    phases = [
+        (workers, LEVEL0_CHUNKSIZE, LEVEL0_MAX_INFLIGHT or 4 * workers),
+        (workers, 1, workers),
+        (1, 1, 1),
+    ]
+    remaining = iter(contexts)
+
+    for phase, (n_workers, chunksize, max_inflight) in enumerate(phases):
+        suspects: list[dict] = []
+        while True:
+            try:
+                with open_executor(kind, n_workers, plan.threads) as executor:
+                    results = bounded_map(
+                        executor,
+                        run_context_rows if rows else run_context,
+                        remaining,
+                        chunksize=chunksize,
+                        max_inflight=max_inflight,
+                        preserve_order=LEVEL0_PRESERVE_ORDER,
+                        throttle=throttle,
+                    )
+                    for result in results:
+                        if rows and result.samples is not None:
+                            result = result._replace(samples=decode_samples(result.samples))
+                        yield result
+                break
+            except ExecutorBroken as e:
+                if phase == len(phases) - 1:
+                    for ctx in e.lost:
+                        print(f"Context {ctx['id']} killed its worker process on its own ({type(e.cause).__name__})")
+                        yield _crashed(ctx, e.cause)
+                else:
+                    print(
+                        f"A worker process died ({type(e.cause).__name__}), "
+                        f"{len(e.lost)} in-flight contexts will be rebuilt in isolation"
+                    )
+                    suspects.extend(e.lost)
+
+        if not suspects:
+            return
+        remaining = iter(suspects)
+
+
+def iter_root_samples(
+    contexts: Iterable[dict],
+    parallel: bool,
+    workers: int | str,
+    resume: bool = False,
+) -> Iterator:
+    """
+    Yield the root samples of every context as soon as they are built.
+
+    Finished contexts are checkpointed to BUILD_STATE_DIR/journal. With
+    resume=True, contexts found in the journal are yielded from it instead
+    of being rebuilt. Contexts that still fail after their retries are
+    written to BUILD_STATE_DIR/failed_contexts.parquet. With VALIDATE_SCHEMA,
+    a context whose structure differs from the first one stops the build.
+    The listener set with set_context_listener() sees each context's root
+    samples before they are yielded.
+
+    The profile's level0 stage counts only the time spent producing samples,
+    not the time the caller spends on them between two.
+    """
+    yield from get_profile().iter_timed("level0", _root_samples(contexts, parallel, workers, resume))
+
+
+def _root_samples(contexts: Iterable[dict], parallel: bool, workers: int | str, resume: bool) -> Iterator:
+    state_dir = build_state_dir()
+    journal = Journal(state_dir / "journal", CHECKPOINT_EVERY, CHECKPOINT_INTERVAL)
+    if resume:
+        completed = journal.load()
+        print(f"Resuming: {len(completed)} contexts already checkpointed")
+    else:
+        completed = JournalReader({})
+        journal.reset()
+
+    profile = get_profile()
+    started = time.perf_counter()
+
+    failures = []
+    n_contexts = 0
+    n_samples = 0
+    n_cached = 0
+    n_resumed = 0
+
+    # Every context is checked against the first one as soon as it is available
+    validator = SchemaValidator() if VALIDATE_SCHEMA else None
+
+    # Checkpointed contexts found while feeding the workers, their samples are
+    # only read from the journal when they are yielded
+    resumed: deque[str] = deque()
+
+    def pending() -> Iterator[dict]:
+        nonlocal n_resumed
+        for ctx in contexts:
+            if ctx["id"] in completed:
+                n_resumed += 1
+                resumed.append(ctx["id"])
+            else:
+                yield ctx
+
+    try:
+        for result in iter_results(pending(), parallel, workers):
+            while resumed:
+                ctx_id = resumed.popleft()
+                batch = completed.pop(ctx_id)
+                if validator:
+                    validator.add(ctx_id, batch)
+                n_contexts += 1
+                n_samples += len(batch)
+                if _listener:
+                    _listener(ctx_id, batch)
+                yield from batch
+
+            n_contexts += 1
+            profile.add_context(result)
+            if result.error:
+                failures.append(result)
+                print(f"Failed to build sample {result.id} after {result.attempts} attempt(s): {result.error}")
+                continue
+
+            if validator:
+                validator.add(result.id, result.samples)
+            n_cached += result.cached
+            n_samples += len(result.samples)
+            journal.record(result.id, result.samples)
+            if _listener:
+                _listener(result.id, result.samples)
+            yield from result.samples
+
+        # Checkpointed contexts after the last built one
+        for ctx_id in resumed:
+            batch = completed.pop(ctx_id)
+            if validator:
+                validator.add(ctx_id, batch)
+            n_contexts += 1
+            n_samples += len(batch)
+            if _listener:
+                _listener(ctx_id, batch)
+            yield from batch
+    finally:
+        profile.level0_wall += time.perf_counter() - started
+        journal.flush()
+        write_failures(failures, state_dir / "failed_contexts.parquet")
+
+    print(f"Processed {n_contexts} contexts into {n_samples} root samples")
+    if validator:
+        print(f"Schema validated incrementally: {validator.n_checked} contexts consistent")
+    if n_resumed:
+        print(f"Resumed {n_resumed} contexts from checkpoint")
+    if n_cached:
+        print(f"Reused {n_cached} contexts from build cache")
+
+    if failures:
+        failed_ids = [r.id for r in failures]
+        more = f" ... (+{len(failed_ids) - 10} more)" if len(failed_ids) > 10 else ""
+        print(f"\nTotal failed samples: {len(failed_ids)}")
+        print(f"Failed IDs: {failed_ids[:10]}{more}")
+        print(f"Details in {state_dir / 'failed_contexts.parquet'}, retry with: python dataset/create.py --only-failed")
@@ -0,0 +1,98 @@
+"""
+Sample Tree Helpers
+
+Small utilities to walk built Sample trees (root samples and their nested
+Tortillas) shared by the cache, journal and writer stages.
+
+DO NOT EDIT THIS FILE - Configure the engine from dataset/config.py instead.
+"""
+
+import pathlib
+import re
+import tempfile
+from collections.abc import Iterable, Iterator
+
+from dataset.engine.scan import scanned_stat
+
+PADDING_PREFIX = "__TACOPAD__"
+_TEMP_NAME = re.compile(r"[0-9a-f]{32}")  # uuid4().hex, as named by tacotoolbox
+
+
+def iter_leaves(samples: Iterable) -> Iterator:
+    """Yield every FILE sample below the given samples (depth-first)."""
+    for sample in samples:
+        if sample.type == "FOLDER":
+            yield from iter_leaves(sample.path.samples)
+        else:
+            yield sample
+
+
+def is_padding(sample) -> bool:
+    """True for padding samples created by Tortilla(pad_to=...)."""
+    return sample.id.startswith(PADDING_PREFIX)
+
+
+def is_temp_path(path) -> bool:
+    """
+    True for a file tacotoolbox wrote from bytes.
+
+    Sample(path=bytes) writes the bytes to tempfile.gettempdir()/<uuid4 hex>
+    and keeps that path. Sample._temp_files is not populated in tacotoolbox
+    0.22, so the path is the only reliable sign.
+    """
+    if not isinstance(path, pathlib.Path):
+        return False
+    return path.parent == pathlib.Path(tempfile.gettempdir()).absolute() and bool(_TEMP_NAME.fullmatch(path.name))
+
+
+def owns_temp_files(samples: Iterable) -> bool:
+    """
+    True if any real leaf was built from bytes.
+
+    Those temp files are private to the process that built the sample and do
+    not survive a cleaned temp directory, so such trees cannot be reused by
+    another process or a later build.
+    """
+    return any(is_temp_path(sample.path) for sample in iter_leaves(samples) if not is_padding(sample))
+
+
+def stat_leaf(path: str) -> tuple[int, int]:
+    """
+    (size, mtime_ns) of a leaf file, from this build's leaf scan when it saw the file.
+
+    The scan is a snapshot taken before building: a file changed after it
+    keeps its scanned size and mtime until the next build.
+    """
+    scanned = scanned_stat(path)
+    if scanned is not None:
+        return scanned
+    stat = pathlib.Path(path).stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def leaf_signature(samples: Iterable) -> list[tuple[str, int, int]]:
+    """Return (path, size, mtime_ns) for every real leaf file."""
+    signature = []
+    for sample in iter_leaves(samples):
+        if is_padding(sample):
+            continue
+        signature.append((str(sample.path), *stat_leaf(str(sample.path))))
+    return signature
+
+
+def leaves_unchanged(signature: list[tuple[str, int, int]]) -> bool:
+    """Check that every leaf file still exists with the same size and mtime."""
+    for path, size, mtime_ns in signature:
+        try:
+            if stat_leaf(path) != (size, mtime_ns):
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def restore_padding(samples: Iterable) -> None:
+    """Recreate the 0-byte temp files behind padding samples after unpickling."""
+    for sample in iter_leaves(samples):
+        if is_padding(sample):
+            pathlib.Path(sample.path).touch(exist_ok=True)
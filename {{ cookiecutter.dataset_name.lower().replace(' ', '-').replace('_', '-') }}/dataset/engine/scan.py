@@ -0,0 +1,281 @@
+"""
+Leaf Scan
+
+Stats every file the build will read before any context is built
+(SCAN_LEAVES), so a missing file stops the build in seconds instead of
+surfacing in create() hours later (tacotoolbox sizes a missing leaf as 0
+bytes and only fails when it copies it into the container):
+
+- metadata.leaf_paths(ctx) lists the files of each context. Contexts are
+  streamed once and their paths stat'ed in batches by SCAN_WORKERS threads
+  (stat() releases the GIL and is latency-bound on network file systems)
+- (path, size, mtime_ns, inode) of every file goes into a local SQLite
+  index, BUILD_CACHE_DIR/leaf_index.sqlite, tagged with the id of the scan
+- Every missing file is collected, not just the first one: the list is
+  written to BUILD_STATE_DIR/missing_files.parquet and the build stops
+  before touching any output
+- Workers of the same build read size and mtime back from the index instead
+  of stat'ing each leaf again when they validate build cache and journal
+  entries (engine/samples.py). The scan id reaches them through the
+  TACO_LEAF_SCAN environment variable; workers that do not inherit it
+  (remote Dask workers) stat as before
+
+Leaf files must not change while a build runs: build cache, journal and
+extension cache entries are validated against the size and mtime the scan
+saw, so a file modified after the scan counts as unchanged until the next
+build scans it again. Contexts whose leaf_paths() returns nothing are not
+scanned.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SCAN_ENV = "TACO_LEAF_SCAN"
+INDEX_FILE = "leaf_index.sqlite"
+_BATCH = 512
+_MAX_MISSING_SHOWN = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leaves (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    scan INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    files INTEGER,
+    bytes INTEGER,
+    missing INTEGER
+);
+"""
+
+
+class MissingLeavesError(FileNotFoundError):
+    """Leaf files listed by leaf_paths() do not exist."""
+
+
+class ScanReport(NamedTuple):
+    """Outcome of a leaf scan."""
+
+    scan_id: int
+    contexts: int                    # Contexts that listed leaf paths
+    files: int                       # Leaf files found
+    bytes: int                       # Their total size
+    missing: list[tuple[str, str]]   # (context id, path) of every missing file
+    seconds: float
+
+
+def leaf_key(path: str | os.PathLike) -> str:
+    """Index key of a leaf path, as tacotoolbox stores it on the Sample (absolute, not resolved)."""
+    return str(Path(os.fsdecode(path)).absolute())
+
+
+class LeafIndex:
+    """SQLite index of stat() results, written by the scan, read by workers."""
+
+    def __init__(self, path: str | Path, readonly: bool = False):
+        self.path = Path(path)
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(self.path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(_SCHEMA)
+
+    def start_scan(self) -> int:
+        with self.conn:
+            return self.conn.execute("INSERT INTO scans (started) VALUES (?)", (time.time(),)).lastrowid
+
+    def finish_scan(self, scan_id: int, files: int, n_bytes: int, missing: int) -> None:
+        with self.conn:
+            self.conn.execute(
+                "UPDATE scans SET files = ?, bytes = ?, missing = ? WHERE id = ?", (files, n_bytes, missing, scan_id)
+            )
+
+    def put_many(self, scan_id: int, rows: list[tuple[str, int, int, int]]) -> None:
+        """Record (path, size, mtime_ns, inode) rows for scan_id."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO leaves (path, size, mtime_ns, inode, scan) VALUES (?, ?, ?, ?, ?)",
+                [(*row, scan_id) for row in rows],
+            )
+
+    def lookup(self, scan_id: int, path: str) -> tuple[int, int] | None:
+        """(size, mtime_ns) of path as seen by scan_id, None if that scan did not find it."""
+        return self.conn.execute(
+            "SELECT size, mtime_ns FROM leaves WHERE path = ? AND scan = ?", (path, scan_id)
+        ).fetchone()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _stat_batch(paths: list[str]) -> tuple[list[tuple[str, int, int, int]], list[str]]:
+    found, missing = [], []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            missing.append(path)
+            continue
+        found.append((path, stat.st_size, stat.st_mtime_ns, stat.st_ino))
+    return found, missing
+
+
+def _batches(contexts: Iterable[dict], leaf_paths: Callable[[dict], Iterable], counter: list[int]) -> Iterator:
+    """Yield (context ids, paths) batches of about _BATCH paths."""
+    ids: list[str] = []
+    paths: list[str] = []
+    for ctx in contexts:
+        ctx_paths = [leaf_key(path) for path in leaf_paths(ctx) or ()]
+        if not ctx_paths:
+            continue
+        counter[0] += 1
+        ids.extend([str(ctx["id"])] * len(ctx_paths))
+        paths.extend(ctx_paths)
+        if len(paths) >= _BATCH:
+            yield ids, paths
+            ids, paths = [], []
+    if paths:
+        yield ids, paths
+
+
+def scan_leaves(
+    contexts: Iterable[dict],
+    leaf_paths: Callable[[dict], Iterable],
+    index: LeafIndex,
+    workers: int = 32,
+) -> ScanReport:
+    """
+    Stat every leaf path of contexts into index.
+
+    Args:
+        contexts: Contexts to scan, consumed lazily
+        leaf_paths: metadata.leaf_paths, files of one context
+        index: Index receiving the results
+        workers: Threads calling stat()
+
+    Returns:
+        ScanReport, with every missing file
+    """
+    start = time.perf_counter()
+    scan_id = index.start_scan()
+    counter = [0]
+    files = n_bytes = 0
+    missing: list[tuple[str, str]] = []
+    pending: list[tuple[list[str], list[str], Future]] = []
+
+    def collect(ids: list[str], paths: list[str], future: Future) -> None:
+        nonlocal files, n_bytes
+        found, lost = future.result()
+        index.put_many(scan_id, found)
+        files += len(found)
+        n_bytes += sum(row[1] for row in found)
+        if lost:
+            owner = dict(zip(paths, ids))
+            missing.extend((owner[path], path) for path in lost)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="taco-scan") as pool:
+        for ids, paths in _batches(contexts, leaf_paths, counter):
+            pending.append((ids, paths, pool.submit(_stat_batch, paths)))
+            # Bounded in flight: contexts are streamed, the index is written as batches finish
+            if len(pending) >= 4 * workers:
+                collect(*pending.pop(0))
+        for item in pending:
+            collect(*item)
+
+    index.finish_scan(scan_id, files, n_bytes, len(missing))
+    return ScanReport(scan_id, counter[0], files, n_bytes, missing, time.perf_counter() - start)
+
+
+def write_missing(missing: list[tuple[str, str]], path: str | Path) -> Path:
+    """Write (context id, path) of missing files to a Parquet file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(
+        pa.table({"id": [m[0] for m in missing], "path": [m[1] for m in missing]},
+                 schema=pa.schema([("id", pa.string()), ("path", pa.string())])),
+        path,
+    )
+    return path
+
+
+def check_leaves(
+    contexts: Iterable[dict],
+    leaf_paths: Callable[[dict], Iterable],
+    index_path: str | Path,
+    missing_path: str | Path,
+    workers: int = 32,
+) -> ScanReport:
+    """
+    Scan the leaf files of contexts and make the result visible to workers.
+
+    Raises:
+        MissingLeavesError: If any leaf file is missing (all of them are
+                            listed in missing_path)
+    """
+    index = LeafIndex(index_path)
+    try:
+        report = scan_leaves(contexts, leaf_paths, index, workers)
+    finally:
+        index.close()
+
+    if report.missing:
+        write_missing(report.missing, missing_path)
+        shown = "\n".join(f"  {ctx_id}: {path}" for ctx_id, path in report.missing[:_MAX_MISSING_SHOWN])
+        more = len(report.missing) - _MAX_MISSING_SHOWN
+        raise MissingLeavesError(
+            f"{len(report.missing)} leaf file(s) missing in "
+            f"{len({ctx_id for ctx_id, _ in report.missing})} context(s):\n{shown}"
+            + (f"\n  ... {more} more" if more > 0 else "")
+            + f"\nFull list in {missing_path}"
+        )
+    Path(missing_path).unlink(missing_ok=True)
+
+    # Inherited by the executor workers started after this point
+    os.environ[SCAN_ENV] = f"{report.scan_id}:{Path(index_path).absolute()}"
+    return report
+
+
+_local = threading.local()
+
+
+def scanned_stat(path: str) -> tuple[int, int] | None:
+    """
+    (size, mtime_ns) of a leaf from the scan of the current build, None if unknown.
+
+    Only rows written by that scan are trusted; anything else is stat'ed by
+    the caller.
+    """
+    spec = os.environ.get(SCAN_ENV)
+    if not spec:
+        return None
+    scan_id, _, index_path = spec.partition(":")
+    if getattr(_local, "spec", None) != spec:
+        # One read-only connection per thread (sqlite3 connections are not shared across threads)
+        try:
+            _local.index = LeafIndex(index_path, readonly=True)
+        except sqlite3.Error:
+            _local.index = None
+        _local.spec = spec
+    if _local.index is None:
+        return None
+    try:
+        return _local.index.lookup(int(scan_id), leaf_key(path))
+    except sqlite3.Error:
+        return None
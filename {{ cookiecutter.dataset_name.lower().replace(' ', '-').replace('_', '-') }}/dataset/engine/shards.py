@@ -0,0 +1,159 @@
+"""
+Sharded Builds
+
+Spreads one build over several machines that share a file system:
+
+    python dataset/create.py --shard 0/20    # on node 0
+    python dataset/create.py --shard 1/20    # on node 1, ...
+    python dataset/create.py --merge         # once, after every shard finished
+
+- Shard i of N builds the contexts whose sha1(ctx["id"]) % N == i. The split
+  is the same on every node and every run, whatever the order of
+  load_contexts().
+- Each shard keeps its own journal and failure manifest in
+  BUILD_STATE_DIR/shard-i-of-N/, so --resume and --only-failed work per shard.
+  The build cache is shared (entries are content-addressed and written
+  atomically).
+- A shard writes its ZIP parts into .taco_shards/i-of-N/ next to the output,
+  and finally shard.json, which lists the parts and marks the shard as
+  complete.
+- --merge checks that all N shards are complete, links their parts into the
+  output directory as one sequence output_part0001.tacozip, ... (hard links,
+  no data is copied), consolidates their metadata into .tacocat/ and
+  COLLECTION.json, and removes .taco_shards/.
+
+Only ZIP output without GROUP_BY can be sharded.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+from dataset.config import BUILD_STATE_DIR
+from dataset.engine.planner import part_path
+
+SHARDS_DIR = ".taco_shards"
+MANIFEST = "shard.json"
+
+
+class Shard(NamedTuple):
+    """One slice of a sharded build."""
+
+    index: int  # 0-based
+    count: int
+
+    def __str__(self) -> str:
+        return f"{self.index}-of-{self.count}"
+
+
+_shard: Shard | None = None
+
+
+def parse_shard(spec: str) -> Shard:
+    """Parse "i/N" (0 <= i < N)."""
+    index, sep, count = spec.partition("/")
+    try:
+        shard = Shard(int(index), int(count))
+    except ValueError:
+        shard = None
+    if not sep or shard is None or not 0 <= shard.index < shard.count:
+        raise ValueError(f"--shard must look like i/N with 0 <= i < N, got {spec!r}")
+    return shard
+
+
+def set_shard(shard: Shard | None) -> None:
+    """Make shard the slice built by this process."""
+    global _shard
+    _shard = shard
+
+
+def build_state_dir() -> Path:
+    """BUILD_STATE_DIR, or its per-shard subdirectory in a sharded build."""
+    if _shard is None:
+        return Path(BUILD_STATE_DIR)
+    return Path(BUILD_STATE_DIR) / f"shard-{_shard}"
+
+
+def shard_of(ctx_id: str, count: int) -> int:
+    """Shard (0-based) a context id belongs to, stable across machines and runs."""
+    digest = hashlib.sha1(str(ctx_id).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def select_shard(contexts: Iterable[dict], shard: Shard) -> Iterator[dict]:
+    """Keep the contexts of shard."""
+    for ctx in contexts:
+        if shard_of(ctx["id"], shard.count) == shard.index:
+            yield ctx
+
+
+def shard_dir(output: str | Path, shard: Shard) -> Path:
+    """Directory the parts of shard are written to."""
+    return Path(output).parent / SHARDS_DIR / str(shard)
+
+
+def write_manifest(output: str | Path, shard: Shard, paths: list[Path], n_samples: int) -> Path:
+    """Record the parts of a finished shard (written last: marks it complete)."""
+    manifest = shard_dir(output, shard) / MANIFEST
+    tmp = manifest.with_suffix(".tmp")
+    tmp.write_text(json.dumps({
+        "index": shard.index,
+        "count": shard.count,
+        "parts": [Path(path).name for path in paths],
+        "samples": n_samples,
+    }, indent=2))
+    os.replace(tmp, manifest)
+    return manifest
+
+
+def read_manifests(output: str | Path) -> list[dict]:
+    """
+    Manifests of every shard, in shard order.
+
+    Raises:
+        ValueError: If shards are missing or come from builds with different N
+    """
+    root = Path(output).parent / SHARDS_DIR
+    manifests = [json.loads(path.read_text()) for path in sorted(root.glob(f"*/{MANIFEST}"))]
+    if not manifests:
+        raise ValueError(f"No finished shards in {root}, run create.py --shard i/N first")
+
+    counts = {m["count"] for m in manifests}
+    if len(counts) > 1:
+        raise ValueError(f"Shards of builds with different N in {root}: {sorted(counts)}, rebuild or remove the stale ones")
+    count = counts.pop()
+    manifests.sort(key=lambda m: m["index"])
+    missing = sorted(set(range(count)) - {m["index"] for m in manifests})
+    if missing:
+        raise ValueError(f"{len(missing)} of {count} shards not finished: {missing[:20]}")
+    return manifests
+
+
+def link_parts(output: str | Path, manifests: list[dict], target: str | Path) -> list[Path]:
+    """
+    Link every shard part into target's directory as target_part0001.tacozip, ...
+
+    Hard links leave the shard parts in place until the merge succeeded;
+    falls back to copying on file systems without hard links.
+    """
+    root = Path(output).parent / SHARDS_DIR
+    target = Path(target)
+    paths = []
+    for manifest in manifests:
+        source_dir = root / str(Shard(manifest["index"], manifest["count"]))
+        for name in manifest["parts"]:
+            path = part_path(target, len(paths) + 1)
+            try:
+                os.link(source_dir / name, path)
+            except FileExistsError:
+                raise
+            except OSError:
+                shutil.copy2(source_dir / name, path)
+            paths.append(path)
+    return paths
@@ -0,0 +1,38 @@
+"""
+Size Settings
+
+Parses the human-readable sizes of dataset/config.py ("4GB", "512MB",
+"100K", "2048") to bytes, with the same rules tacotoolbox.create() applies
+to SPLIT_SIZE, so a part planned here is cut where tacotoolbox would cut it:
+
+- Units B, K/KB, M/MB, G/GB, powers of 1024, case-insensitive
+- Decimal values ("4.5GB"), whitespace before the unit, no unit = bytes
+- The result must be positive
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import re
+
+_SIZE = re.compile(r"^(\d+(?:\.\d+)?)\s*(GB?|MB?|KB?|B?)$")
+_MULTIPLIERS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024**2, "MB": 1024**2, "G": 1024**3, "GB": 1024**3}
+
+
+def parse_size(size: str | int, setting: str = "size") -> int:
+    """
+    Bytes of a size setting.
+
+    Args:
+        size: Size string such as "4GB", or a number of bytes
+        setting: Name of the setting, for the error message
+
+    Raises:
+        ValueError: If size cannot be parsed or is not positive
+    """
+    match = _SIZE.match(str(size).strip().upper())
+    if not match:
+        raise ValueError(f"Invalid {setting}: {size!r}. Use a size like '4GB', '512MB', '1024KB' or '2048B'")
+    value = int(float(match.group(1)) * _MULTIPLIERS[match.group(2)])
+    if value <= 0:
+        raise ValueError(f"{setting} must be positive, got {size!r}")
+    return value
@@ -0,0 +1,70 @@
+"""
+Per-Level Thread Pools
+
+Fans out the sample builders of one level (the SAMPLES list) over a thread
+pool, so a single context with many child samples uses more than one core
+while it waits on I/O (reading headers, computing extension metadata).
+
+- Each level gets its own pool, so a level1 builder waiting on level2 builders
+  never blocks on threads its own level is holding (no nested deadlock).
+- Pools are created lazily once per process and reused across contexts; a
+  forked level0 worker never inherits the parent's pools.
+- Results are returned in SAMPLES order, so sample IDs and their position in
+  the Tortilla stay deterministic (PIT compliance).
+
+DO NOT EDIT THIS FILE - Set THREADS in each dataset/levels/levelN.py instead.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+from dataset.config import PROFILE
+from dataset.engine.profiling import record
+
+_pools: dict[tuple[int, str, int], ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+
+def _get_pool(level: str, threads: int) -> ThreadPoolExecutor:
+    """Return the thread pool of a level for the current process."""
+    key = (os.getpid(), level, threads)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"taco-{level}")
+            _pools[key] = pool
+    return pool
+
+
+def _build(fn: Callable, ctx: dict, level: str):
+    """Call one builder, timing it when PROFILE is enabled."""
+    if not PROFILE:
+        return fn(ctx)
+    start = time.perf_counter()
+    try:
+        return fn(ctx)
+    finally:
+        record(f"{level}.{fn.__name__}", time.perf_counter() - start)
+
+
+def build_samples(builders: Sequence[Callable], ctx: dict, threads: int | None, level: str) -> list:
+    """
+    Call every sample builder with ctx, optionally in a thread pool.
+
+    Args:
+        builders: Sample builder functions (the SAMPLES list of a level)
+        ctx: Context dict passed to every builder
+        threads: Thread pool size, None or 1 = build serially
+        level: Name of the calling level, one pool per level
+
+    Returns:
+        Samples in the same order as builders
+    """
+    if not threads or threads <= 1 or len(builders) <= 1:
+        return [_build(fn, ctx, level) for fn in builders]
+
+    pool = _get_pool(level, threads)
+    return list(pool.map(lambda fn: _build(fn, ctx, level), builders))
@@ -0,0 +1,150 @@
+"""
+Incremental Schema Validation
+
+Checks every context as soon as it is built, instead of exporting the whole
+tree after the build (VALIDATE_SCHEMA = True):
+
+- PIT structure: below the root, every context must have the same child IDs
+  and types at every position (padding ignored), like Taco() checks at the end
+- Arrow schemas: the metadata schema of every node must match the node at the
+  same position in the first context, for levels with STRICT_SCHEMA = True
+
+Each context is reduced to a small signature (IDs, types and schemas that
+already exist on the built objects, no metadata export) and compared with the
+signature of the first context. A mismatch stops the build right away with
+the path of the first difference and the two context IDs involved.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import importlib
+
+import pyarrow as pa
+
+from dataset.engine.samples import is_padding
+
+_CORE_FIELDS = [pa.field("id", pa.string()), pa.field("type", pa.string()), pa.field("path", pa.string())]
+
+
+class SchemaValidationError(ValueError):
+    """A context does not match the structure or schema of the first one."""
+
+
+def _strict_levels() -> list[bool]:
+    """STRICT_SCHEMA of level0..levelN (stops at the first missing level)."""
+    strict = []
+    for depth in range(5):
+        try:
+            level = importlib.import_module(f"dataset.levels.level{depth}")
+        except ImportError:
+            break
+        strict.append(getattr(level, "STRICT_SCHEMA", True))
+    return strict
+
+
+def _row_schema(sample) -> pa.Schema:
+    """Schema of sample.export_metadata(), without exporting."""
+    return pa.schema(_CORE_FIELDS + [pa.field(name, dtype) for name, dtype in sample._extension_schemas.items()])
+
+
+class SchemaValidator:
+    """Compare the structure of every built context with the first one."""
+
+    def __init__(self, strict_levels: list[bool] | None = None):
+        self.strict = strict_levels if strict_levels is not None else _strict_levels()
+        self.reference: tuple | None = None
+        self.reference_id: str | None = None
+        self.n_checked = 0
+
+    def _is_strict(self, depth: int) -> bool:
+        return self.strict[depth] if depth < len(self.strict) else True
+
+    def _node(self, sample, depth: int, with_id: bool) -> tuple:
+        """Signature of one sample and everything below it."""
+        schema = _row_schema(sample) if depth == 0 and self._is_strict(0) else None
+        children = None
+        if sample.type == "FOLDER":
+            tortilla = sample.path
+            table_schema = tortilla.metadata_table.schema if self._is_strict(depth + 1) else None
+            children = (
+                table_schema,
+                tuple(self._node(child, depth + 1, True) for child in tortilla.samples if not is_padding(child)),
+            )
+        return (sample.id if with_id else None, sample.type, schema, children)
+
+    def signature(self, samples: list) -> tuple:
+        """Signature of the root samples of one context (root IDs excluded, they differ by design)."""
+        return tuple(self._node(sample, 0, False) for sample in samples)
+
+    def add(self, ctx_id: str, samples: list) -> None:
+        """
+        Validate the root samples of one context.
+
+        Raises:
+            SchemaValidationError: If the context differs from the first one
+        """
+        signature = self.signature(samples)
+        self.n_checked += 1
+
+        if self.reference is None:
+            self.reference = signature
+            self.reference_id = ctx_id
+            return
+
+        if signature != self.reference:
+            difference = _describe(self.reference, signature, "root") or "structure differs"
+            raise SchemaValidationError(
+                f"Context '{ctx_id}' does not match context '{self.reference_id}':\n"
+                f"  {difference}\n"
+                f"All contexts must build the same child IDs, types and metadata columns (PIT compliance)."
+            )
+
+
+def _describe(reference: tuple, current: tuple, where: str, depth: int = 0) -> str | None:
+    """Human readable description of the first difference between two signatures."""
+    if len(reference) != len(current):
+        return f"{where}: {len(reference)} samples expected, found {len(current)}"
+
+    for position, (ref, cur) in enumerate(zip(reference, current)):
+        ref_id, ref_type, ref_schema, ref_children = ref
+        cur_id, cur_type, cur_schema, cur_children = cur
+        label = f"{where}/{ref_id}" if ref_id else f"{where}[{position}]"
+
+        if ref_id != cur_id:
+            return f"level{depth} {label}: ID '{ref_id}' expected, found '{cur_id}'"
+        if ref_type != cur_type:
+            return f"level{depth} {label}: type {ref_type} expected, found {cur_type}"
+        if ref_schema != cur_schema:
+            return f"level{depth} {label}: {_schema_difference(ref_schema, cur_schema)}"
+
+        if ref_children != cur_children:
+            ref_table, ref_nodes = ref_children
+            cur_table, cur_nodes = cur_children
+            if ref_table != cur_table:
+                return f"level{depth + 1} children of {label}: {_schema_difference(ref_table, cur_table)}"
+            inner = _describe(ref_nodes, cur_nodes, label, depth + 1)
+            if inner:
+                return inner
+
+    return None
+
+
+def _schema_difference(reference: pa.Schema, current: pa.Schema) -> str:
+    """Summarize missing, extra and retyped columns."""
+    ref_fields = {field.name: field.type for field in reference}
+    cur_fields = {field.name: field.type for field in current}
+    parts = []
+    missing = [name for name in ref_fields if name not in cur_fields]
+    extra = [name for name in cur_fields if name not in ref_fields]
+    retyped = [
+        f"{name} ({ref_fields[name]} -> {cur_fields[name]})"
+        for name in ref_fields
+        if name in cur_fields and ref_fields[name] != cur_fields[name]
+    ]
+    if missing:
+        parts.append(f"missing columns {missing}")
+    if extra:
+        parts.append(f"extra columns {extra}")
+    if retyped:
+        parts.append(f"different types {retyped}")
+    return "schema differs: " + ("; ".join(parts) if parts else "column order differs")
@@ -0,0 +1,98 @@
+"""
+Context Worker
+
+Builds the root samples of one context, the unit of work scheduled by
+level0.build(). Runs inside executor workers, so it must stay importable at
+module level and return picklable results.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import time
+import traceback
+from typing import NamedTuple
+
+from dataset.config import LEVEL0_RETRIES, LEVEL0_RETRY_BACKOFF
+from dataset.engine.cache import get_build_cache
+from dataset.engine.profiling import drain, extension_timing
+
+
+class ContextResult(NamedTuple):
+    """Outcome of building one context."""
+
+    id: str
+    samples: list | None            # Root samples, None on failure
+    error: str | None               # Error message, None on success
+    cached: bool = False            # True if samples came from the build cache
+    error_type: str | None = None   # Exception class name on failure
+    traceback: str | None = None    # Formatted traceback on failure
+    duration: float = 0.0           # Seconds spent, all attempts included
+    attempts: int = 1               # Number of build attempts
+    timings: dict | None = None     # Builder/extension durations (PROFILE), see engine/profiling.py
+
+
+def run_context(ctx: dict) -> ContextResult:
+    """
+    Build (or reuse from cache) all root samples of one context.
+
+    Failing contexts are retried LEVEL0_RETRIES times, waiting
+    LEVEL0_RETRY_BACKOFF seconds before the first retry and doubling the
+    wait after each one, to ride out flaky storage.
+    """
+    with extension_timing():
+        return _run_context(ctx)
+
+
+def _run_context(ctx: dict) -> ContextResult:
+    from dataset.levels import level0
+
+    start = time.perf_counter()
+    cache = get_build_cache()
+    key = cache.key(ctx) if cache else None
+
+    if cache:
+        samples = cache.get(key)
+        if samples is not None:
+            return ContextResult(
+                ctx["id"], samples, None, cached=True, duration=time.perf_counter() - start, timings=drain()
+            )
+
+    attempt = 1
+    while True:
+        try:
+            samples = level0.build_context(ctx)
+            break
+        except Exception as e:
+            if attempt > LEVEL0_RETRIES:
+                return ContextResult(
+                    ctx["id"],
+                    None,
+                    str(e) or type(e).__name__,  # MemoryError() has no message
+                    error_type=type(e).__name__,
+                    traceback=traceback.format_exc(),
+                    duration=time.perf_counter() - start,
+                    attempts=attempt,
+                    timings=drain(),
+                )
+            time.sleep(LEVEL0_RETRY_BACKOFF * 2 ** (attempt - 1))
+            attempt += 1
+
+    if cache:
+        try:
+            cache.put(key, samples)
+        except Exception as e:
+            print(f"Could not cache context {ctx['id']}: {e}")
+
+    return ContextResult(
+        ctx["id"], samples, None, duration=time.perf_counter() - start, attempts=attempt, timings=drain()
+    )
+
+
+def run_context_rows(ctx: dict) -> ContextResult:
+    """run_context() returning SampleRows instead of Sample objects (LEVEL0_RESULTS = "rows")."""
+    from dataset.engine.rows import encode_samples
+
+    result = run_context(ctx)
+    if result.samples is None:
+        return result
+    return result._replace(samples=encode_samples(result.samples))
@@ -0,0 +1,175 @@
+"""
+Worker Setup
+
+Prepares every level0 worker once, before its first context, instead of
+paying the same costs lazily inside the first context of each worker:
+
+- Caps the threads of native libraries to WORKER_THREADS_PER_PROCESS
+  (resolved by engine/autotune.py when "auto"), so WORKERS processes each
+  spawning one thread per core do not oversubscribe the CPUs. Libraries read
+  OMP_NUM_THREADS, GDAL_NUM_THREADS, ... once, when they are loaded, so the
+  variables are set in the parent environment while a process pool is open
+  (thread_env()) and every worker process starts with them; variables
+  already set are left alone. Pools that do not start from this process
+  (remote Dask workers) are capped with threadpoolctl when it is installed
+  (BLAS and OpenMP only). The "serial" and "thread" executors build in the
+  main process and are not capped.
+- Imports WORKER_PRELOAD modules (rasterio, geopandas, ...) and the dataset
+  levels up front.
+- Calls the WORKER_INIT hook ("module:function", default
+  dataset.extensions:warm_up) for dataset-specific setup.
+- Caps the address space of separate worker processes at
+  LEVEL0_WORKER_MEMORY_LIMIT, so a context that needs too much memory fails
+  with MemoryError (and is recorded as failed) instead of taking the machine
+  or the whole pool down.
+
+get_resource() keeps one handle per worker process (database connection,
+open raster, HTTP session) instead of reopening it in every context:
+
+    from dataset.engine.workers import get_resource
+    db = get_resource("index", lambda: sqlite3.connect("index.sqlite"))
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+import atexit
+import importlib
+import os
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from dataset.config import WORKER_INIT, WORKER_PRELOAD
+
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "GDAL_NUM_THREADS",
+)
+
+_resources: dict[str, tuple[int, Any]] = {}
+_lock = threading.Lock()
+_initialized: set[int] = set()
+_thread_limits = None  # threadpoolctl limits of this worker, kept alive
+
+
+def thread_env_vars(threads: int | None) -> dict[str, str]:
+    """Thread env vars for new worker processes, except those already set here."""
+    if threads is None:
+        return {}
+    return {var: str(threads) for var in THREAD_ENV_VARS if var not in os.environ}
+
+
+@contextmanager
+def thread_env(threads: int | None) -> Iterator[None]:
+    """
+    Set the thread env vars in this process while the with-block runs.
+
+    Worker processes started inside the block (including replacements of
+    recycled workers) inherit them before importing any native library.
+    """
+    added = thread_env_vars(threads)
+    os.environ.update(added)
+    try:
+        yield
+    finally:
+        for var in added:
+            os.environ.pop(var, None)
+
+
+def limit_threads(threads: int | None) -> None:
+    """Cap the BLAS/OpenMP pools already loaded in this process (needs threadpoolctl)."""
+    global _thread_limits
+    if threads is None:
+        return
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    _thread_limits = threadpool_limits(limits=threads)
+
+
+def limit_memory(limit: int | None) -> None:
+    """Cap the address space of this process at limit bytes (no-op on Windows)."""
+    if limit is None:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def resolve_hook(spec: str) -> Callable[[], None]:
+    """Import a "module:function" hook."""
+    module_name, _, function_name = spec.partition(":")
+    if not function_name:
+        raise ValueError(f"WORKER_INIT must look like 'module:function', got {spec!r}")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def init_worker(threads: int | None = None, memory_limit: int | None = None) -> None:
+    """
+    Set up the current process for building contexts (once per process).
+
+    Args:
+        threads: Native threads per worker, applied with threadpoolctl (the
+                 env vars come from thread_env() in the parent), None = no cap
+                 (the "serial" and "thread" executors build in the main process)
+        memory_limit: Address space cap in bytes, only for worker processes
+                      (never the main process), None = no cap
+    """
+    pid = os.getpid()
+    if pid in _initialized:
+        return
+    _initialized.add(pid)
+
+    limit_threads(threads)
+    limit_memory(memory_limit)
+
+    for module in WORKER_PRELOAD or ():
+        importlib.import_module(module)
+    from dataset.levels import level0  # noqa: F401 - imports every level
+
+    if WORKER_INIT:
+        resolve_hook(WORKER_INIT)()
+
+
+def get_resource(name: str, factory: Callable[[], Any]) -> Any:
+    """
+    Return the per-process resource name, creating it with factory() once.
+
+    Handles inherited from a forked parent are never reused: each process
+    opens its own. Resources with a close() method are closed at exit.
+    """
+    pid = os.getpid()
+    with _lock:
+        entry = _resources.get(name)
+        if entry is not None and entry[0] == pid:
+            return entry[1]
+        resource = factory()
+        _resources[name] = (pid, resource)
+        return resource
+
+
+@atexit.register
+def close_resources() -> None:
+    """Close the resources opened by this process."""
+    pid = os.getpid()
+    with _lock:
+        owned = [resource for owner, resource in _resources.values() if owner == pid]
+        _resources.clear()
+    for resource in owned:
+        close = getattr(resource, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
@@ -0,0 +1,368 @@
+"""
+Part Writers
+
+Writes SPLIT_SIZE parts concurrently instead of one after the other, with
+PART_WRITERS processes (ZIP output):
+
+- write_parts(): the whole Taco is built first. Its root samples are
+  assigned to containers up front by engine/planner.py (near-equal parts
+  with BALANCED_PARTS, otherwise the same layout as tacotoolbox's own
+  splitting and GROUP_BY), then the containers are written in parallel.
+- write_streaming() (STREAMING_WRITE = True): the dataset is written while
+  it is being built, so the whole Taco never has to exist in memory. Root
+  samples arriving from level0 are packed into parts, and writer processes
+  turn each full part into a Taco and write it while the next part is being
+  built. Peak memory is about PART_WRITERS + 1 parts instead of the whole
+  dataset. Sizes are only known as samples arrive, so parts are filled
+  greedily (no GROUP_BY).
+
+Each part is written by one tacotoolbox.create() call in its own process:
+create() is not documented as thread-safe, so parts are never written by
+threads of the same process. The samples of a part (and the rows of its
+tortilla metadata) are pickled to the writer process, which rebuilds the
+part's Taco; with PART_WRITERS = 1, write_parts() writes in this process.
+
+Either way, the per-part metadata is merged into .tacocat/ (CONSOLIDATE) in
+part order once every part is written, unless a single container was
+written.
+
+DO NOT EDIT THIS FILE - Configure it from dataset/config.py instead.
+"""
+
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import pyarrow as pa
+import pydantic
+from tacotoolbox import create
+from tacotoolbox.taco.datamodel import Taco
+from tacotoolbox.tortilla.datamodel import Tortilla, TortillaExtension
+
+from dataset.engine.planner import part_path, plan_layout, print_plan
+from dataset.engine.sizes import parse_size
+
+
+class StreamResult(NamedTuple):
+    """Outcome of a streaming write."""
+
+    paths: list[Path]   # Written containers (single output or parts)
+    n_samples: int      # Root samples written
+    collection: dict    # COLLECTION.json of the last part (Taco fields without the tortilla)
+
+
+def write_part(taco: Taco, path: Path, temp_dir: str | Path | None, parquet_kwargs: dict) -> list[Path]:
+    """Write the Taco of one part as a single ZIP."""
+    n_samples = len(taco.tortilla.samples)
+    print(f"Writing part {path.name}: {n_samples} root samples")
+    return create(
+        taco=taco,
+        output=path,
+        output_format="zip",
+        split_size=None,
+        consolidate=False,
+        temp_dir=temp_dir,
+        **parquet_kwargs,
+    )
+
+
+def consolidate_parts(paths: list[Path], output: Path) -> None:
+    """Merge the metadata of every part into output.parent/.tacocat/."""
+    from tacotoolbox.tacocat import create_tacocat
+
+    print(f"Consolidating {len(paths)} parts into {output.parent / '.tacocat'}...")
+    create_tacocat(inputs=paths, output=output.parent, validate_schema=True)
+
+
+def is_zip_output(output: str | Path, output_format: str) -> bool:
+    """Whether the output resolves to ZIP containers."""
+    is_zip = Path(output).suffix.lower() in (".zip", ".tacozip")
+    return output_format == "zip" or (output_format == "auto" and is_zip)
+
+
+def check_zip_output(output: str | Path, output_format: str, group_by: Any, setting: str) -> None:
+    """Raise ValueError unless setting can write this output (ZIP parts, no GROUP_BY)."""
+    if not is_zip_output(output, output_format):
+        raise ValueError(f"{setting} requires ZIP output (OUTPUT_PATH ending in .tacozip or .zip)")
+    if group_by is not None:
+        raise ValueError(f"{setting} does not support GROUP_BY, set one of them to None")
+
+
+class _DatasetColumns(TortillaExtension):
+    """Columns of the whole-dataset tortilla (TortillaExtensions), carried into a part as computed."""
+
+    model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
+
+    table: pa.Table
+    descriptions: dict[str, str] = {}
+
+    def get_schema(self) -> pa.Schema:
+        return self.table.schema
+
+    def get_field_descriptions(self) -> dict[str, str]:
+        return self.descriptions
+
+    def _compute(self, tortilla: Tortilla) -> pa.Table:
+        return self.table
+
+
+def _field_descriptions(tortilla: Tortilla) -> dict[str, str]:
+    # tacotoolbox 0.22 has no public accessor for the descriptions of a tortilla's columns
+    return dict(tortilla._field_descriptions)
+
+
+def _write_planned_part(
+    samples: list,
+    metadata: pa.Table,
+    field_descriptions: dict,
+    fields: dict,
+    path: Path,
+    temp_dir: str | Path | None,
+    parquet_kwargs: dict,
+) -> list[Path]:
+    """
+    Write one planned part from its root samples and tortilla metadata rows.
+
+    The part's tortilla is built from its samples; columns the whole-dataset
+    tortilla got from TortillaExtensions are added back as they were
+    computed over the whole dataset, not recomputed for the part.
+    """
+    tortilla = Tortilla(samples=samples, strict_schema=False)
+    own = set(tortilla.metadata_table.schema.names)
+    extra = [name for name in metadata.schema.names if name not in own]
+    if extra:
+        descriptions = {name: field_descriptions[name] for name in extra if name in field_descriptions}
+        tortilla.extend_with(_DatasetColumns(table=metadata.select(extra), descriptions=descriptions))
+    return write_part(Taco(tortilla=tortilla, **fields), path, temp_dir, parquet_kwargs)
+
+
+def write_parts(
+    taco: Taco,
+    output: str | Path,
+    output_format: str = "auto",
+    split_size: str | None = "4GB",
+    group_by: str | list[str] | None = None,
+    consolidate: bool = True,
+    writers: int = 4,
+    balanced: bool = True,
+    first_part: int = 1,
+    temp_dir: str | Path | None = None,
+    **parquet_kwargs: Any,
+) -> list[Path]:
+    """
+    Write a built Taco as planned containers, writers at a time.
+
+    Args:
+        taco: Complete Taco
+        output: Output path (.tacozip / .zip)
+        output_format: Must resolve to "zip"
+        split_size: Max size per part, None = no splitting
+        group_by: Column(s) to group by, one container (or more, if
+                  balanced) per group value
+        consolidate: Create .tacocat/ when more than one container is written
+        writers: Containers written concurrently, each by its own process
+        balanced: Near-equal parts, see engine/planner.py
+        first_part: Number of the first part, > 1 always writes _partNNNN
+                    files (appending to an existing dataset)
+        temp_dir: Temp directory passed to tacotoolbox.create()
+        **parquet_kwargs: Parquet writer parameters
+
+    Returns:
+        Written paths, in part order
+    """
+    output = Path(output)
+    if not is_zip_output(output, output_format):
+        raise ValueError("PART_WRITERS and BALANCED_PARTS require ZIP output (OUTPUT_PATH ending in .tacozip or .zip)")
+
+    max_size = parse_size(split_size, "SPLIT_SIZE") if split_size is not None else None
+    plan = plan_layout(taco, output, max_size, group_by, balanced, first_part)
+    print_plan(plan, max_size)
+    if len(plan) == 1 and plan[0].path == output:
+        return write_part(taco, output, temp_dir, parquet_kwargs)
+
+    for part in plan:
+        if part.path.exists():
+            raise FileExistsError(f"Part already exists: {part.path}")
+
+    fields = taco.model_dump(exclude={"tortilla", "extent"})  # Extent is recomputed per part
+    samples = taco.tortilla.samples
+    metadata = taco.tortilla.metadata_table
+    descriptions = _field_descriptions(taco.tortilla)
+    jobs = [
+        ([samples[i] for i in part.indices], metadata.take(part.indices), descriptions, fields, part.path)
+        for part in plan
+    ]
+
+    if writers == 1 or len(plan) == 1:
+        written = [_write_planned_part(*job, temp_dir, parquet_kwargs) for job in jobs]
+    else:
+        print(f"Writing {min(writers, len(plan))} container(s) at a time")
+        with ProcessPoolExecutor(max_workers=min(writers, len(plan))) as pool:
+            futures = [pool.submit(_write_planned_part, *job, temp_dir, parquet_kwargs) for job in jobs]
+            written = [future.result() for future in futures]
+    paths = [path for part_paths in written for path in part_paths]
+
+    if consolidate and len(paths) > 1:
+        consolidate_parts(paths, output)
+    return paths
+
+
+def _write_streamed_part(
+    make_taco: Callable,
+    samples: list,
+    path: Path,
+    temp_dir: str | Path | None,
+    parquet_kwargs: dict,
+) -> tuple[list[Path], dict]:
+    """Build the Taco of one streamed part and write it, return its paths and COLLECTION.json."""
+    taco = make_taco(samples)
+    paths = write_part(taco, path, temp_dir, parquet_kwargs)
+    return paths, taco.model_dump(exclude={"tortilla"}, mode="json")
+
+
+class PartWriter:
+    """Writer processes writing up to writers parts at a time."""
+
+    def __init__(
+        self,
+        make_taco: Callable,
+        output: Path,
+        temp_dir: str | Path | None,
+        parquet_kwargs: dict,
+        writers: int = 1,
+    ):
+        self.make_taco = make_taco
+        self.output = output
+        self.temp_dir = temp_dir
+        self.parquet_kwargs = parquet_kwargs
+        self.writers = writers
+        self.pool: ProcessPoolExecutor | None = None
+        self.pending: dict[Future, int] = {}
+        self.written: dict[int, tuple[list[Path], dict]] = {}
+
+    @property
+    def paths(self) -> list[Path]:
+        """Written paths, in part order."""
+        return [path for index in sorted(self.written) for path in self.written[index][0]]
+
+    @property
+    def collection(self) -> dict | None:
+        """COLLECTION.json of the last part."""
+        return self.written[max(self.written)][1] if self.written else None
+
+    def start(self) -> None:
+        self.pool = ProcessPoolExecutor(max_workers=self.writers)
+
+    def _collect(self, futures: Iterable[Future]) -> None:
+        for future in futures:
+            index = self.pending.pop(future)
+            self.written[index] = future.result()  # Raises the writer's error
+
+    def submit(self, index: int, samples: list) -> None:
+        """Hand a full part to a writer, waits while every writer is busy."""
+        while len(self.pending) >= self.writers:
+            done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        future = self.pool.submit(
+            _write_streamed_part,
+            self.make_taco,
+            samples,
+            part_path(self.output, index),
+            self.temp_dir,
+            self.parquet_kwargs,
+        )
+        self.pending[future] = index
+
+    def join(self) -> None:
+        """Stop the writers once the submitted parts are written, ignoring their errors."""
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+
+    def finish(self) -> None:
+        """Wait for every submitted part to be written."""
+        try:
+            self._collect(list(self.pending))
+        finally:
+            self.join()
+
+
+def write_streaming(
+    samples: Iterable,
+    make_taco: Callable,
+    output: str | Path,
+    output_format: str = "auto",
+    split_size: str | None = "4GB",
+    group_by: str | list[str] | None = None,
+    consolidate: bool = True,
+    writers: int = 1,
+    first_part: int = 1,
+    temp_dir: str | Path | None = None,
+    **parquet_kwargs: Any,
+) -> StreamResult:
+    """
+    Write root samples to ZIP parts as they arrive.
+
+    Args:
+        samples: Iterable of root samples, consumed lazily
+        make_taco: Builds the Taco of one part from its root samples, in a
+                   writer process (a module-level function)
+        output: Output path (.tacozip / .zip)
+        output_format: Must resolve to "zip"
+        split_size: Max size per part, None = a single part
+        group_by: Must be None (grouping needs every sample up front)
+        consolidate: Create .tacocat/ when more than one part is written
+        writers: Parts written concurrently, each by its own process
+        first_part: Number of the first part, > 1 always keeps _partNNNN
+                    names (appending to an existing dataset)
+        temp_dir: Temp directory passed to tacotoolbox.create()
+        **parquet_kwargs: Parquet writer parameters
+
+    Returns:
+        StreamResult with the written paths
+    """
+    output = Path(output)
+    check_zip_output(output, output_format, group_by, "STREAMING_WRITE")
+
+    max_size = parse_size(split_size, "SPLIT_SIZE") if split_size is not None else None
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    writer = PartWriter(make_taco, output, temp_dir, parquet_kwargs, writers)
+    writer.start()
+
+    part: list = []
+    part_size = 0
+    n_parts = 0
+    n_samples = 0
+
+    try:
+        for sample in samples:
+            n_samples += 1
+            if max_size is not None and part and part_size + sample._size_bytes > max_size:
+                writer.submit(first_part + n_parts, part)
+                n_parts += 1
+                part, part_size = [], 0
+            part.append(sample)
+            part_size += sample._size_bytes
+
+        if part:
+            writer.submit(first_part + n_parts, part)
+            n_parts += 1
+        part = []
+    except BaseException:
+        # Let the writers finish the parts in progress, then report the build error
+        writer.join()
+        raise
+
+    writer.finish()
+
+    if n_parts == 0:
+        raise ValueError("No root samples were built, nothing to write")
+
+    paths = writer.paths
+    if n_parts == 1 and first_part == 1:
+        paths = [paths[0].replace(output)]
+    elif consolidate:
+        consolidate_parts(paths, output)
+
+    return StreamResult(paths=paths, n_samples=n_samples, collection=writer.collection)
@@ -5,29 +5,81 @@ Extensions add metadata to your TACO dataset at different levels:
 
 1. SampleExtension - Per-file or per-folder metadata
    Applied in levelN.py: sample.extend_with(MyExtension(...))
-   
+
+   BatchSampleExtension - Same metadata, computed for many samples at once
+   Applied in levelN.py: extend_samples(samples, MyBatchExtension(...))
+   Implement _compute_batch(samples) returning one row per sample. Prefer it
+   for levels with many samples; regular SampleExtensions passed to
+   extend_samples() still run once per sample.
+
 2. TortillaExtension - Computed across all samples in a tortilla
    Applied in tortilla.py: tortilla.extend_with(MyExtension())
-   
+
 3. TacoExtension - Dataset-wide metadata
    Applied in taco.py: taco.extend_with(MyExtension())
 
 Each extension must implement 3 methods:
-- get_schema() -> defines the PyArrow schema (field names + types)
+- get_schema() -> returns the PyArrow schema (field names + types)
 - get_field_descriptions() -> human-readable description of each field
 - _compute() -> returns PyArrow Table with the actual metadata values
+  (_compute_batch() for a BatchSampleExtension)
+
+Slow extensions that only depend on the file (full-raster statistics, header
+parsing) can be wrapped in cached(): with EXTENSION_CACHE = True their
+results are kept in BUILD_CACHE_DIR/extension_cache.sqlite and reused while
+the file is unchanged:
+    sample.extend_with(cached(GeotiffStats()))
+
+Sample extensions run once per sample, millions of times in large datasets:
+import heavy libraries at module level, never inside _compute(). Level0
+workers import this module and call warm_up() once when they start
+(WORKER_INIT in config.py), so the import cost is paid before the first
+context, not per sample.
+
+Run directly to measure the per-sample overhead of extend_with() and of
+the batch extensions:
+    python -m dataset.extensions
 """
 
 import pyarrow as pa
 from tacotoolbox.sample.datamodel import SampleExtension
+from dataset.engine.batch import BatchSampleExtension, extend_samples  # noqa: F401
+from dataset.engine.extension_cache import cached  # noqa: F401
 from tacotoolbox.tortilla.datamodel import TortillaExtension
 from tacotoolbox.taco.datamodel import TacoExtension
 
+# Optional dependencies - imported once per worker, not per sample
+try:
+    import geopandas as gpd
+except ImportError:
+    gpd = None
+
+
+def _require_geopandas(extension: str) -> None:
+    if gpd is None:
+        raise ImportError(f"{extension} requires geopandas. Run: pip install geopandas")
+
+
+def warm_up() -> None:
+    """
+    Prepare a level0 worker before its first context.
+
+    Called once in every worker process (and in the main process for the
+    "serial" and "thread" executors). Module-level imports above have already
+    run at this point; load anything else that is expensive to initialize
+    and reused by every sample here (lookup tables, model weights, ...).
+    Registered as WORKER_INIT in config.py; keep per-process handles with
+    get_resource() so contexts reuse them:
+
+        from dataset.engine.workers import get_resource
+        get_resource("index", lambda: sqlite3.connect("index.sqlite"))
+    """
+
 
 class CustomMetadata(SampleExtension):
     """
     Example SampleExtension that adds custom metadata to each sample.
-    
+
     Fields are passed when calling the extension:
         sample.extend_with(CustomMetadata(region="north", quality_score=0.95))
     """
@@ -37,23 +89,22 @@ class CustomMetadata(SampleExtension):
     quality_score: float
     flag: str | None = None
 
-    def get_schema(self) -> dict[str, pa.DataType]:
+    def get_schema(self) -> pa.Schema:
         """
         Define the PyArrow schema for this extension.
-        
-        Returns dict mapping field names to PyArrow types.
+
         Field names should use prefix pattern: "namespace:fieldname"
         """
-        return {
-            "custom:region": pa.string(),
-            "custom:quality_score": pa.float32(),
-            "custom:flag": pa.string()
-        }
+        return pa.schema([
+            ("custom:region", pa.string()),
+            ("custom:quality_score", pa.float32()),
+            ("custom:flag", pa.string()),
+        ])
 
     def get_field_descriptions(self) -> dict[str, str]:
         """
         Human-readable descriptions for documentation.
-        
+
         These appear in COLLECTION.json and generated docs.
         """
         return {
@@ -65,68 +116,89 @@ class CustomMetadata(SampleExtension):
     def _compute(self, sample) -> pa.Table:
         """
         Generate the actual metadata values as a PyArrow Table.
-        
+
         Args:
             sample: The Sample object this extension is attached to
-            
+
         Returns:
             PyArrow Table with one row containing the metadata
         """
-        # Create schema from get_schema()
-        schema = pa.schema([
-            (name, dtype) for name, dtype in self.get_schema().items()
-        ])
-        
         # Build data dict matching the schema
         data = {
             "custom:region": [self.region],
             "custom:quality_score": [self.quality_score],
             "custom:flag": [self.flag]
         }
-        
-        return pa.table(data, schema=schema)
+
+        return pa.table(data, schema=self.get_schema())
 
 
 class GeometryExtension(SampleExtension):
     """
     Example: Convert WKT geometry to WKB binary format.
-    
+
     WKB (Well-Known Binary) is more efficient for storage than WKT strings.
     """
 
     wkt: str  # Input as WKT string
-    
-    def get_schema(self) -> dict[str, pa.DataType]:
-        return {"geometry:wkb": pa.binary()}
+
+    def get_schema(self) -> pa.Schema:
+        return pa.schema([("geometry:wkb", pa.binary())])
 
     def get_field_descriptions(self) -> dict[str, str]:
         return {"geometry:wkb": "Geometry in WKB binary format"}
 
     def _compute(self, sample) -> pa.Table:
-        import geopandas as gpd
-        
+        _require_geopandas("GeometryExtension")
+
         # Convert WKT string to WKB binary
         wkb = gpd.GeoSeries.from_wkt([self.wkt]).to_wkb()[0]
-        
-        schema = pa.schema([("geometry:wkb", pa.binary())])
-        data = {"geometry:wkb": [wkb]}
-        
-        return pa.table(data, schema=schema)
+
+        return pa.table({"geometry:wkb": [wkb]}, schema=self.get_schema())
+
+
+class GeometryBatch(BatchSampleExtension):
+    """
+    Example BatchSampleExtension: GeometryExtension for a whole list of samples.
+
+    One GeoSeries.from_wkt() call converts every geometry, instead of one
+    call (and one single-row table) per sample:
+        extend_samples(samples, GeometryBatch(wkt=[ctx["wkt"] for _ in samples]))
+    """
+
+    wkt: list[str]  # One WKT string per sample, in sample order
+
+    def get_schema(self) -> pa.Schema:
+        return pa.schema([("geometry:wkb", pa.binary())])
+
+    def get_field_descriptions(self) -> dict[str, str]:
+        return {"geometry:wkb": "Geometry in WKB binary format"}
+
+    def _compute_batch(self, samples: list) -> pa.Table:
+        _require_geopandas("GeometryBatch")
+
+        if len(self.wkt) != len(samples):
+            raise ValueError(f"GeometryBatch got {len(self.wkt)} geometries for {len(samples)} samples")
+
+        # Convert all WKT strings to WKB binary at once
+        wkb = gpd.GeoSeries.from_wkt(self.wkt).to_wkb()
+
+        return pa.table({"geometry:wkb": pa.array(list(wkb), pa.binary())}, schema=self.get_schema())
 
 
 class SpatialCoverage(TortillaExtension):
     """
     Example TortillaExtension that computes statistics across all samples.
-    
+
     TortillaExtensions don't take initialization parameters.
     They compute metadata from the entire tortilla.
     """
-    
-    def get_schema(self) -> dict[str, pa.DataType]:
-        return {
-            "coverage:n_samples": pa.int64(),
-            "coverage:total_area": pa.float32()
-        }
+
+    def get_schema(self) -> pa.Schema:
+        return pa.schema([
+            ("coverage:n_samples", pa.int64()),
+            ("coverage:total_area", pa.float32()),
+        ])
 
     def get_field_descriptions(self) -> dict[str, str]:
         return {
@@ -137,46 +209,42 @@ class SpatialCoverage(TortillaExtension):
     def _compute(self, tortilla) -> pa.Table:
         """
         Compute metadata from all samples in the tortilla.
-        
+
         Args:
             tortilla: The Tortilla object containing all samples
-            
+
         Returns:
             PyArrow Table with aggregated statistics
         """
         n_samples = len(tortilla.samples)
-        
+
         # Example: compute total area from sample geometries
         total_area = 0.0
         # TODO: Extract geometries from samples and sum areas
         # for sample in tortilla.samples:
         #     if hasattr(sample, 'geometry'):
         #         total_area += sample.geometry.area
-        
-        schema = pa.schema([
-            (name, dtype) for name, dtype in self.get_schema().items()
-        ])
-        
+
         data = {
             "coverage:n_samples": [n_samples],
             "coverage:total_area": [total_area]
         }
-        
-        return pa.table(data, schema=schema)
+
+        return pa.table(data, schema=self.get_schema())
 
 
 class DatasetStats(TacoExtension):
     """
     Example TacoExtension for dataset-wide metadata.
-    
+
     TacoExtensions compute metadata for the entire TACO dataset.
     """
-    
-    def get_schema(self) -> dict[str, pa.DataType]:
-        return {
-            "stats:creation_date": pa.string(),
-            "stats:n_root_samples": pa.int64()
-        }
+
+    def get_schema(self) -> pa.Schema:
+        return pa.schema([
+            ("stats:creation_date", pa.string()),
+            ("stats:n_root_samples", pa.int64()),
+        ])
 
     def get_field_descriptions(self) -> dict[str, str]:
         return {
@@ -187,25 +255,72 @@ class DatasetStats(TacoExtension):
     def _compute(self, taco) -> pa.Table:
         """
         Compute dataset-wide metadata.
-        
+
         Args:
             taco: The complete Taco object
-            
+
         Returns:
             PyArrow Table with dataset statistics
         """
         from datetime import datetime
-        
+
         creation_date = datetime.now().isoformat()
         n_root = len(taco.tortilla.samples)
-        
-        schema = pa.schema([
-            (name, dtype) for name, dtype in self.get_schema().items()
-        ])
-        
+
         data = {
             "stats:creation_date": [creation_date],
             "stats:n_root_samples": [n_root]
         }
-        
-        return pa.table(data, schema=schema)
+
+        return pa.table(data, schema=self.get_schema())
+
+
+# Benchmark - run directly to measure the per-sample overhead
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+    from pathlib import Path
+
+    from tacotoolbox.datamodel import Sample
+
+    N = 20_000
+
+    # Every sample points at one real file (Sample(path=bytes) writes a temp file per sample)
+    fd, name = tempfile.mkstemp(suffix=".bin")
+    os.write(fd, b"benchmark")
+    os.close(fd)
+    path = Path(name)
+
+    def timed_us(fn, samples: list) -> float:
+        start = time.perf_counter()
+        fn(samples)
+        return (time.perf_counter() - start) / len(samples) * 1e6
+
+    def new_samples(n: int) -> list:
+        return [Sample(id=f"s{i}", path=path) for i in range(n)]
+
+    def extend_each(extension):
+        def run(samples: list) -> None:
+            for sample in samples:
+                sample.extend_with(extension)
+        return run
+
+    try:
+        custom = CustomMetadata(region="north", quality_score=0.95)
+        print(f"CustomMetadata, {N} samples:")
+        print(f"  sample.extend_with():      {timed_us(extend_each(custom), new_samples(N)):8.1f} µs/sample")
+        print(f"  extend_samples():          {timed_us(lambda s: extend_samples(s, custom), new_samples(N)):8.1f} µs/sample")
+
+        if gpd is not None:
+            wkt = "POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))"
+            n = N // 10
+            single = timed_us(extend_each(GeometryExtension(wkt=wkt)), new_samples(n))
+            batch = timed_us(lambda s: extend_samples(s, GeometryBatch(wkt=[wkt] * n)), new_samples(n))
+            print(f"\nGeometry WKT -> WKB, {n} samples:")
+            print(f"  GeometryExtension:         {single:8.1f} µs/sample")
+            print(f"  GeometryBatch:             {batch:8.1f} µs/sample ({single / batch:.1f}x)")
+        else:
+            print("\nGeometry benchmark skipped (pip install geopandas)")
+    finally:
+        path.unlink()
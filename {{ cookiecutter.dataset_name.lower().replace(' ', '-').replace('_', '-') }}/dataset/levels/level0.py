@@ -28,27 +28,35 @@ Run directly to test:
 
 Note:
     level0.build() iterates over ALL contexts and creates the root Tortilla.
+    Contexts are consumed lazily from any iterable (see iter_contexts()).
     This is the only level that iterates - all others receive a single context.
-    Parallel processing is controlled by config.py (LEVEL0_PARALLEL, WORKERS).
+    Parallel processing is controlled by config.py (LEVEL0_PARALLEL, EXECUTOR,
+    WORKERS, LEVEL0_CHUNKSIZE, LEVEL0_MAX_INFLIGHT, LEVEL0_PRESERVE_ORDER) and
+    driven by dataset/engine/runner.py.
 """
 
+from collections.abc import Iterable, Iterator
+
 from tacotoolbox.datamodel import Sample, Tortilla
 {% if cookiecutter.max_levels|int == 0 %}# from tacotoolbox.sample.extensions.stac import STAC
 # from tacotoolbox.sample.extensions.scaling import Scaling
 # from tacotoolbox.sample.extensions.split import Split
 # from tacotoolbox.sample.extensions.tacotiff import Header
 # from tacotoolbox.sample.extensions.geotiff_stats import GeotiffStats
-# from dataset.extensions import CustomMetadata
+# from dataset.extensions import CustomMetadata, cached
 {% else %}from dataset.levels import level1
-# from dataset.extensions import CustomMetadata
+# from dataset.extensions import CustomMetadata, cached
 {% endif %}
-from dataset.metadata import load_contexts
-from dataset.config import LEVEL0_SAMPLE_LIMIT, LEVEL0_PARALLEL, WORKERS
+from dataset.metadata import iter_contexts, load_contexts
+from dataset.engine.runner import iter_root_samples
+from dataset.engine.threads import build_samples
+from dataset.config import LEVEL0_SAMPLE_LIMIT, LEVEL0_PARALLEL, EXECUTOR, WORKERS
 
 
 # Tortilla parameters
 PAD_TO = None
 STRICT_SCHEMA = True
+THREADS = None  # Build this level's SAMPLES in a thread pool of N threads, None = serial
 
 
 {% if cookiecutter.max_levels|int == 0 %}# Sample builders - one function per file type
@@ -56,7 +64,7 @@ def build_sample_rgb(ctx: dict) -> Sample:
     """RGB image (3 bands, uint8)"""
     sample = Sample(id="rgb", path=b"/path/to/rgb.tif")
     # sample.extend_with(Header())
-    # sample.extend_with(GeotiffStats())
+    # sample.extend_with(cached(GeotiffStats()))
     # sample.extend_with(CustomMetadata(region="north", quality_score=0.95))
     return sample
 
@@ -65,7 +73,7 @@ def build_sample_multiband(ctx: dict) -> Sample:
     """Multispectral image (10 bands, uint16)"""
     sample = Sample(id="multiband", path=b"/path/to/multiband.tif")
     # sample.extend_with(Header())
-    # sample.extend_with(GeotiffStats())
+    # sample.extend_with(cached(GeotiffStats()))
     return sample
 
 
@@ -73,7 +81,7 @@ def build_sample_singleband(ctx: dict) -> Sample:
     """Singleband float (DEM, indices, etc.)"""
     sample = Sample(id="singleband", path=b"/path/to/singleband.tif")
     # sample.extend_with(Header())
-    # sample.extend_with(GeotiffStats())
+    # sample.extend_with(cached(GeotiffStats()))
     return sample
 
 
@@ -114,33 +122,43 @@ SAMPLES = [
 ]
 {% endif %}
 
-# Helper for parallel processing - must be at module level for pickling
-def _build_samples_parallel(ctx: dict) -> tuple[list[Sample] | None, tuple[str, str] | None]:
-    """
-    Build samples for one context (used in parallel mode).
-    
-    Returns:
-        (samples, None) on success
-        (None, (id, error)) on failure
-    """
-    try:
-        return [fn(ctx) for fn in SAMPLES], None
-    except Exception as e:
-        return None, (ctx["id"], str(e))
+# Build all root samples for ONE context (the unit of work run by the workers)
+def build_context(ctx: dict) -> list[Sample]:
+    return build_samples(SAMPLES, ctx, threads=THREADS, level="level0")
 
 
-# Build function - ROOT level iterates over ALL contexts
-def build(contexts: list[dict] | None = None, parallel: bool | None = None, workers: int | None = None) -> Tortilla:
+# Wrap root samples in the root Tortilla (also called once per part by STREAMING_WRITE)
+def build_tortilla(samples: list[Sample]) -> Tortilla:
+    return Tortilla(
+        samples=samples,
+        pad_to=PAD_TO,
+        strict_schema=STRICT_SCHEMA,
+    )
+
+
+# Stream the root samples of ALL contexts as they are built
+def iter_samples(
+    contexts: Iterable[dict] | None = None,
+    parallel: bool | None = None,
+    workers: int | None = None,
+    resume: bool = False,
+) -> Iterator[Sample]:
     """
-    Build root Tortilla from contexts.
+    Yield root samples from contexts as soon as each context is built.
+    
+    Contexts whose inputs did not change since the last run are reused from
+    the build cache (BUILD_CACHE = True in config.py) instead of being rebuilt.
+    Finished contexts are checkpointed to BUILD_STATE_DIR/journal as the
+    build runs, even if it is interrupted.
     
     Args:
-        contexts: List of context dicts, if None uses load_contexts(LEVEL0_SAMPLE_LIMIT)
+        contexts: Iterable of context dicts, if None streams iter_contexts(LEVEL0_SAMPLE_LIMIT)
         parallel: Enable parallel processing, if None uses LEVEL0_PARALLEL from config
         workers: Number of workers, if None uses WORKERS from config
+        resume: Reuse contexts checkpointed by a previous, interrupted build
     """
     if contexts is None:
-        contexts = load_contexts(limit=LEVEL0_SAMPLE_LIMIT)
+        contexts = iter_contexts(limit=LEVEL0_SAMPLE_LIMIT)
     
     if parallel is None:
         parallel = LEVEL0_PARALLEL
@@ -148,40 +166,18 @@ def build(contexts: list[dict] | None = None, parallel: bool | None = None, work
     if workers is None:
         workers = WORKERS
     
-    failed_ids = []
-    
-    # Generate samples in parallel or serial
-    if parallel:
-        from concurrent.futures import ProcessPoolExecutor
-        
-        with ProcessPoolExecutor(max_workers=workers) as executor:
-            results = list(executor.map(_build_samples_parallel, contexts))
-        
-        samples = []
-        for result, error in results:
-            if error:
-                failed_ids.append(error[0])
-                print(f"Failed to build sample {error[0]}: {error[1]}")
-            else:
-                samples.extend(result)
-    else:
-        samples = []
-        for ctx in contexts:
-            try:
-                samples.extend([fn(ctx) for fn in SAMPLES])
-            except Exception as e:
-                failed_ids.append(ctx["id"])
-                print(f"Failed to build sample {ctx['id']}: {e}")
-    
-    if failed_ids:
-        print(f"\nTotal failed samples: {len(failed_ids)}")
-        print(f"Failed IDs: {failed_ids}")
-    
-    return Tortilla(
-        samples=samples,
-        pad_to=PAD_TO,
-        strict_schema=STRICT_SCHEMA,
-    )
+    return iter_root_samples(contexts, parallel=parallel, workers=workers, resume=resume)
+
+
+# Build function - ROOT level iterates over ALL contexts
+def build(
+    contexts: Iterable[dict] | None = None,
+    parallel: bool | None = None,
+    workers: int | None = None,
+    resume: bool = False,
+) -> Tortilla:
+    """Build root Tortilla from contexts (arguments as in iter_samples())."""
+    return build_tortilla(list(iter_samples(contexts, parallel=parallel, workers=workers, resume=resume)))
 
 
 # Validation - run directly to test
@@ -191,7 +187,7 @@ if __name__ == "__main__":
 {% endif %}
     contexts = load_contexts(limit=LEVEL0_SAMPLE_LIMIT or 2)
     print(f"Building level0 with {len(contexts)} contexts...")
-    print(f"Parallel: {LEVEL0_PARALLEL}, Workers: {WORKERS}")
+    print(f"Parallel: {LEVEL0_PARALLEL}, Executor: {EXECUTOR}, Workers: {WORKERS}")
     tortilla = build(contexts)
     print(f"Created {len(tortilla.samples)} root samples")
     print(tortilla.export_metadata())
\ No newline at end of file
@@ -39,16 +39,18 @@ from tacotoolbox.datamodel import Sample, Tortilla
 # from tacotoolbox.sample.extensions.split import Split
 # from tacotoolbox.sample.extensions.tacotiff import Header
 # from tacotoolbox.sample.extensions.geotiff_stats import GeotiffStats
-# from dataset.extensions import CustomMetadata
+# from dataset.extensions import CustomMetadata, GeometryBatch, cached, extend_samples
 {% else %}from dataset.levels import level2
-# from dataset.extensions import CustomMetadata
+# from dataset.extensions import CustomMetadata, GeometryBatch, cached, extend_samples
 {% endif %}
 from dataset.metadata import load_contexts
+from dataset.engine.threads import build_samples
 
 
 # Tortilla parameters
 PAD_TO = None
 STRICT_SCHEMA = True
+THREADS = None  # Build this level's SAMPLES in a thread pool of N threads, None = serial
 
 
 {% if cookiecutter.max_levels|int == 1 %}# Sample builders - one function per file type
@@ -56,7 +58,7 @@ def build_sample_rgb(ctx: dict) -> Sample:
     """RGB image (3 bands, uint8)"""
     sample = Sample(id="rgb", path=b"/path/to/rgb.tif")
     # sample.extend_with(Header())
-    # sample.extend_with(GeotiffStats())
+    # sample.extend_with(cached(GeotiffStats()))
     # sample.extend_with(CustomMetadata(region="north", quality_score=0.95))
     return sample
 
@@ -65,7 +67,7 @@ def build_sample_multiband(ctx: dict) -> Sample:
     """Multispectral image (10 bands, uint16)"""
     sample = Sample(id="multiband", path=b"/path/to/multiband.tif")
     # sample.extend_with(Header())
-    # sample.extend_with(GeotiffStats())
+    # sample.extend_with(cached(GeotiffStats()))
     return sample
 
 
@@ -73,7 +75,7 @@ def build_sample_singleband(ctx: dict) -> Sample:
     """Singleband float (DEM, indices, etc.)"""
     sample = Sample(id="singleband", path=b"/path/to/singleband.tif")
     # sample.extend_with(Header())
-    # sample.extend_with(GeotiffStats())
+    # sample.extend_with(cached(GeotiffStats()))
     return sample
 
 
@@ -116,8 +118,10 @@ SAMPLES = [
 
 # Build function - receives ONE context, creates ONE Tortilla
 def build(ctx: dict) -> Tortilla:
+    samples = build_samples(SAMPLES, ctx, threads=THREADS, level="level1")
+    # extend_samples(samples, GeometryBatch(wkt=[ctx["wkt"] for _ in samples]))  # one call for all samples
     return Tortilla(
-        samples=[fn(ctx) for fn in SAMPLES],
+        samples=samples,
         pad_to=PAD_TO,
         strict_schema=STRICT_SCHEMA,
     )
@@ -41,14 +41,16 @@ from tacotoolbox.datamodel import Sample, Tortilla
 # from tacotoolbox.sample.extensions.geotiff_stats import GeotiffStats
 {% else %}from dataset.levels import level4
 # from tacotoolbox.sample.extensions.split import Split
-# from dataset.extensions import CustomMetadata
+# from dataset.extensions import CustomMetadata, cached
 {% endif %}
 from dataset.metadata import load_contexts
+from dataset.engine.threads import build_samples
 
 
 # Tortilla parameters
 PAD_TO = None
 STRICT_SCHEMA = True
+THREADS = None  # Build this level's SAMPLES in a thread pool of N threads, None = serial
 
 
 {% if cookiecutter.max_levels|int == 3 %}# Sample builders - one function per file type
@@ -56,7 +58,7 @@ def build_sample_rgb(ctx: dict) -> Sample:
     """RGB image (3 bands, uint8)"""
     sample = Sample(id="rgb", path=b"/path/to/rgb.tif")
     # sample.extend_with(Header())
-    # sample.extend_with(GeotiffStats())
+    # sample.extend_with(cached(GeotiffStats()))
     return sample
 
 
@@ -64,7 +66,7 @@ def build_sample_multiband(ctx: dict) -> Sample:
     """Multispectral image (10 bands, uint16)"""
     sample = Sample(id="multiband", path=b"/path/to/multiband.tif")
     # sample.extend_with(Header())
-    # sample.extend_with(GeotiffStats())
+    # sample.extend_with(cached(GeotiffStats()))
     return sample
 
 
@@ -72,7 +74,7 @@ def build_sample_singleband(ctx: dict) -> Sample:
     """Singleband float (DEM, indices, etc.)"""
     sample = Sample(id="singleband", path=b"/path/to/singleband.tif")
     # sample.extend_with(Header())
-    # sample.extend_with(GeotiffStats())
+    # sample.extend_with(cached(GeotiffStats()))
     return sample
 
 
@@ -117,7 +119,7 @@ SAMPLES = [
 # Build function - receives ONE context, creates ONE Tortilla
 def build(ctx: dict) -> Tortilla:
     return Tortilla(
-        samples=[fn(ctx) for fn in SAMPLES],
+        samples=build_samples(SAMPLES, ctx, threads=THREADS, level="level3"),
         pad_to=PAD_TO,
         strict_schema=STRICT_SCHEMA,
     )
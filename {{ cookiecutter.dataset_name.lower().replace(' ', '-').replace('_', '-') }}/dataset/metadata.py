@@ -8,23 +8,34 @@ A "context" is a dict containing all information needed to build one root sample
 - OPTIONAL: any other fields your levels need (paths, coordinates, dates, etc.)
 
 How contexts flow through TACO:
-1. load_contexts() returns list[dict]
-2. level0.build() iterates over all contexts
+1. iter_contexts() yields one dict at a time (load_contexts() collects them in a list)
+2. level0.build() consumes the iterator, counting contexts as it goes
 3. Each context is passed to level1.build() → level2.build() → ... → leaf level
 4. Levels use context fields to locate files, apply extensions, build samples
 
+Contexts are streamed so peak memory does not depend on how many contexts
+your dataset has. Read your manifest in batches (Parquet row groups, CSV blocks,
+directory entries) and yield dicts; never call df.to_dicts() on the whole table.
+
 The limit parameter enables testing with a subset of your data.
 
+leaf_paths(ctx) optionally lists the files a context's leaf samples read, so
+the build can check that they all exist before building anything (SCAN_LEAVES).
+
 Usage:
-    from dataset.metadata import load_contexts
+    from dataset.metadata import iter_contexts, load_contexts
 
-    # Load all contexts
-    contexts = load_contexts()
+    # Stream all contexts (used by the build)
+    for ctx in iter_contexts():
+        ...
 
     # Load subset for testing
     contexts = load_contexts(limit=10)
 """
 
+import itertools
+from collections.abc import Iterable, Iterator
+
 import tacoreader
 if tacoreader.__version__ < "2.0.0":
     raise ImportError(
@@ -38,12 +49,38 @@ from dataset.config import DATAFRAME_BACKEND
 tacoreader.use(DATAFRAME_BACKEND)
 
 
-def load_contexts(limit: float | int | None = None) -> list[dict]:
+def apply_limit(contexts: Iterable[dict], limit: float | int | None, total: int | None = None) -> Iterator[dict]:
     """
-    Load dataset metadata and return list of context dicts.
+    Lazily truncate a context stream.
+
+    Args:
+        contexts: Iterable of context dicts
+        limit: None (all), float (fraction of total) or int (exact count)
+        total: Total number of contexts, required for float limits
+
+    Raises:
+        ValueError: If limit is a float and total is unknown
+    """
+    if limit is None:
+        yield from contexts
+        return
+
+    if isinstance(limit, float):
+        if total is None:
+            raise ValueError("A fractional limit needs the total context count (pass total=...)")
+        limit = int(total * limit) or 1
+
+    yield from itertools.islice(contexts, limit)
+
+
+def iter_contexts(limit: float | int | None = None) -> Iterator[dict]:
+    """
+    Stream dataset metadata as context dicts.
 
     CUSTOMIZE THIS FUNCTION to match your data source.
     You can load from CSV, Parquet, filesystem, database, API, or any source.
+    Yield contexts one by one instead of building a list, so the build never
+    holds the whole manifest in memory.
 
     Args:
         limit: Optional limit for contexts
@@ -51,8 +88,8 @@ def load_contexts(limit: float | int | None = None) -> list[dict]:
                - If float (0.0-1.0): percentage of total (e.g., 0.1 = 10%)
                - If int: exact count (e.g., 10 = first 10 contexts)
 
-    Returns:
-        list[dict]: One dict per root sample
+    Yields:
+        dict: One dict per root sample
 
         Each dict MUST have:
         - "id": str - unique identifier for this sample
@@ -64,58 +101,40 @@ def load_contexts(limit: float | int | None = None) -> list[dict]:
         - "split": str - train/val/test partition
         - Any other fields your levels need
  
-    Example return:
-        [
-            {
-                "id": "sample_001",
-                "path": b"/data/sample_001",
-                "date": "2024-01-15",
-                "region": "valencia",
-                "cloud_cover": 12.5
-            },
-            ...
-        ]
+    Example yielded context:
+        {
+            "id": "sample_001",
+            "path": b"/data/sample_001",
+            "date": "2024-01-15",
+            "region": "valencia",
+            "cloud_cover": 12.5
+        }
     """
     
     # REPLACE THIS SECTION WITH YOUR DATA LOADING
-    # 
-    # Example 1: Load from CSV file
-    # import polars as pl
-    # df = pl.read_csv("metadata.csv")
-    # if limit is not None:
-    #     if isinstance(limit, float):
-    #         count = int(len(df) * limit) or 1
-    #         df = df.head(count)
-    #     else:
-    #         df = df.head(limit)
-    # return df.to_dicts()
-
-    # Example 2: Load from Parquet file
-    # import polars as pl
-    # df = pl.read_parquet("metadata.parquet")
-    # if limit is not None:
-    #     if isinstance(limit, float):
-    #         count = int(len(df) * limit) or 1
-    #         df = df.head(count)
-    #     else:
-    #         df = df.head(limit)
-    # return df.to_dicts()
-
-    # Example 3: Scan filesystem
-    # from pathlib import Path
-    # contexts = []
-    # for folder in sorted(Path("data").iterdir()):
-    #     contexts.append({
-    #         "id": folder.name,
-    #         "path": str(folder).encode()
-    #     })
-    # if limit is not None:
-    #     if isinstance(limit, float):
-    #         count = int(len(contexts) * limit) or 1
-    #         return contexts[:count]
-    #     else:
-    #         return contexts[:limit]
-    # return contexts
+    #
+    # Example 1: Stream a CSV file block by block
+    # import pyarrow.csv as pv
+    # def rows():
+    #     for batch in pv.open_csv("metadata.csv"):
+    #         yield from batch.to_pylist()
+    # yield from apply_limit(rows(), limit, total=None)  # float limits need a row count
+
+    # Example 2: Stream a Parquet file row group by row group
+    # import pyarrow.parquet as pq
+    # pf = pq.ParquetFile("metadata.parquet")
+    # def rows():
+    #     for batch in pf.iter_batches(batch_size=65536):
+    #         yield from batch.to_pylist()
+    # yield from apply_limit(rows(), limit, total=pf.metadata.num_rows)
+
+    # Example 3: Scan filesystem lazily
+    # import os
+    # def rows():
+    #     for entry in sorted(os.scandir("data"), key=lambda e: e.name):
+    #         if entry.is_dir():
+    #             yield {"id": entry.name, "path": entry.path.encode()}
+    # yield from apply_limit(rows(), limit, total=None)
 
     # MOCK DATA (delete this when you add your implementation)
 
@@ -126,14 +145,52 @@ def load_contexts(limit: float | int | None = None) -> list[dict]:
         {"id": "sample04", "path": b"/mock/sample04"},
         {"id": "sample05", "path": b"/mock/sample05"},
     ]
-    
-    if limit is None:
-        return contexts
-    elif isinstance(limit, float):
-        count = int(len(contexts) * limit) or 1
-        return contexts[:count]
-    else:
-        return contexts[:limit]
+
+    yield from apply_limit(contexts, limit, total=len(contexts))
+
+
+def leaf_paths(ctx: dict) -> list[str]:
+    """
+    List the files the leaf samples of one context will read.
+
+    CUSTOMIZE THIS FUNCTION to mirror the paths your leaf builders pass to
+    Sample(path=...). With SCAN_LEAVES, every listed file is stat'ed in parallel
+    before the build starts: a missing file stops the build immediately, with
+    the full list of missing files, instead of failing inside create().
+    Listed files must not change until the build ends: cached results are
+    checked against the sizes and mtimes of that scan.
+    Return [] for contexts whose files cannot be listed up front (or whose
+    leaves are built from bytes); they are simply not scanned.
+
+    Args:
+        ctx: One context from iter_contexts()
+
+    Returns:
+        list[str]: File paths (str or Path)
+
+    Example:
+        return [f"{ctx['path'].decode()}/{name}.tif" for name in ("rgb", "multiband", "singleband")]
+    """
+
+    # REPLACE THIS WITH THE PATHS OF YOUR LEAF FILES
+    # (the mock leaves are built from bytes, there are no files to check)
+    return []
+
+
+def load_contexts(limit: float | int | None = None) -> list[dict]:
+    """
+    Load contexts into a list.
+
+    Convenience wrapper around iter_contexts() for tests and previews.
+    The build itself streams contexts, prefer iter_contexts() for large datasets.
+
+    Args:
+        limit: Same as iter_contexts()
+
+    Returns:
+        list[dict]: One dict per root sample
+    """
+    return list(iter_contexts(limit=limit))
 
 
 if __name__ == "__main__":
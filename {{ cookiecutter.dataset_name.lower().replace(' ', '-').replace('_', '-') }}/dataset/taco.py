@@ -5,42 +5,38 @@ This is the final step to create your TACO dataset.
 
 1. Calls create_tortilla() to get the root Tortilla
 2. Wraps it in Taco with COLLECTION metadata (from config.py)
-3. Applies TACO-level extensions (optional)
+3. Applies TACO-level extensions (optional, extend_taco)
+
+With STREAMING_WRITE (config.py) every written part gets its own Taco
+(create_part_taco), and .tacocat/ merges their COLLECTION metadata.
 
 Run directly to preview COLLECTION.json before building:
     python -m dataset.taco
 """
 
 import json
+from collections.abc import Iterable
 
+from tacotoolbox.datamodel import Sample
 from tacotoolbox.taco.datamodel import Taco
 # from tacotoolbox.taco.extensions.publications import Publications, Publication
 # from dataset.extensions import DatasetStats
 
 from dataset.config import COLLECTION, LEVEL0_SAMPLE_LIMIT
-from dataset.tortilla import create_tortilla
-from dataset.metadata import load_contexts
+from dataset.tortilla import create_part_tortilla, create_tortilla
+from dataset.metadata import iter_contexts, load_contexts
 
 
-def create_taco(contexts: list[dict] | None = None) -> Taco:
+def extend_taco(taco: Taco) -> Taco:
     """
-    Create complete TACO from Tortilla + COLLECTION metadata.
+    Apply TACO-level extensions (dataset-wide metadata).
     
     Args:
-        contexts: List of context dicts, if None uses load_contexts(LEVEL0_SAMPLE_LIMIT)
+        taco: Taco wrapping the root Tortilla (or one part of it)
     
     Returns:
-        Taco: Complete TACO dataset
+        Taco: The same taco with extensions applied
     """
-    if contexts is None:
-        contexts = load_contexts(limit=LEVEL0_SAMPLE_LIMIT)
-    
-    print(f"Getting root Tortilla with {len(contexts)} contexts...")
-    root_tortilla = create_tortilla(contexts)
-
-    print("Creating TACO with COLLECTION metadata...")
-    taco = Taco(tortilla=root_tortilla, **COLLECTION)
-
     # TACO-level extensions - dataset-wide metadata
     # Uncomment extensions as needed:
     
@@ -56,6 +52,43 @@ def create_taco(contexts: list[dict] | None = None) -> Taco:
     return taco
 
 
+def create_taco(contexts: Iterable[dict] | None = None, resume: bool = False) -> Taco:
+    """
+    Create complete TACO from Tortilla + COLLECTION metadata.
+    
+    Args:
+        contexts: Iterable of context dicts, if None streams iter_contexts(LEVEL0_SAMPLE_LIMIT)
+        resume: Reuse contexts checkpointed by an interrupted build
+    
+    Returns:
+        Taco: Complete TACO dataset
+    """
+    if contexts is None:
+        contexts = iter_contexts(limit=LEVEL0_SAMPLE_LIMIT)
+    
+    print("Getting root Tortilla...")
+    root_tortilla = create_tortilla(contexts, resume=resume)
+
+    print("Creating TACO with COLLECTION metadata...")
+    taco = Taco(tortilla=root_tortilla, **COLLECTION)
+
+    return extend_taco(taco)
+
+
+def create_part_taco(samples: list[Sample]) -> Taco:
+    """
+    Create the TACO of one part of streamed root samples (STREAMING_WRITE).
+    
+    Args:
+        samples: Root samples of the part
+    
+    Returns:
+        Taco: TACO holding only this part
+    """
+    taco = Taco(tortilla=create_part_tortilla(samples), **COLLECTION)
+    return extend_taco(taco)
+
+
 def preview(taco: Taco) -> dict:
     """
     Generate COLLECTION.json preview from Taco object.
@@ -3,7 +3,7 @@ Root Tortilla Definition
 
 This module creates the root Tortilla by:
 1. Calling level0.build() to get all root samples
-2. Optionally applying Tortilla-level extensions
+2. Optionally applying Tortilla-level extensions (extend_tortilla)
 
 Tortilla-level extensions add metadata columns computed across ALL samples:
 - MajorTOM: spherical grid codes (requires stac:centroid)
@@ -11,35 +11,69 @@ Tortilla-level extensions add metadata columns computed across ALL samples:
 - GeoEnrich: Earth Engine data enrichment (requires stac:centroid)
 - Custom extensions: any computed metadata
 
+With STREAMING_WRITE (config.py) the root Tortilla is never built as a whole:
+extend_tortilla() runs once per written part, so extensions that compare
+samples across the whole dataset (SpatialGrouping) only see one part.
+
 Run directly to test:
     python dataset/tortilla.py
 """
 
-from tacotoolbox.datamodel import Tortilla
+from collections.abc import Iterable, Iterator
+
+from tacotoolbox.datamodel import Sample, Tortilla
 # from tacotoolbox.tortilla.extensions.majortom import MajorTOM
 # from tacotoolbox.tortilla.extensions.spatial_grouping import SpatialGrouping
 # from tacotoolbox.tortilla.extensions.geoenrich import GeoEnrich
 # from dataset.extensions import SpatialCoverage
 
+from dataset.levels import level0
 from dataset.levels.level0 import build as build_level0
-from dataset.metadata import load_contexts
+from dataset.metadata import iter_contexts, load_contexts
 from dataset.config import LEVEL0_SAMPLE_LIMIT, LEVEL0_PARALLEL, WORKERS
 
 
-def create_tortilla(contexts: list[dict] | None = None, parallel: bool | None = None, workers: int | None = None) -> Tortilla:
+def extend_tortilla(tortilla: Tortilla) -> Tortilla:
+    """
+    Apply Tortilla-level extensions to the root Tortilla (or to one part).
+    
+    Args:
+        tortilla: Root Tortilla built by level0
+    
+    Returns:
+        Tortilla: The same tortilla with extensions applied
+    """
+    # Tortilla extensions - computed metadata across all samples
+    # Uncomment extensions as needed:
+    
+    # tortilla.extend_with(SpatialCoverage())
+    # tortilla.extend_with(MajorTOM(dist_km=100))
+    # tortilla.extend_with(SpatialGrouping(target_count=1000))
+    # tortilla.extend_with(GeoEnrich(variables=["elevation", "temperature"]))
+    
+    return tortilla
+
+
+def create_tortilla(
+    contexts: Iterable[dict] | None = None,
+    parallel: bool | None = None,
+    workers: int | None = None,
+    resume: bool = False,
+) -> Tortilla:
     """
     Build root Tortilla from level0.
     
     Args:
-        contexts: List of context dicts, if None uses load_contexts(LEVEL0_SAMPLE_LIMIT)
+        contexts: Iterable of context dicts, if None streams iter_contexts(LEVEL0_SAMPLE_LIMIT)
         parallel: Enable parallel processing, if None uses LEVEL0_PARALLEL from config
         workers: Number of workers, if None uses WORKERS from config
+        resume: Reuse contexts checkpointed by an interrupted build
     
     Returns:
         Tortilla: Root tortilla with extensions applied
     """
     if contexts is None:
-        contexts = load_contexts(limit=LEVEL0_SAMPLE_LIMIT)
+        contexts = iter_contexts(limit=LEVEL0_SAMPLE_LIMIT)
     
     if parallel is None:
         parallel = LEVEL0_PARALLEL
@@ -47,20 +81,40 @@ def create_tortilla(contexts: list[dict] | None = None, parallel: bool | None =
     if workers is None:
         workers = WORKERS
     
-    print(f"Building root Tortilla with {len(contexts)} contexts...")
+    print("Building root Tortilla...")
     print(f"Parallel: {parallel}, Workers: {workers}")
     
-    root_tortilla = build_level0(contexts, parallel=parallel, workers=workers)
+    root_tortilla = build_level0(contexts, parallel=parallel, workers=workers, resume=resume)
     
-    # Tortilla extensions - computed metadata across all samples
-    # Uncomment extensions as needed:
+    return extend_tortilla(root_tortilla)
+
+
+def stream_root_samples(
+    contexts: Iterable[dict] | None = None,
+    resume: bool = False,
+) -> Iterator[Sample]:
+    """
+    Stream root samples from level0 without building the root Tortilla.
     
-    # root_tortilla.extend_with(SpatialCoverage())
-    # root_tortilla.extend_with(MajorTOM(dist_km=100))
-    # root_tortilla.extend_with(SpatialGrouping(target_count=1000))
-    # root_tortilla.extend_with(GeoEnrich(variables=["elevation", "temperature"]))
+    Args:
+        contexts: Iterable of context dicts, if None streams iter_contexts(LEVEL0_SAMPLE_LIMIT)
+        resume: Reuse contexts checkpointed by an interrupted build
+    
+    Yields:
+        Sample: Root samples, as soon as their context is built
+    """
+    if level0.PAD_TO is not None:
+        raise ValueError("STREAMING_WRITE does not support PAD_TO in level0 (padding would repeat in every part)")
     
-    return root_tortilla
+    print("Streaming root samples...")
+    print(f"Parallel: {LEVEL0_PARALLEL}, Workers: {WORKERS}")
+    
+    return level0.iter_samples(contexts, resume=resume)
+
+
+def create_part_tortilla(samples: list[Sample]) -> Tortilla:
+    """Wrap one part of streamed root samples in a Tortilla with extensions applied."""
+    return extend_tortilla(level0.build_tortilla(samples))
 
 
 if __name__ == "__main__":